@@ -0,0 +1,10 @@
+def delete_in_batches(queryset, batch_size):
+    """按 queryset 的顺序每次删除 batch_size 行，返回删除数量（含级联删除的行）"""
+    model = queryset.model
+    total = 0
+    while True:
+        # 每批单独删除，避免一次长事务长时间占住 SQLite 写锁
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return total
+        total += model.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,71 @@
+from rest_framework.exceptions import ValidationError
+
+
+def parse_field_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def get_requested_fields(params, available):
+    """按序列化器字段顺序返回 ?fields= 与 ?exclude= 选中的字段，未指定时为 None，未知字段返回 400"""
+    if 'fields' not in params and 'exclude' not in params:
+        return None
+    include = parse_field_names(params.get('fields', ''))
+    exclude = parse_field_names(params.get('exclude', ''))
+    unknown = set(include).union(exclude).difference(available)
+    if unknown:
+        raise ValidationError({'fields': [f'未知字段：{", ".join(sorted(unknown))}']})
+    return [name for name in available if (not include or name in include) and name not in exclude]
+
+
+def get_field_columns(serializer, names):
+    """这些字段要读取的列，供 .only() 使用；来源不是列的字段在 Meta.field_columns 中列出"""
+    overrides = getattr(serializer.Meta, 'field_columns', {})
+    columns = []
+    for name in names:
+        for column in overrides.get(name, (serializer.fields[name].source.replace('.', '__'),)):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+def narrow_queryset(queryset, columns):
+    """``.only(*columns)``，select_related 只保留这些列实际用到的关联，否则 Django 不允许推迟外键"""
+    related = [column.rsplit('__', 1)[0] for column in columns if '__' in column]
+    queryset = queryset.select_related(None)
+    if related:
+        # 不带参数的 select_related() 会连上所有外键，只有需要时才调用
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+class SparseFieldsSerializerMixin:
+    """``context['fields']`` 不为 None 时只保留其中的字段"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = self.context.get('fields')
+        if names is not None:
+            for name in set(self.fields) - set(names):
+                self.fields.pop(name)
+
+
+class SparseFieldsMixin:
+    """GET 请求支持 ?fields= / ?exclude=：序列化器去掉其余字段，SELECT 也只读剩下字段需要的列"""
+
+    def get_sparse_fields(self):
+        if self.request.method != 'GET':
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = get_requested_fields(self.request.query_params, self.get_serializer_class()().fields)
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+        return context
+
+    def sparse_queryset(self, queryset):
+        names = self.get_sparse_fields()
+        if names is None:
+            return queryset
+        return narrow_queryset(queryset, get_field_columns(self.get_serializer_class()(), names))
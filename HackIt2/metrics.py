@@ -0,0 +1,253 @@
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_metrics_settings():
+    return {
+        'ENABLED': True,
+        'BUCKETS': DEFAULT_BUCKETS,
+        'SLOW_REQUEST_MS': None,
+        'ALLOWED_IPS': ('127.0.0.1', '::1'),
+        'TOKEN': None,
+        **getattr(settings, 'METRICS', {}),
+    }
+
+
+class ViewMetrics:
+    __slots__ = ('responses', 'buckets', 'duration', 'queries', 'query_time', 'render_time')
+
+    def __init__(self, bucket_count):
+        self.responses = {}
+        self.buckets = [0] * (bucket_count + 1)
+        self.duration = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self.render_time = 0.0
+
+
+class MetricsRegistry:
+    """按 URL 名称统计的进程内请求指标；多进程时各进程分别导出，由 Prometheus 汇总"""
+
+    def __init__(self, buckets):
+        self.bucket_bounds = tuple(buckets)
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, method, status_code, duration, queries, query_time, render_time):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics(len(self.bucket_bounds))
+            key = (method, status_code)
+            metrics.responses[key] = metrics.responses.get(key, 0) + 1
+            metrics.buckets[bisect_left(self.bucket_bounds, duration)] += 1
+            metrics.duration += duration
+            metrics.queries += queries
+            metrics.query_time += query_time
+            metrics.render_time += render_time
+
+    def snapshot(self):
+        with self._lock:
+            return {view: (dict(m.responses), list(m.buckets), m.duration, m.queries, m.query_time, m.render_time)
+                    for view, m in self._views.items()}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry(get_metrics_settings()['BUCKETS'])
+
+
+def escape_label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def render_metrics():
+    """当前进程的全部指标，Prometheus 文本格式 0.0.4"""
+    from rewardapp.cache import cache_stats
+
+    snapshot = sorted(registry.snapshot().items())
+    lines = [
+        '# HELP hackit_http_requests_total Requests by URL name, method and status code.',
+        '# TYPE hackit_http_requests_total counter',
+    ]
+    for view, (responses, *_) in snapshot:
+        for (method, code), count in sorted(responses.items()):
+            lines.append(f'hackit_http_requests_total{{view="{escape_label(view)}",method="{method}",'
+                         f'status="{code}"}} {count}')
+
+    lines += [
+        '# HELP hackit_http_request_duration_seconds Request latency by URL name.',
+        '# TYPE hackit_http_request_duration_seconds histogram',
+    ]
+    for view, (_, buckets, duration, *_) in snapshot:
+        label = escape_label(view)
+        cumulative = 0
+        for bound, count in zip((*registry.bucket_bounds, '+Inf'), buckets):
+            cumulative += count
+            lines.append(f'hackit_http_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'hackit_http_request_duration_seconds_sum{{view="{label}"}} {duration}')
+        lines.append(f'hackit_http_request_duration_seconds_count{{view="{label}"}} {cumulative}')
+
+    for name, index, help_text in (
+            ('hackit_db_queries_total', 3, 'SQL statements executed by URL name.'),
+            ('hackit_db_query_seconds_total', 4, 'Time spent in SQL by URL name.'),
+            ('hackit_response_render_seconds_total', 5, 'Time spent rendering response bodies by URL name.')):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view, values in snapshot:
+            lines.append(f'{name}{{view="{escape_label(view)}"}} {values[index]}')
+
+    stats = cache_stats()
+    lines += [
+        '# HELP hackit_public_reward_cache_requests_total Public reward list cache lookups.',
+        '# TYPE hackit_public_reward_cache_requests_total counter',
+        f'hackit_public_reward_cache_requests_total{{result="hit"}} {stats["hits"]}',
+        f'hackit_public_reward_cache_requests_total{{result="miss"}} {stats["misses"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def can_scrape(request):
+    """来自 ALLOWED_IPS 的请求，或带 ``Authorization: Bearer <TOKEN>`` 的请求才能读取指标"""
+    config = get_metrics_settings()
+    if request.META.get('REMOTE_ADDR') in config['ALLOWED_IPS']:
+        return True
+    token = config['TOKEN']
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode())
+
+
+def metrics_view(request):
+    if not can_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class RequestTimer:
+    """一个请求的计时状态：SQL 由 ``execute_sql`` 累计，响应序列化时间由渲染完成回调记录"""
+
+    def __init__(self, keep_sql):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+        self.sql = [] if keep_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.query_time += elapsed
+            if self.sql is not None:
+                self.sql.append((elapsed, sql))
+
+    def render_finished(self, response):
+        self.render_time = time.perf_counter() - self.render_started
+
+
+current_timer = ContextVar('current_timer', default=None)
+
+
+def execute_sql(execute, sql, params, many, context):
+    # 数据库连接按线程隔离，而异步视图的 ORM 调用跑在 sync_to_async 的线程里；
+    # 计时器放在 ContextVar 中，随上下文一起进入这些线程
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_wrapper(connection):
+    if execute_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_sql)
+
+
+def on_connection_created(sender, connection, **kwargs):
+    install_wrapper(connection)
+
+
+connection_created.connect(on_connection_created)
+
+
+class MetricsMiddleware:
+    """记录每个请求的耗时、状态码和 SQL 次数；超过 SLOW_REQUEST_MS 的请求连同其 SQL 记入日志"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = get_metrics_settings()
+        self.enabled = options['ENABLED']
+        self.slow_request_ms = options['SLOW_REQUEST_MS']
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        # 本模块导入前就已打开的连接不会收到 connection_created，这里补上
+        for connection in connections.all(initialized_only=True):
+            install_wrapper(connection)
+        timer = request._metrics_timer = RequestTimer(self.slow_request_ms is not None)
+        token = current_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        self.record(request, response, timer)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        timer = request._metrics_timer = RequestTimer(self.slow_request_ms is not None)
+        token = current_timer.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        self.record(request, response, timer)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF 的 Response 在这之后才渲染成字节，渲染完成回调里得到序列化耗时
+        timer = getattr(request, '_metrics_timer', None)
+        if timer is not None:
+            timer.render_started = time.perf_counter()
+            response.add_post_render_callback(timer.render_finished)
+        return response
+
+    def record(self, request, response, timer):
+        duration = time.perf_counter() - timer.started
+        match = request.resolver_match
+        # 未匹配路由统一归到一个标签，避免任意 URL 撑爆指标维度
+        view = match.view_name if match is not None and match.view_name else 'unmatched'
+        registry.observe(view, request.method, response.status_code, duration, timer.queries, timer.query_time,
+                         timer.render_time)
+
+        if self.slow_request_ms is not None and duration * 1000 >= self.slow_request_ms:
+            statements = '\n'.join(f'  {elapsed * 1000:.1f}ms {sql}' for elapsed, sql in timer.sql)
+            logger.warning('Slow request %s %s (%s) took %.1fms, %d queries in %.1fms\n%s',
+                           request.method, request.path, view, duration * 1000, timer.queries,
+                           timer.query_time * 1000, statements)
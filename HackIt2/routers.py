@@ -0,0 +1,69 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# 当前上下文是否允许读副本；值是可变的 dict，写操作发生后在其中打上 pinned 标记
+_replica_state = ContextVar('replica_state', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def replica_reads():
+    """块内的读取走副本；块内一旦写入，余下的读取都走主库，保证读到自己的写"""
+    token = _replica_state.set({'pinned': False})
+    try:
+        yield
+    finally:
+        _replica_state.reset(token)
+
+
+def pin_primary():
+    """本次请求余下的读取都走主库，与发生过写操作时相同"""
+    state = _replica_state.get()
+    if state is not None:
+        state['pinned'] = True
+
+
+class ReplicaReadMixin:
+    """只读 DRF 视图用：认证与权限检查仍读主库（刚签发的令牌可能还没同步到副本），之后的查询读副本"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_token = _replica_state.set({'pinned': False})
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_state.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReadReplicaRouter:
+    """写总走主库；只有 replica_reads()/ReplicaReadMixin 内、且尚未写入时，读才随机分到 DATABASE_REPLICAS"""
+
+    def db_for_read(self, model, **hints):
+        state = _replica_state.get()
+        replicas = get_replicas()
+        if state is None or state['pinned'] or not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _replica_state.get()
+        if state is not None:
+            state['pinned'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本是主库的拷贝，跨别名的对象之间照常允许关联
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,6 +25,7 @@ INSTALLED_APPS = [
 CORS_ALLOW_ALL_ORIGINS = True
 
 MIDDLEWARE = [
+    'HackIt2.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -36,8 +38,50 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'userapp.authentication.CachingTokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rewardapp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # 只限制声明了 throttle_scope 的视图，计数见下方 THROTTLE
+    'DEFAULT_THROTTLE_CLASSES': [
+        'HackIt2.throttling.SlidingWindowThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'payments': '20/min',
+        'balance': '20/min',
+        'public': '1200/min',
+    },
+}
+
+# 限流计数存放在本机所有 worker 进程共享的 SQLite 库中，默认位于 /dev/shm（内存文件系统），可用 HACKIT_THROTTLE_STORE 指定。
+# 测试由 HackIt2.test_runner 换成进程内的共享内存库，避免相邻几次运行的计数相互影响。
+THROTTLE = {
+    'ENABLED': True,
+}
+if os.environ.get('HACKIT_THROTTLE_STORE'):
+    THROTTLE['STORE'] = os.environ['HACKIT_THROTTLE_STORE']
+
+TEST_RUNNER = 'HackIt2.test_runner.TestRunner'
+
+# 令牌缓存按进程维护：CACHE_SIZE 为 LRU 容量，CACHE_TTL（秒）限制其他进程读到过期用户信息的时间。
+# TOKEN_EXPIRE_SECONDS 为令牌有效期，过期令牌在认证时被拒绝，并由 purge_tokens 命令批量清理。
+TOKEN_AUTH = {
+    'CACHE_SIZE': 10000,
+    'CACHE_TTL': 60,
+    'TOKEN_EXPIRE_SECONDS': 7 * 24 * 3600,
+}
+
+# 请求指标按进程统计，/metrics 以 Prometheus 文本格式导出；BUCKETS 为延迟直方图的上界（秒）。
+# SLOW_REQUEST_MS 设为毫秒数后，超过阈值的请求会连同其 SQL 记录到 HackIt2.metrics 日志。
+# /metrics 只对 ALLOWED_IPS（默认仅本机）开放；其他地址的采集器需带 Authorization: Bearer <HACKIT_METRICS_TOKEN>。
+METRICS = {
+    'ENABLED': True,
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    'SLOW_REQUEST_MS': None,
+    'ALLOWED_IPS': ('127.0.0.1', '::1'),
+    'TOKEN': os.environ.get('HACKIT_METRICS_TOKEN') or None,
 }
 
 ROOT_URLCONF = 'HackIt2.urls'
@@ -62,13 +106,129 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'HackIt2.wsgi.application'
 
+# 写事务一律 BEGIN IMMEDIATE：先读后写的事务（批量审核、归档等）若以默认的 DEFERRED 开始，
+# 并发时会在读锁升级为写锁处互相死锁，SQLite 直接报 database is locked 而不会按 timeout 排队等待
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# HACKIT_DB_PROFILE=production 启用生产参数：WAL 让读写互不阻塞，synchronous=NORMAL 在 WAL 下仍保证一致性，
+# timeout（即 busy_timeout，秒）让写锁冲突排队等待而不是立即报 database is locked，
+# CONN_MAX_AGE 复用连接，免去每个请求重新打开数据库文件。
+if os.environ.get('HACKIT_DB_PROFILE') == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    })
+    DATABASES['default']['OPTIONS'].update({
+        'timeout': 20,
+        'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY; '
+                        'PRAGMA cache_size=-20000',
+    })
+
+# HACKIT_DB_REPLICAS 为逗号分隔的只读副本文件（主库的拷贝或同步目标），只有公开列表、用户详情等只读视图会读副本，
+# 见 HackIt2.routers。副本的测试库镜像主库，跑测试时无需配置副本。
+DATABASE_REPLICAS = []
+for index, path in enumerate(filter(None, os.environ.get('HACKIT_DB_REPLICAS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path.strip(),
+        'CONN_MAX_AGE': DATABASES['default'].get('CONN_MAX_AGE', 0),
+        'OPTIONS': {'timeout': 20, 'init_command': 'PRAGMA query_only=ON'},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['HackIt2.routers.ReadReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# 公开悬赏列表的响应缓存。CACHE 是 CACHES 中的别名，可换成 FileBasedCache 或 Redis 等任意后端；
+# 多进程部署时需使用共享后端，否则版本号只在本进程内递增。TIMEOUT 为 0 时不缓存，公开列表改读只读副本。
+PUBLIC_REWARD_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# 首选哈希算法排在第一位；登录成功时若存储的哈希算法或迭代次数与之不同，会按当前配置重新哈希写回。
+# PASSWORD_HASH_ITERATIONS 为 PBKDF2 迭代次数，留空时使用 Django 的默认值，调低可减轻登录高峰的 CPU 压力。
+PASSWORD_HASHERS = [
+    'userapp.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('HACKIT_PASSWORD_HASH_ITERATIONS', 0)) or None
+
+# 登录失败次数限制：WINDOW 秒内同一用户名失败 USERNAME_LIMIT 次、或同一 IP 失败 IP_LIMIT 次后，
+# 在计算密码哈希之前直接返回 429。计数与接口限流共用上方 THROTTLE 的 SQLite 库，本机所有 worker 进程共享。
+LOGIN_THROTTLE = {
+    'USERNAME_LIMIT': 5,
+    'IP_LIMIT': 50,
+    'WINDOW': 300,
+}
+
+# 后台任务队列（rewardapp.jobs），由 `manage.py run_jobs` 执行。POOL 为 thread 或 process；
+# 失败的任务等待 RETRY_DELAY * 2^(n-1) 秒后重试，最多 MAX_ATTEMPTS 次；running 超过 LEASE_SECONDS 视为 worker 已退出。
+JOBS = {
+    'WORKERS': 4,
+    'POOL': 'thread',
+    'BATCH_SIZE': 20,
+    'POLL_INTERVAL': 1.0,
+    'MAX_POLL_INTERVAL': 10.0,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 10,
+    'MAX_RETRY_DELAY': 3600,
+    'LEASE_SECONDS': 300,
+}
+
+# 用户动态流：RETENTION_DAYS 为 prune_activity 命令默认保留的天数，PAGE_SIZE/MAX_PAGE_SIZE 为每次拉取的条数
+ACTIVITY = {
+    'RETENTION_DAYS': 90,
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 200,
+}
+
+# 冷数据归档（manage.py archive_rewards）：已结款/取消/下架且 AFTER_DAYS 天未变动的悬赏连同申请移入归档表，
+# 每个事务最多 BATCH_SIZE 个悬赏，批次之间暂停 PAUSE 秒让出写锁
+ARCHIVE = {
+    'AFTER_DAYS': 180,
+    'BATCH_SIZE': 500,
+    'PAUSE': 0.05,
+}
+
+# 过期清理（manage.py expire_rewards [--loop]）：每个事务最多取消 BATCH_SIZE 个悬赏，--loop 时每 INTERVAL 秒扫描一次
+EXPIRY = {
+    'BATCH_SIZE': 500,
+    'INTERVAL': 60,
+}
+
+# “为你推荐”：分数 = AFFINITY_WEIGHT * 用户在该分类的完成占比 + AMOUNT_WEIGHT * 归一化的 log(赏金)。
+# 推荐用的数组每个进程各自构建，REFRESH_SECONDS 后重建；悬赏有写入时，距上次构建超过 MIN_REFRESH_SECONDS 即重建。
+RECOMMENDATIONS = {
+    'AFFINITY_WEIGHT': 1.0,
+    'AMOUNT_WEIGHT': 0.5,
+    'REFRESH_SECONDS': 300,
+    'MIN_REFRESH_SECONDS': 10,
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,
+}
+
+# 通知邮件默认输出到控制台，部署时通过环境变量换成 SMTP 等后端
+EMAIL_BACKEND = os.environ.get('HACKIT_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
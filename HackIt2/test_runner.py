@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# 进程内的 SQLite 共享内存库，随测试进程退出而消失
+TEST_THROTTLE_STORE = 'file:hackit-throttle-test?mode=memory&cache=shared'
+
+
+def get_test_throttle_settings():
+    return {**settings.THROTTLE, 'STORE': TEST_THROTTLE_STORE}
+
+
+class TestRunner(DiscoverRunner):
+    """整个测试运行期间把限流计数换成内存库，不读写部署环境的 /dev/shm 计数"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._throttle_override = override_settings(THROTTLE=get_test_throttle_settings())
+        self._throttle_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._throttle_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import ScopedRateThrottle
+
+# /dev/shm 是内存文件系统，计数库放在这里时读写不落盘，本机所有 worker 进程仍能共享
+DEFAULT_STORE_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def get_throttle_settings():
+    return {
+        'ENABLED': True,
+        'STORE': os.path.join(DEFAULT_STORE_DIR, 'hackit-throttle.sqlite3'),
+        'PRUNE_EVERY': 1000,
+        **getattr(settings, 'THROTTLE', {}),
+    }
+
+
+class SlidingWindowStore:
+    """放在本机 SQLite 里的滑动窗口计数，所有 worker 进程共享；本窗口计数加上按重叠比例折算的上一窗口计数不超过上限即放行"""
+
+    def __init__(self, path, prune_every=1000):
+        self.path = path
+        self.prune_every = prune_every
+        self._local = threading.local()
+
+    def connection(self):
+        # 按进程区分：fork 出的 worker 不能沿用父进程打开的连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None, uri=self.path.startswith('file:'))
+            conn.execute('PRAGMA journal_mode=WAL')
+            # 计数丢了只会让限流短暂放宽，不值得为它 fsync
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS throttle_counter ('
+                         'key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL, '
+                         'expires REAL NOT NULL, PRIMARY KEY (key, window)) WITHOUT ROWID')
+            self._local.conn, self._local.pid, self._local.hits = conn, os.getpid(), 0
+        return conn
+
+    def hit(self, key, limit, duration, now=None):
+        """计一次请求，返回 (是否放行, 需等待秒数)；被拒绝的请求不计数"""
+        now = time.time() if now is None else now
+        window, offset = divmod(now, duration)
+        window = int(window)
+        wait = duration - offset
+        conn = self.connection()
+
+        row = conn.execute('SELECT count FROM throttle_counter WHERE key = ? AND window = ?',
+                           (key, window - 1)).fetchone()
+        budget = limit - (row[0] * (1 - offset / duration) if row else 0)
+        if budget < 1:
+            return False, wait
+        # 条件 upsert 在一条语句里完成“检查并加一”，并发的进程不会同时越过上限
+        row = conn.execute('INSERT INTO throttle_counter (key, window, count, expires) VALUES (?, ?, 1, ?) '
+                           'ON CONFLICT (key, window) DO UPDATE SET count = count + 1 WHERE count + 1 <= ? '
+                           'RETURNING count', (key, window, (window + 2) * duration, budget)).fetchone()
+
+        self._local.hits += 1
+        if self._local.hits % self.prune_every == 0:
+            self.prune(now)
+        if row is None:
+            return False, wait
+        return True, None
+
+    def count(self, key, duration, now=None):
+        """按同样的滑动窗口算出 key 当前的计数，不计入本次"""
+        now = time.time() if now is None else now
+        window, offset = divmod(now, duration)
+        window = int(window)
+        counts = dict(self.connection().execute(
+            'SELECT window, count FROM throttle_counter WHERE key = ? AND window IN (?, ?)',
+            (key, window - 1, window)).fetchall())
+        return counts.get(window, 0) + counts.get(window - 1, 0) * (1 - offset / duration)
+
+    def add(self, key, duration, now=None):
+        """无条件计一次，用于只在事后才知道要不要计数的场合（如登录失败）"""
+        now = time.time() if now is None else now
+        window = int(now // duration)
+        self.connection().execute('INSERT INTO throttle_counter (key, window, count, expires) VALUES (?, ?, 1, ?) '
+                                  'ON CONFLICT (key, window) DO UPDATE SET count = count + 1',
+                                  (key, window, (window + 2) * duration))
+
+    def reset(self, key):
+        self.connection().execute('DELETE FROM throttle_counter WHERE key = ?', (key,))
+
+    def prune(self, now=None):
+        self.connection().execute('DELETE FROM throttle_counter WHERE expires < ?',
+                                  (time.time() if now is None else now,))
+
+    def clear(self):
+        self.connection().execute('DELETE FROM throttle_counter')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    config = get_throttle_settings()
+    if _store is None or _store.path != config['STORE']:
+        with _store_lock:
+            if _store is None or _store.path != config['STORE']:
+                _store = SlidingWindowStore(config['STORE'], config['PRUNE_EVERY'])
+    return _store
+
+
+class SlidingWindowThrottle(ScopedRateThrottle):
+    """计数放在共享的 SlidingWindowStore 而不是缓存里；视图用 throttle_scope 启用，费率仍取 DEFAULT_THROTTLE_RATES"""
+
+    @property
+    def THROTTLE_RATES(self):
+        # DRF 在类定义时就取好了费率表，这里每次读取当前配置
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope or not get_throttle_settings()['ENABLED']:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        key = self.get_cache_key(request, view)
+        if key is None or self.num_requests is None:
+            return True
+        allowed, self.wait_seconds = get_store().hit(key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def check_throttle(request, scope):
+    """供 DRF 之外的视图使用：返回需等待的秒数，放行时为 None"""
+    view = type('ScopedView', (), {'throttle_scope': scope})()
+    throttle = SlidingWindowThrottle()
+    return None if throttle.allow_request(request, view) else throttle.wait()
+
+
+async def acheck_throttle(request, scope):
+    # 计数库是同步的 SQLite I/O，写锁争用时最多等 1 秒，放到线程池里执行，不阻塞事件循环
+    return await sync_to_async(check_throttle, thread_sensitive=False)(request, scope)
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from HackIt2.batches import delete_in_batches
+
+from .models import Activity
+
+
+def get_activity_settings():
+    return {
+        'RETENTION_DAYS': 90,
+        'PAGE_SIZE': 50,
+        'MAX_PAGE_SIZE': 200,
+        **getattr(settings, 'ACTIVITY', {}),
+    }
+
+
+def publish(verb, reward, actor, counterpart_id, application_id=None):
+    """一条 INSERT 把动态写入悬赏发布者和 counterpart_id（申请人或接单人）的动态流；在修改所在的事务里调用"""
+    recipients = {reward.creator_id, counterpart_id} - {None}
+    Activity.objects.bulk_create([
+        Activity(user_id=user_id, verb=verb, reward_id=reward.pk, reward_title=reward.title,
+                 application_id=application_id, actor_username=actor.username)
+        for user_id in sorted(recipients)
+    ])
+
+
+def publish_many(verb, entries, actor=None):
+    """一条 INSERT 批量写入动态；entries 为 (reward_id, title, creator_id, counterpart_id, application_id)，
+    系统操作时 actor 为 None，actor_username 留空"""
+    actor_username = actor.username if actor is not None else ''
+    Activity.objects.bulk_create([
+        Activity(user_id=user_id, verb=verb, reward_id=reward_id, reward_title=title,
+                 application_id=application_id, actor_username=actor_username)
+        for reward_id, title, creator_id, counterpart_id, application_id in entries
+        for user_id in sorted({creator_id, counterpart_id} - {None})
+    ])
+
+
+def prune(retention_days, batch_size):
+    """分批删除 retention_days 天前的动态，返回删除数量"""
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    return delete_in_batches(Activity.objects.filter(created_at__lt=cutoff).order_by('created_at', 'id'), batch_size)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RewardappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rewardapp'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import notifications, signals  # noqa: F401
+        post_migrate.connect(signals.restore_search_triggers, sender=self)
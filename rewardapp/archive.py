@@ -0,0 +1,97 @@
+import time
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidate_rewards
+from .models import ArchivedReward, ArchivedRewardApplication, Reward, RewardApplication
+
+# 归档的悬赏不会再有状态变更（take_down 本可重新上架，但长期未动的视为已结束）
+TERMINAL_STATUSES = ('payed', 'cancelled', 'take_down')
+
+
+def get_archive_settings():
+    return {
+        'AFTER_DAYS': 180,
+        'BATCH_SIZE': 500,
+        'PAUSE': 0.05,
+        **getattr(settings, 'ARCHIVE', {}),
+    }
+
+
+def include_archived(params):
+    """``?include_archived=true``：历史接口同时返回已归档的行"""
+    return params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+class ArchiveBatch(NamedTuple):
+    rewards: int
+    applications: int
+    # 本批最后一个悬赏的 (updated_at, id)，下一批从它之后继续扫描
+    position: tuple
+
+
+def copy_rows(source, target, column, ids, archived_at=None):
+    """INSERT INTO target SELECT ... FROM source，行数据不经过 Python"""
+    qn = connection.ops.quote_name
+    columns = [qn(field.column) for field in target._meta.concrete_fields if field.name != 'archived_at']
+    insert, select, params = list(columns), list(columns), []
+    if archived_at is not None:
+        insert.append(qn('archived_at'))
+        select.append('%s')
+        params.append(connection.ops.adapt_datetimefield_value(archived_at))
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {qn(target._meta.db_table)} ({", ".join(insert)}) SELECT {", ".join(select)} '
+                       f'FROM {qn(source._meta.db_table)} WHERE {qn(column)} IN ({placeholders})', [*params, *ids])
+        return cursor.rowcount
+
+
+def delete_rows(model, column, ids):
+    """直接执行 DELETE：ORM 会逐行发 post_delete，其接收者会调整统计和申请计数，归档时不能这样做"""
+    qn = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {qn(model._meta.db_table)} WHERE {qn(column)} IN ({placeholders})', ids)
+        return cursor.rowcount
+
+
+def archive_batch(cutoff, batch_size, after=None):
+    """在一个短事务里把最多 batch_size 个已结束的悬赏连同申请移入归档表，没有可归档的行时返回 None；
+    按 (updated_at, id) 从 after 之后继续扫描，跳过的行不会被下一批重复读取"""
+    queryset = Reward.objects.filter(status__in=TERMINAL_STATUSES, updated_at__lt=cutoff)
+    if after is not None:
+        updated_at, pk = after
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+
+    with transaction.atomic():
+        # 支持行锁的数据库上防止选中后被并发修改；SQLite 的写事务本身是串行的
+        rows = list(queryset.select_for_update().order_by('updated_at', 'id')
+                    .values_list('updated_at', 'id')[:batch_size])
+        if not rows:
+            return None
+        ids = [pk for _, pk in rows]
+        copy_rows(Reward, ArchivedReward, 'id', ids, archived_at=timezone.now())
+        applications = copy_rows(RewardApplication, ArchivedRewardApplication, 'reward_id', ids)
+        delete_rows(RewardApplication, 'reward_id', ids)
+        rewards = delete_rows(Reward, 'id', ids)
+        invalidate_rewards()
+    return ArchiveBatch(rewards, applications, rows[-1])
+
+
+def archive(days, batch_size, pause=0.0):
+    """归档 days 天未变动的已结束悬赏，每个事务产出一个 ArchiveBatch；批次间暂停 pause 秒，让请求有机会拿到写锁"""
+    cutoff = timezone.now() - timedelta(days=days)
+    position = None
+    while True:
+        batch = archive_batch(cutoff, batch_size, position)
+        if batch is None:
+            return
+        yield batch
+        position = batch.position
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,83 @@
+from math import ceil
+
+from rest_framework import status
+from rest_framework.exceptions import Throttled, ValidationError
+from rest_framework.request import Request
+
+from HackIt2.fieldsets import get_field_columns, get_requested_fields, narrow_queryset
+from HackIt2.routers import pin_primary, replica_reads
+from HackIt2.throttling import acheck_throttle
+from userapp.async_views import authenticate, error_response, json_response
+from .cache import aget_cached_response, aresponse_cache_key, aset_cached_response, caching_enabled
+from .models import Category, Reward
+from .pagination import RewardCursorPagination
+from .serializers import RewardSerializer, reward_row_mapper
+from .views import PublicRewardListView, get_public_reward_queryset
+
+
+async def public_reward_list(request):
+    """PublicRewardListView 的异步版本，筛选、游标、缓存和响应内容都相同"""
+    error = await authenticate(request)
+    if error is not None:
+        return error
+    wait = await acheck_throttle(request, PublicRewardListView.throttle_scope)
+    if wait is not None:
+        return json_response({'detail': Throttled(wait).detail}, status.HTTP_429_TOO_MANY_REQUESTS,
+                             headers={'Retry-After': str(ceil(wait))})
+
+    with replica_reads():
+        if caching_enabled():
+            # 与 PublicRewardListView 相同：要写入缓存的结果读主库
+            pin_primary()
+        return await _public_reward_list(Request(request))
+
+
+async def _public_reward_list(request):
+    key = await aresponse_cache_key(request)
+    data = await aget_cached_response(key)
+    if data is not None:
+        return json_response(data, headers={'X-Cache': 'HIT'})
+
+    try:
+        names = get_requested_fields(request.query_params, reward_row_mapper.names)
+    except ValidationError as exc:
+        return json_response(exc.detail, status.HTTP_400_BAD_REQUEST)
+    mapper = reward_row_mapper if names is None else reward_row_mapper.select(names)
+
+    category = None
+    category_name = request.query_params.get('category_name', None)
+    if category_name:
+        category = await Category.objects.filter(name=category_name).afirst()
+        if category is None:
+            return error_response('未找到分类', status.HTTP_404_NOT_FOUND)
+
+    paginator = RewardCursorPagination()
+    queryset = paginator.get_page_queryset(get_public_reward_queryset(request.query_params, category), request)
+    rows = paginator.paginate_rows([row async for row in mapper.values(queryset, paginator.key_columns)])
+    data = paginator.get_paginated_response(mapper.map(rows)).data
+
+    await aset_cached_response(key, data)
+    return json_response(data, headers={'X-Cache': 'MISS'})
+
+
+async def reward_detail(request, pk):
+    """``RewardViewSet.retrieve``：只能查看自己发布的悬赏"""
+    error = await authenticate(request)
+    if error is not None:
+        return error
+    if not request.user.is_authenticated:
+        return error_response('Authentication credentials were not provided.', status.HTTP_401_UNAUTHORIZED)
+
+    queryset = Reward.objects.select_related('category', 'creator')
+    try:
+        names = get_requested_fields(request.GET, RewardSerializer().fields)
+    except ValidationError as exc:
+        return json_response(exc.detail, status.HTTP_400_BAD_REQUEST)
+    if names is not None:
+        queryset = narrow_queryset(queryset, get_field_columns(RewardSerializer(), names))
+
+    try:
+        reward = await queryset.aget(pk=pk, creator=request.user)
+    except Reward.DoesNotExist:
+        return error_response('No Reward matches the given query.', status.HTTP_404_NOT_FOUND)
+    return json_response(RewardSerializer(reward, context={'fields': names}).data)
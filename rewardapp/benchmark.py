@@ -0,0 +1,124 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from django.test import AsyncClient, Client
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, errors=0):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def format_result(label, concurrency, result):
+    return (f'{label:<40} c={concurrency:<4} {result["rps"]:>9.1f} req/s  p50={result["p50"]:>7.2f}ms  '
+            f'p95={result["p95"]:>7.2f}ms  p99={result["p99"]:>7.2f}ms  errors={result["errors"]}')
+
+
+class BenchRequest(NamedTuple):
+    method: str
+    path: str
+    data: object = None
+    headers: dict = None
+
+
+def send(client, request):
+    """发出一个请求并读完响应体，包括流式响应"""
+    data = json.dumps(request.data) if request.data is not None else ''
+    response = client.generic(request.method, request.path, data, content_type='application/json',
+                              headers=request.headers)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+async def asend(client, request):
+    data = json.dumps(request.data) if request.data is not None else ''
+    response = await client.generic(request.method, request.path, data, content_type='application/json',
+                                    headers=request.headers)
+    if response.streaming:
+        if response.is_async:
+            async for _ in response.streaming_content:
+                pass
+        else:
+            b''.join(response.streaming_content)
+    return response
+
+
+def run_wsgi_requests(requests, concurrency):
+    """用 concurrency 个线程经 WSGI handler 发送 requests"""
+    local = threading.local()
+    errors = []
+
+    def call(request):
+        client = getattr(local, 'client', None)
+        if client is None:
+            # 视图抛出的异常计为 500，不中断整轮压测
+            client = local.client = Client(raise_request_exception=False)
+        started = time.perf_counter()
+        response = send(client, request)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(call, requests))
+    return summarize(latencies, time.perf_counter() - started, len(errors))
+
+
+def run_asgi_requests(requests, concurrency):
+    """在一个事件循环里经 ASGI handler 发送 requests，同时最多 concurrency 个"""
+
+    async def main():
+        client = AsyncClient(raise_request_exception=False)
+        semaphore = asyncio.Semaphore(concurrency)
+        errors = []
+
+        async def call(request):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await asend(client, request)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(call(request) for request in requests))
+        return summarize(latencies, time.perf_counter() - started, len(errors))
+
+    return asyncio.run(main())
+
+
+def run_wsgi(url_for, total, concurrency, headers=None):
+    """url_for(i) 返回第 i 个请求的路径，便于变换查询参数"""
+    return run_wsgi_requests([BenchRequest('GET', url_for(i), headers=headers) for i in range(total)], concurrency)
+
+
+def run_asgi(url_for, total, concurrency, headers=None):
+    """同 run_wsgi，走 ASGI handler"""
+    return run_asgi_requests([BenchRequest('GET', url_for(i), headers=headers) for i in range(total)], concurrency)
+
+
+def compare(result, baseline, tolerance):
+    """与保存的结果比较吞吐量和 p99，任一变差超过 tolerance（0.2 即 20%）视为退化"""
+    rps_change = (result['rps'] - baseline['rps']) / baseline['rps'] if baseline['rps'] else 0.0
+    p99_change = (result['p99'] - baseline['p99']) / baseline['p99'] if baseline['p99'] else 0.0
+    return {'rps': rps_change, 'p99': p99_change, 'regressed': rps_change < -tolerance or p99_change > tolerance}
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = 'rewards:version'
+RESPONSE_KEY_PREFIX = 'rewards:response'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_cache_settings():
+    return {'CACHE': 'default', 'TIMEOUT': 300, **getattr(settings, 'PUBLIC_REWARD_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_cache_settings()['CACHE']]
+
+
+def get_rewards_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 版本号丢失（重启或被淘汰）时从毫秒时间戳重新开始，保证不会回到以前用过的版本
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_rewards_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        get_rewards_version()
+        cache.incr(VERSION_KEY)
+
+
+def invalidate_rewards(using=None):
+    """立即和事务提交后各失效一次：后一次防止并发读请求把提交前的旧数据写回缓存"""
+    bump_rewards_version()
+    transaction.on_commit(bump_rewards_version, using=using)
+
+
+async def aget_rewards_version():
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def _request_digest(request):
+    params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    raw = '\n'.join([request.get_host(), request.path, *(f'{key}={value}' for key, value in params)])
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def response_cache_key(request):
+    return f'{RESPONSE_KEY_PREFIX}:{get_rewards_version()}:{_request_digest(request)}'
+
+
+async def aresponse_cache_key(request):
+    return f'{RESPONSE_KEY_PREFIX}:{await aget_rewards_version()}:{_request_digest(request)}'
+
+
+def _record(data):
+    with _stats_lock:
+        _stats['hits' if data is not None else 'misses'] += 1
+    return data
+
+
+def get_cached_response(key):
+    return _record(get_cache().get(key))
+
+
+async def aget_cached_response(key):
+    return _record(await get_cache().aget(key))
+
+
+def caching_enabled():
+    return get_cache_settings()['TIMEOUT'] != 0
+
+
+def set_cached_response(key, data):
+    get_cache().set(key, data, get_cache_settings()['TIMEOUT'])
+
+
+async def aset_cached_response(key, data):
+    await get_cache().aset(key, data, get_cache_settings()['TIMEOUT'])
+
+
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
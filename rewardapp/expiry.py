@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .activity import publish_many
+from .archive import delete_rows
+from .cache import invalidate_rewards
+from .models import Reward, RewardApplication
+from .stats import move_rewards_stats
+from .transitions import TRANSITIONS
+
+# 过期后自动取消的动作；in_progress 之后已有人在开发，不再受截止时间约束
+EXPIRE_ACTIONS = ('expire', 'expire_applied')
+
+
+def get_expiry_settings():
+    return {
+        'BATCH_SIZE': 500,
+        'INTERVAL': 60,
+        **getattr(settings, 'EXPIRY', {}),
+    }
+
+
+def expire_batch(action, batch_size, now=None):
+    """取消最多 batch_size 个已过截止时间、处于 action 源状态的悬赏，返回 (悬赏数, 申请数)；
+    一条带状态条件的 UPDATE ... RETURNING 领取本批，与并发的 transition 互不覆盖，其余步骤都是按集合执行"""
+    source, target = TRANSITIONS[action]
+    now = timezone.now() if now is None else now
+    qn = connection.ops.quote_name
+    table = qn(Reward._meta.db_table)
+    db_now = connection.ops.adapt_datetimefield_value(now)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # 外层再判断一次 status，与 transition 的条件更新一致；application_count 随待审核申请一起清零
+            cursor.execute(
+                f'UPDATE {table} SET "status" = %s, "updated_at" = %s, "application_count" = 0 '
+                f'WHERE "status" = %s AND "id" IN ('
+                f'SELECT "id" FROM {table} WHERE "status" = %s AND "deadline" < %s '
+                f'ORDER BY "deadline", "id" LIMIT %s) RETURNING "id"',
+                [target, db_now, source, source, db_now, batch_size])
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return 0, 0
+
+        rows = list(Reward.objects.filter(pk__in=ids)
+                    .values_list('id', 'title', 'creator_id', 'receiver_id', 'category_id', 'reward_amount'))
+        Reward.objects.filter(pk__in=ids, receiver__isnull=False).update(receiver=None)
+        # waiting/applied 的悬赏不会有已通过的申请，剩下的都是待审核或已驳回的
+        applications = delete_rows(RewardApplication, 'reward_id', ids)
+        move_rewards_stats([(category_id, amount) for *_, category_id, amount in rows], source, target)
+        publish_many('reward_expired', [(pk, title, creator_id, receiver_id, None)
+                                        for pk, title, creator_id, receiver_id, *_ in rows])
+        invalidate_rewards()
+    return len(ids), applications
+
+
+def expire_rewards(batch_size, now=None):
+    """每批一个短事务，取消所有过期的悬赏，返回合计数量"""
+    now = timezone.now() if now is None else now
+    rewards = applications = 0
+    for action in EXPIRE_ACTIONS:
+        while True:
+            expired, cleared = expire_batch(action, batch_size, now)
+            rewards += expired
+            applications += cleared
+            if expired < batch_size:
+                break
+    return rewards, applications
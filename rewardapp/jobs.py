@@ -0,0 +1,150 @@
+import random
+import traceback
+import uuid
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import Callable, NamedTuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Job
+
+
+def get_job_settings():
+    return {
+        'WORKERS': 4,
+        'POOL': 'thread',
+        'BATCH_SIZE': 20,
+        'POLL_INTERVAL': 1.0,
+        'MAX_POLL_INTERVAL': 10.0,
+        'MAX_ATTEMPTS': 5,
+        'RETRY_DELAY': 10,
+        'MAX_RETRY_DELAY': 3600,
+        'LEASE_SECONDS': 300,
+        **getattr(settings, 'JOBS', {}),
+    }
+
+
+class Handler(NamedTuple):
+    func: Callable
+    max_attempts: int
+
+
+handlers = {}
+
+
+def register(name, max_attempts=None):
+    """注册名为 name 的任务处理函数，调用方式为 func(**payload)"""
+    def decorator(func):
+        handlers[name] = Handler(func, max_attempts or get_job_settings()['MAX_ATTEMPTS'])
+        return func
+    return decorator
+
+
+def enqueue(name, delay=None, **payload):
+    """在调用方的事务里写入任务，提交后 worker 才能看到，回滚则任务一并消失"""
+    if name not in handlers:
+        raise KeyError(f'Unknown job {name!r}')
+    run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.create(name=name, payload=payload, run_at=run_at, max_attempts=handlers[name].max_attempts)
+
+
+def enqueue_many(name, payloads, delay=None):
+    """一条 INSERT 批量入队，每个 payload 一个任务"""
+    if name not in handlers:
+        raise KeyError(f'Unknown job {name!r}')
+    run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.bulk_create([Job(name=name, payload=payload, run_at=run_at,
+                                        max_attempts=handlers[name].max_attempts) for payload in payloads])
+
+
+def claim(worker_id, limit):
+    """一条 UPDATE 领取最多 limit 个到期任务；外层再判断 status，防止两个 worker 领到同一个任务"""
+    # 每次领取带唯一标记，随后按标记取回本批任务
+    token = f'{worker_id[:31]}:{uuid.uuid4().hex}'
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id').values('id')[:limit]
+    claimed = Job.objects.filter(pk__in=due, status='queued').update(status='running', locked_by=token,
+                                                                    locked_at=now)
+    if not claimed:
+        return []
+    return list(Job.objects.filter(locked_by=token).order_by('run_at', 'id'))
+
+
+def requeue_expired(lease_seconds):
+    """把租约过期（worker 崩溃或被杀）仍处于 running 的任务放回队列，返回数量"""
+    cutoff = timezone.now() - timedelta(seconds=lease_seconds)
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(status='queued', locked_by='',
+                                                                            locked_at=None)
+
+
+def retry_delay(attempts):
+    """第 n 次失败后等待 RETRY_DELAY * 2^(n-1) 秒（带 ±25% 抖动），不超过 MAX_RETRY_DELAY"""
+    config = get_job_settings()
+    delay = min(config['RETRY_DELAY'] * 2 ** (attempts - 1), config['MAX_RETRY_DELAY'])
+    return delay * random.uniform(0.75, 1.25)
+
+
+def execute(name, payload):
+    """在线程池或进程池中执行一个任务，前后各清理一次过期的数据库连接，与请求的处理方式一致"""
+    close_old_connections()
+    try:
+        handlers[name].func(**payload)
+    finally:
+        close_old_connections()
+
+
+def run_inline(name, payload):
+    """在当前线程执行任务，像线程池一样返回已完成的 Future"""
+    future = Future()
+    try:
+        future.set_result(handlers[name].func(**payload))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def finish(succeeded, failed):
+    """成功的任务一次删除；失败的按退避时间重新排队，次数用完则标记为 failed"""
+    now = timezone.now()
+    for job, error in failed:
+        job.attempts += 1
+        job.last_error = error
+        job.locked_by, job.locked_at = '', None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'queued'
+            job.run_at = now + timedelta(seconds=retry_delay(job.attempts))
+    with transaction.atomic():
+        if succeeded:
+            Job.objects.filter(pk__in=[job.pk for job in succeeded]).delete()
+        if failed:
+            Job.objects.bulk_update([job for job, _ in failed],
+                                    ['attempts', 'last_error', 'locked_by', 'locked_at', 'status', 'run_at'])
+
+
+def format_error(exc):
+    return ''.join(traceback.format_exception(exc))[-4000:]
+
+
+def run_batch(worker_id, submit, limit):
+    """领取一批任务交给 submit 执行，全部结束后记录结果，返回领取数量"""
+    batch = claim(worker_id, limit)
+    futures = [(job, submit(job.name, job.payload) if job.name in handlers else None) for job in batch]
+
+    succeeded, failed = [], []
+    for job, future in futures:
+        if future is None:
+            failed.append((job, f'Unknown job {job.name!r}'))
+            continue
+        try:
+            future.result()
+        except Exception as exc:
+            failed.append((job, format_error(exc)))
+        else:
+            succeeded.append(job)
+    finish(succeeded, failed)
+    return len(batch)
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rewardapp.archive import archive, get_archive_settings
+
+
+class Command(BaseCommand):
+    help = 'Move finished rewards and their applications into the archive tables in small transactions'
+
+    def add_arguments(self, parser):
+        config = get_archive_settings()
+        parser.add_argument('--days', type=int, default=config['AFTER_DAYS'],
+                            help='Archive payed/cancelled/taken-down rewards not updated for this many days')
+        parser.add_argument('--batch-size', type=int, default=config['BATCH_SIZE'])
+        parser.add_argument('--pause', type=float, default=config['PAUSE'],
+                            help='Seconds to sleep between batches so other writers can get the lock')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] <= 0 or options['pause'] < 0:
+            raise CommandError('--days and --pause must not be negative and --batch-size must be positive')
+
+        rewards = applications = batches = 0
+        started = time.perf_counter()
+        for batch in archive(options['days'], options['batch_size'], options['pause']):
+            rewards += batch.rewards
+            applications += batch.applications
+            batches += 1
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'Batch {batches}: {batch.rewards} rewards, {batch.applications} applications')
+        elapsed = time.perf_counter() - started
+
+        rate = (rewards + applications) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {rewards} rewards and {applications} applications in {batches} batches, '
+            f'{elapsed:.2f}s ({rate:.0f} rows/s)'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from rewardapp.benchmark import format_result, run_asgi, run_wsgi
+from rewardapp.models import Reward
+
+
+class Command(BaseCommand):
+    help = ('Compare throughput and p99 latency of the sync (WSGI) and async (ASGI) read endpoints '
+            'at rising concurrency, in-process against the configured database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and concurrency level')
+        parser.add_argument('--concurrency', default='1,8,32,128', help='Comma separated concurrency levels')
+        parser.add_argument('--bypass-cache', action='store_true',
+                            help='Give every listing request a unique query string so the response cache misses')
+
+    def handle(self, *args, **options):
+        reward = Reward.objects.select_related('creator').order_by('id').first()
+        if reward is None:
+            raise CommandError('No rewards to benchmark, seed the database first')
+        token, _ = Token.objects.get_or_create(user=reward.creator)
+        headers = {'Authorization': f'Token {token.key}'}
+        username = reward.creator.username
+
+        def listing(name):
+            path = reverse(name)
+            if options['bypass_cache']:
+                return lambda i: f'{path}?page_size=20&_={i}'
+            return lambda i: f'{path}?page_size=20'
+
+        endpoints = [
+            ('public-rewards', listing('public-reward-list'), listing('async-public-reward-list')),
+            ('user detail', lambda i: reverse('user_detail', args=[username]),
+             lambda i: reverse('async-user-detail', args=[username])),
+            ('reward retrieve', lambda i: reverse('rewards-detail', args=[reward.pk]),
+             lambda i: reverse('async-reward-detail', args=[reward.pk])),
+        ]
+        levels = [int(level) for level in options['concurrency'].split(',')]
+
+        for label, sync_url, async_url in endpoints:
+            for concurrency in levels:
+                wsgi = run_wsgi(sync_url, options['requests'], concurrency, headers)
+                asgi = run_asgi(async_url, options['requests'], concurrency, headers)
+                self.stdout.write(format_result(f'{label} [wsgi]', concurrency, wsgi))
+                self.stdout.write(format_result(f'{label} [asgi]', concurrency, asgi))
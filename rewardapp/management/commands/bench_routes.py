@@ -0,0 +1,256 @@
+import json
+import os
+import uuid
+from decimal import Decimal
+from itertools import count
+from typing import Callable, NamedTuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import URLResolver, reverse
+from rest_framework.authtoken.models import Token
+
+from rewardapp import urls as reward_urls
+from rewardapp.benchmark import BenchRequest, compare, format_result, run_asgi_requests, run_wsgi_requests
+from rewardapp.cache import invalidate_rewards
+from rewardapp.models import Category, Reward, RewardApplication
+from rewardapp.stats import add_rewards_stats
+from userapp import urls as user_urls
+from userapp.models import CustomUser
+
+PASSWORD = 'Bench-pass-2024'
+# DefaultRouter 自带的 API 索引页，不属于业务接口
+IGNORED_ROUTES = {'api-root'}
+
+
+class Scenario(NamedTuple):
+    label: str
+    route: str
+    build: Callable  # build(total) -> [BenchRequest]，准备数据不计入耗时
+    asgi: bool = False
+
+
+def route_names():
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif pattern.name:
+                names.add(pattern.name)
+
+    walk(reward_urls.urlpatterns)
+    walk(user_urls.urlpatterns)
+    return names - IGNORED_ROUTES
+
+
+class Command(BaseCommand):
+    help = ('Benchmark every route in rewardapp and userapp at rising concurrency, in-process against the '
+            'configured database, and compare with a stored baseline. Write routes create their own fixture '
+            'rows, so run it against a scratch database filled by seed_data')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route and concurrency level')
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma separated concurrency levels')
+        parser.add_argument('--routes', help='Comma separated route names to run, all routes by default')
+        parser.add_argument('--bypass-cache', action='store_true',
+                            help='Give every public listing request a unique query string so the response cache misses')
+        parser.add_argument('--throttle', action='store_true',
+                            help='Keep rate limiting on; by default it is off so that throttled routes are '
+                                 'measured rather than rejected')
+        parser.add_argument('--baseline', help='JSON file with results of an earlier run to compare against')
+        parser.add_argument('--save-baseline', action='store_true', help='Write this run\'s results to --baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Relative throughput drop or p99 rise that counts as a regression')
+
+    def handle(self, *args, **options):
+        if options['requests'] <= 0:
+            raise CommandError('--requests must be positive')
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline needs --baseline')
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        baseline = {}
+        if options['baseline'] and not options['save_baseline']:
+            if not os.path.exists(options['baseline']):
+                raise CommandError(f'Baseline {options["baseline"]} does not exist, create it with --save-baseline')
+            with open(options['baseline'], encoding='utf-8') as stream:
+                baseline = json.load(stream)
+
+        self.bypass_cache = options['bypass_cache']
+        with override_settings(THROTTLE={**settings.THROTTLE, 'ENABLED': options['throttle']}):
+            self.run_scenarios(options, levels, baseline)
+
+    def run_scenarios(self, options, levels, baseline):
+        self.create_fixture()
+        scenarios = self.get_scenarios()
+        missing = route_names() - {scenario.route for scenario in scenarios}
+        if missing:
+            self.stderr.write(f'Routes without a benchmark scenario: {", ".join(sorted(missing))}')
+        if options['routes']:
+            selected = set(options['routes'].split(','))
+            scenarios = [scenario for scenario in scenarios if scenario.route in selected]
+
+        results, regressions = {}, 0
+        for scenario in scenarios:
+            run = run_asgi_requests if scenario.asgi else run_wsgi_requests
+            for concurrency in levels:
+                result = run(scenario.build(options['requests']), concurrency)
+                results.setdefault(scenario.label, {})[str(concurrency)] = result
+                line = format_result(scenario.label, concurrency, result)
+
+                previous = baseline.get(scenario.label, {}).get(str(concurrency))
+                if previous is not None:
+                    change = compare(result, previous, options['tolerance'])
+                    line += f'  rps {change["rps"]:+.0%}  p99 {change["p99"]:+.0%}'
+                    if change['regressed']:
+                        regressions += 1
+                        line += '  REGRESSED'
+                self.stdout.write(line)
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, indent=2, sort_keys=True)
+            self.stdout.write(f'Baseline written to {options["baseline"]}')
+        if regressions:
+            raise CommandError(f'{regressions} results regressed by more than {options["tolerance"]:.0%}')
+
+    def create_fixture(self):
+        """本次运行专用的发布者（超级用户）、接单人和分类，用户名带随机后缀，可在同一个库上反复运行"""
+        self.run_id = uuid.uuid4().hex[:8]
+        self.sequence = count()
+        password = make_password(PASSWORD)
+        self.creator = CustomUser.objects.create(username=f'bench_{self.run_id}_creator', password=password,
+                                                 is_superuser=True, is_staff=True, balance_cents=10 ** 12)
+        self.hunter = CustomUser.objects.create(username=f'bench_{self.run_id}_hunter', password=password)
+        self.creator_headers = {'Authorization': f'Token {Token.objects.create(user=self.creator).key}'}
+        self.hunter_headers = {'Authorization': f'Token {Token.objects.create(user=self.hunter).key}'}
+        self.category = Category.objects.create(name=f'bench-{self.run_id}')
+        self.reward = self.create_rewards(1, 'waiting')[0][0]
+        self.application = self.create_rewards(1, 'applied')[1][0]
+
+    def create_rewards(self, total, status):
+        """批量创建 ``total`` 个处于 ``status`` 的悬赏；非 waiting 的悬赏由 hunter 接单并带一条申请"""
+        claimed = status != 'waiting'
+        rewards = Reward.objects.bulk_create([
+            Reward(title=f'bench {self.run_id} reward {next(self.sequence)}', description='benchmark fixture',
+                   category=self.category, creator=self.creator, receiver=self.hunter if claimed else None,
+                   reward_amount=Decimal('1.00'), status=status, application_count=int(claimed))
+            for _ in range(total)
+        ])
+        add_rewards_stats(rewards)
+        applications = RewardApplication.objects.bulk_create([
+            RewardApplication(reward=reward, applicant=self.hunter, is_accepted=status != 'applied')
+            for reward in rewards if claimed
+        ])
+        invalidate_rewards()
+        return rewards, applications
+
+    def get(self, route, args=(), headers=None, query=''):
+        path = reverse(route, args=args) + query
+        return lambda total: [BenchRequest('GET', path, headers=headers)] * total
+
+    def listing(self, route):
+        path = reverse(route)
+        if self.bypass_cache:
+            return lambda total: [BenchRequest('GET', f'{path}?page_size=20&_={next(self.sequence)}')
+                                  for _ in range(total)]
+        return lambda total: [BenchRequest('GET', f'{path}?page_size=20')] * total
+
+    def get_scenarios(self):
+        creator, hunter = self.creator_headers, self.hunter_headers
+        username = self.creator.username
+
+        def register(total):
+            return [BenchRequest('POST', reverse('user-registration'),
+                                 {'username': f'bench_{self.run_id}_{next(self.sequence)}', 'password': PASSWORD,
+                                  'email': ''})
+                    for _ in range(total)]
+
+        def apply(total):
+            rewards, _ = self.create_rewards(total, 'waiting')
+            return [BenchRequest('POST', reverse('application-list'), {'reward': reward.pk}, hunter)
+                    for reward in rewards]
+
+        def withdraw(total):
+            _, applications = self.create_rewards(total, 'applied')
+            return [BenchRequest('DELETE', reverse('application-detail', args=[application.pk]), headers=hunter)
+                    for application in applications]
+
+        def review(total):
+            _, applications = self.create_rewards(total, 'applied')
+            return [BenchRequest('POST', reverse('review_application', args=[application.pk]),
+                                 {'is_accepted': 'accept'}, creator)
+                    for application in applications]
+
+        def review_batch(total):
+            # 每个请求审核 10 个申请
+            _, applications = self.create_rewards(total * 10, 'applied')
+            return [BenchRequest('POST', reverse('review_applications'),
+                                 [{'application_id': application.pk, 'is_accepted': 'accept'}
+                                  for application in applications[index:index + 10]], creator)
+                    for index in range(0, total * 10, 10)]
+
+        def complete(total):
+            _, applications = self.create_rewards(total, 'in_progress')
+            return [BenchRequest('POST', reverse('update_reward_status', args=[application.pk]), headers=hunter)
+                    for application in applications]
+
+        def pay(total):
+            rewards, _ = self.create_rewards(total, 'completed')
+            return [BenchRequest('POST', reverse('pay_for_reward', args=[reward.pk]), {'status': 'payed'}, creator)
+                    for reward in rewards]
+
+        def bulk(total):
+            return [BenchRequest('POST', reverse('rewards-bulk'), [
+                {'title': f'bench bulk {i}', 'description': 'benchmark fixture', 'category': self.category.pk,
+                 'reward_amount': '1.00'} for i in range(10)
+            ], creator)] * total
+
+        def write(method, route, data, headers):
+            return lambda total: [BenchRequest(method, reverse(route), data, headers)] * total
+
+        return [
+            Scenario('user-registration', 'user-registration', register),
+            Scenario('user-login', 'user-login',
+                     write('POST', 'user-login', {'username': self.hunter.username, 'password': PASSWORD}, None)),
+            Scenario('async-user-login', 'async-user-login',
+                     write('POST', 'async-user-login', {'username': self.hunter.username, 'password': PASSWORD}, None),
+                     asgi=True),
+            Scenario('update-user', 'update-user', write('PATCH', 'update-user', {'first_name': 'Bench'}, hunter)),
+            Scenario('change-password', 'change-password',
+                     write('PUT', 'change-password', {'old_password': PASSWORD, 'new_password': PASSWORD}, hunter)),
+            Scenario('user_detail', 'user_detail', self.get('user_detail', [username], creator)),
+            Scenario('async-user-detail', 'async-user-detail', self.get('async-user-detail', [username], creator),
+                     asgi=True),
+            Scenario('leaderboard', 'leaderboard', self.get('leaderboard', headers=hunter)),
+            Scenario('update-balance', 'update-balance', write('PUT', 'update-balance', {'balance': '1.00'}, hunter)),
+            Scenario('category-list', 'category-list', self.get('category-list', headers=hunter)),
+            Scenario('category-detail', 'category-detail', self.get('category-detail', [self.category.pk], hunter)),
+            Scenario('rewards-list', 'rewards-list', self.get('rewards-list', headers=creator)),
+            Scenario('rewards-detail', 'rewards-detail', self.get('rewards-detail', [self.reward.pk], creator)),
+            Scenario('rewards-bulk', 'rewards-bulk', bulk),
+            Scenario('public-reward-list', 'public-reward-list', self.listing('public-reward-list')),
+            Scenario('async-public-reward-list', 'async-public-reward-list',
+                     self.listing('async-public-reward-list'), asgi=True),
+            Scenario('async-reward-detail', 'async-reward-detail',
+                     self.get('async-reward-detail', [self.reward.pk], creator), asgi=True),
+            Scenario('reward-search', 'reward-search', self.get('reward-search', query='?q=task')),
+            Scenario('category-stats', 'category-stats', self.get('category-stats')),
+            Scenario('activity-feed', 'activity-feed', self.get('activity-feed', headers=creator)),
+            Scenario('reward-recommendations', 'reward-recommendations',
+                     self.get('reward-recommendations', headers=hunter)),
+            Scenario('reward-export', 'reward-export', self.get('reward-export', headers=creator)),
+            Scenario('application-export', 'application-export', self.get('application-export', headers=creator)),
+            Scenario('application-list', 'application-list', self.get('application-list', headers=hunter)),
+            Scenario('application-list [POST]', 'application-list', apply),
+            Scenario('application-detail', 'application-detail',
+                     self.get('application-detail', [self.application.pk], hunter)),
+            Scenario('application-detail [DELETE]', 'application-detail', withdraw),
+            Scenario('review_application', 'review_application', review),
+            Scenario('review_applications', 'review_applications', review_batch),
+            Scenario('update_reward_status', 'update_reward_status', complete),
+            Scenario('pay_for_reward', 'pay_for_reward', pay),
+        ]
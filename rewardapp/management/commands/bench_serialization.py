@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from rewardapp.models import Reward
+from rewardapp.renderers import FastJSONRenderer
+from rewardapp.serializers import RewardSerializer, reward_row_mapper
+
+
+class Command(BaseCommand):
+    help = ('Compare rows per second of RewardSerializer + JSONRenderer against the values_list row mapper + '
+            'FastJSONRenderer on the same rewards, and check that both produce the same bytes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rewards rendered per round')
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        queryset = Reward.objects.select_related('category', 'creator').order_by('-created_at', '-id')
+        queryset = queryset[:options['rows']]
+        rows = len(queryset)
+        if not rows:
+            raise CommandError('No rewards to serialize, seed the database first')
+
+        def serializer_path():
+            return JSONRenderer().render(RewardSerializer(list(queryset.all()), many=True).data)
+
+        def row_path():
+            return FastJSONRenderer().render(reward_row_mapper.map(reward_row_mapper.values(queryset.all())))
+
+        if serializer_path() != row_path():
+            raise CommandError('The row mapper output differs from RewardSerializer')
+
+        results = {}
+        for label, render in (('serializer', serializer_path), ('row mapper', row_path)):
+            best = min(self.time(render) for _ in range(options['rounds']))
+            results[label] = rows / best
+            self.stdout.write(f'{label:<12} {rows} rows  best {best * 1000:8.2f}ms  {results[label]:>10.0f} rows/s')
+        self.stdout.write(f'speedup x{results["row mapper"] / results["serializer"]:.2f}')
+
+    def time(self, render):
+        started = time.perf_counter()
+        render()
+        return time.perf_counter() - started
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from rewardapp.expiry import expire_rewards, get_expiry_settings
+
+
+class Command(BaseCommand):
+    help = ('Cancel waiting and applied rewards past their deadline in set-based batches, releasing '
+            'receivers and clearing pending applications')
+
+    def add_arguments(self, parser):
+        config = get_expiry_settings()
+        parser.add_argument('--batch-size', type=int, default=config['BATCH_SIZE'])
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping every --interval seconds')
+        parser.add_argument('--interval', type=float, default=config['INTERVAL'])
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0 or options['interval'] <= 0:
+            raise CommandError('--batch-size and --interval must be positive')
+        while True:
+            started = time.perf_counter()
+            rewards, applications = expire_rewards(options['batch_size'])
+            if rewards or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Expired {rewards} rewards and cleared {applications} applications '
+                    f'in {time.perf_counter() - started:.2f}s'))
+            if not options['loop']:
+                return
+            # 与请求一样，长时间运行时丢弃失效的数据库连接
+            close_old_connections()
+            time.sleep(options['interval'])
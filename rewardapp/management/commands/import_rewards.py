@@ -0,0 +1,100 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rewardapp.cache import invalidate_rewards
+from rewardapp.models import Category, Reward
+from rewardapp.stats import add_rewards_stats
+from userapp.models import CustomUser
+
+STATUSES = {value for value, _ in Reward.STATUS_CHOICES}
+CENT = Decimal('0.01')
+# Reward.reward_amount 是 max_digits=10, decimal_places=2
+MAX_AMOUNT = Decimal('100000000')
+
+
+class Command(BaseCommand):
+    help = 'Stream rewards from a JSONL or CSV file into the Reward table in fixed-size chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--creator', required=True, help='Username that owns the imported rewards')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Input format, guessed from the file extension by default')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size must be positive')
+        try:
+            creator_id = CustomUser.objects.values_list('pk', flat=True).get(username=options['creator'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'Unknown creator {options["creator"]!r}')
+        # 分类表很小，一次性读入内存，导入过程中不再逐行查询
+        self.categories = dict(Category.objects.values_list('name', 'pk'))
+
+        imported = skipped = 0
+        started = time.monotonic()
+        with open(path, newline='', encoding='utf-8') as stream:
+            records = csv.DictReader(stream) if input_format == 'csv' else self.read_jsonl(stream)
+            rewards = self.build_rewards(records, creator_id)
+            while True:
+                chunk = list(islice(rewards, chunk_size))
+                if not chunk:
+                    break
+                batch = [reward for reward in chunk if reward is not None]
+                skipped += len(chunk) - len(batch)
+                with transaction.atomic():
+                    Reward.objects.bulk_create(batch)
+                    add_rewards_stats(batch)
+                imported += len(batch)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{imported} rows imported')
+        invalidate_rewards()
+
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} rewards ({skipped} skipped) in {elapsed:.2f}s, {rate:.0f} rows/s'
+        ))
+
+    def read_jsonl(self, stream):
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+
+    def build_rewards(self, records, creator_id):
+        for line_number, record in enumerate(records, start=1):
+            reward = self.build_reward(record, creator_id) if isinstance(record, dict) else None
+            if reward is None:
+                self.stderr.write(f'Skipping record {line_number}')
+            yield reward
+
+    def build_reward(self, record, creator_id):
+        title = (record.get('title') or '').strip()
+        status = record.get('status') or 'waiting'
+        category_name = record.get('category') or record.get('category_name')
+        try:
+            amount = Decimal(str(record.get('reward_amount')))
+        except InvalidOperation:
+            return None
+        if not amount.is_finite() or amount != amount.quantize(CENT) or not 0 < amount < MAX_AMOUNT:
+            return None
+        if not title or len(title) > 200 or status not in STATUSES:
+            return None
+        if category_name and category_name not in self.categories:
+            return None
+        return Reward(title=title, description=record.get('description') or '', reward_amount=amount,
+                      status=status, category_id=self.categories.get(category_name), creator_id=creator_id)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rewardapp.activity import get_activity_settings, prune
+
+
+class Command(BaseCommand):
+    help = 'Delete activity feed entries older than the retention period in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=get_activity_settings()['RETENTION_DAYS'])
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] <= 0:
+            raise CommandError('--days must not be negative and --batch-size must be positive')
+        total = prune(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Pruned {total} activities'))
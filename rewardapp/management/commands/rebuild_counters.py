@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from rewardapp.cache import invalidate_rewards
+from rewardapp.stats import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute Reward.application_count and CategoryStats from the source tables to repair drift'
+
+    def handle(self, *args, **options):
+        rebuild_counters()
+        invalidate_rewards()
+        self.stdout.write(self.style.SUCCESS('Counters rebuilt'))
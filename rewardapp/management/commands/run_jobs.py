@@ -0,0 +1,64 @@
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from rewardapp.jobs import execute, get_job_settings, requeue_expired, run_batch, run_inline
+
+
+class Command(BaseCommand):
+    help = ('Run queued background jobs on a thread or process pool. Jobs are claimed in batches and the '
+            'poll interval grows while the queue is empty, so an idle worker costs SQLite almost nothing')
+
+    def add_arguments(self, parser):
+        config = get_job_settings()
+        parser.add_argument('--workers', type=int, default=config['WORKERS'],
+                            help='Pool size; 0 runs jobs one by one in this process')
+        parser.add_argument('--pool', choices=['thread', 'process'], default=config['POOL'])
+        parser.add_argument('--batch-size', type=int, default=config['BATCH_SIZE'])
+        parser.add_argument('--poll-interval', type=float, default=config['POLL_INTERVAL'])
+        parser.add_argument('--once', action='store_true', help='Exit when no job is due instead of polling')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 0 or options['batch_size'] <= 0:
+            raise CommandError('--workers must not be negative and --batch-size must be positive')
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+        if options['workers'] == 0:
+            return self.loop(worker_id, run_inline, options)
+        if options['pool'] == 'process':
+            # 子进程不能沿用父进程打开的数据库连接，fork 之前全部关闭
+            connections.close_all()
+            pool = ProcessPoolExecutor(options['workers'])
+        else:
+            pool = ThreadPoolExecutor(options['workers'], thread_name_prefix='job')
+        with pool:
+            self.loop(worker_id, lambda name, payload: pool.submit(execute, name, payload), options)
+
+    def loop(self, worker_id, submit, options):
+        config = get_job_settings()
+        # 一批至少喂满整个池
+        limit = max(options['batch_size'], options['workers'])
+        interval = options['poll_interval']
+        total = 0
+        last_requeue = 0
+        while True:
+            now = time.monotonic()
+            if now - last_requeue > config['LEASE_SECONDS'] / 2:
+                requeue_expired(config['LEASE_SECONDS'])
+                last_requeue = now
+
+            ran = run_batch(worker_id, submit, limit)
+            total += ran
+            if ran:
+                interval = options['poll_interval']
+                continue
+            if options['once']:
+                break
+            time.sleep(interval)
+            # 队列空闲时逐步拉长轮询间隔
+            interval = min(interval * 2, config['MAX_POLL_INTERVAL'])
+        self.stdout.write(self.style.SUCCESS(f'Ran {total} jobs'))
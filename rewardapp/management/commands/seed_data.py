@@ -0,0 +1,135 @@
+import random
+import time
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rewardapp.cache import invalidate_rewards
+from rewardapp.models import Category, Reward, RewardApplication
+from rewardapp.stats import rebuild_counters
+from userapp.ledger import to_cents
+from userapp.models import CustomUser
+
+# 状态 -> 权重，大致模拟线上分布：多数悬赏挂单中，其余分布在流程的各个阶段
+STATUS_WEIGHTS = {
+    'waiting': 50, 'applied': 10, 'in_progress': 10, 'completed': 8, 'payed': 15, 'callback': 3,
+    'cancelled': 2, 'take_down': 2,
+}
+# 这些状态的悬赏都有接单人和一条申请记录
+CLAIMED_STATUSES = {'applied', 'in_progress', 'completed', 'payed', 'callback'}
+ACCEPTED_STATUSES = {'in_progress', 'completed', 'payed', 'callback'}
+WORDS = ('api', 'bug', 'crawler', 'dashboard', 'django', 'docker', 'frontend', 'login', 'mobile', 'payment',
+         'python', 'react', 'report', 'search', 'security', 'sqlite', 'test', 'upload', 'vue', 'websocket')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with generated users, categories, rewards and applications using bulk inserts, '
+            'for benchmarking. Passwords are not hashed per user unless --hash-each-password is given')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--rewards', type=int, default=10000)
+        parser.add_argument('--prefix', default='seed', help='Prefix of generated usernames and category names')
+        parser.add_argument('--password', help='Give every user this password, hashed once and shared; '
+                                               'without it users get an unusable password')
+        parser.add_argument('--hash-each-password', action='store_true',
+                            help='Hash --password separately for every user, as registration would')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible data')
+
+    def handle(self, *args, **options):
+        users, rewards = options['users'], options['rewards']
+        if users < 2 or options['categories'] < 0 or rewards < 0 or options['batch_size'] <= 0:
+            raise CommandError('Need at least 2 users and non-negative counts')
+        if options['hash_each_password'] and not options['password']:
+            raise CommandError('--hash-each-password needs --password')
+        prefix = options['prefix']
+        if CustomUser.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Users with prefix {prefix!r} already exist, pick another --prefix')
+
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        with transaction.atomic():
+            user_ids = self.create_users(users, prefix, options['password'], options['hash_each_password'])
+            category_ids = self.create_categories(options['categories'], prefix)
+            applications = self.create_rewards(rewards, user_ids, category_ids)
+            # 计数表与申请数按源表整体重算，比逐批维护更快
+            rebuild_counters()
+        invalidate_rewards()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {users} users, {len(category_ids)} categories, {rewards} rewards and {applications} '
+            f'applications in {elapsed:.2f}s'
+        ))
+
+    def create_users(self, count, prefix, password, hash_each):
+        shared_password = make_password(password) if password and not hash_each else None
+        for batch in batched(range(count), self.batch_size):
+            CustomUser.objects.bulk_create([
+                CustomUser(username=f'{prefix}_{i}', email=f'{prefix}_{i}@example.com',
+                           password=make_password(password) if hash_each else shared_password or make_password(None),
+                           balance_cents=self.random.randrange(0, 1000000),
+                           code_age=self.random.randrange(0, 20))
+                for i in batch
+            ])
+        return list(CustomUser.objects.filter(username__startswith=f'{prefix}_').values_list('pk', flat=True))
+
+    def create_categories(self, count, prefix):
+        Category.objects.bulk_create([
+            Category(name=f'{prefix}-{WORDS[i % len(WORDS)]}-{i}', description=f'Generated category {i}')
+            for i in range(count)
+        ])
+        return list(Category.objects.filter(name__startswith=f'{prefix}-').values_list('pk', flat=True))
+
+    def create_rewards(self, count, user_ids, category_ids):
+        statuses, weights = zip(*STATUS_WEIGHTS.items())
+        earned = {}
+        applications = 0
+        for batch in batched(range(count), self.batch_size):
+            rewards = []
+            for i in batch:
+                status = self.random.choices(statuses, weights)[0]
+                creator_id, receiver_id = self.random.sample(user_ids, 2)
+                amount = Decimal(self.random.randrange(100, 500000)) / 100
+                words = self.random.sample(WORDS, 3)
+                rewards.append(Reward(
+                    title=f'{words[0]} {words[1]} task {i}',
+                    description=f'Need help with {" ".join(words)}.',
+                    category_id=self.random.choice(category_ids) if category_ids else None,
+                    creator_id=creator_id,
+                    receiver_id=receiver_id if status in CLAIMED_STATUSES else None,
+                    reward_amount=amount,
+                    status=status,
+                ))
+                if status == 'payed':
+                    tasks, cents = earned.get(receiver_id, (0, 0))
+                    earned[receiver_id] = tasks + 1, cents + to_cents(amount)
+
+            rewards = Reward.objects.bulk_create(rewards)
+            claimed = [RewardApplication(reward=reward, applicant_id=reward.receiver_id,
+                                         is_accepted=reward.status in ACCEPTED_STATUSES)
+                       for reward in rewards if reward.status in CLAIMED_STATUSES]
+            RewardApplication.objects.bulk_create(claimed)
+            applications += len(claimed)
+
+        # 排行榜的累计列与已结款的悬赏保持一致
+        users = CustomUser.objects.in_bulk(earned)
+        for user_id, (tasks, cents) in earned.items():
+            users[user_id].completed_tasks = tasks
+            users[user_id].total_earned_cents = cents
+        CustomUser.objects.bulk_update(users.values(), ['completed_tasks', 'total_earned_cents'],
+                                       batch_size=self.batch_size)
+        return applications
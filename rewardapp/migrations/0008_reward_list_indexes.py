@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewardapp', '0007_alter_reward_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reward',
+            index=models.Index(fields=['created_at', 'id'], name='reward_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reward',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='reward_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reward',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='reward_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reward',
+            index=models.Index(fields=['category', 'status', 'created_at', 'id'], name='reward_cat_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reward',
+            index=models.Index(fields=['creator', 'created_at', 'id'], name='reward_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reward',
+            index=models.Index(fields=['creator', 'status', 'created_at', 'id'], name='reward_creator_status_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+import django.db.models.deletion
+import rewardapp.search
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in rewardapp.search.CREATE_SEARCH_INDEX_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in rewardapp.search.DROP_SEARCH_INDEX_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewardapp', '0008_reward_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RewardSearch',
+            fields=[
+                ('reward', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='rewardapp.reward')),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+                ('document', rewardapp.search.FTSDocumentField(db_column='RewardSearch')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'RewardSearch',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
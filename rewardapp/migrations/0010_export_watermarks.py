@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_application_updated_at(apps, schema_editor):
+    RewardApplication = apps.get_model('rewardapp', 'RewardApplication')
+    RewardApplication.objects.update(updated_at=models.F('application_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewardapp', '0009_reward_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rewardapplication',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_application_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='reward',
+            index=models.Index(fields=['updated_at', 'id'], name='reward_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rewardapplication',
+            index=models.Index(fields=['updated_at', 'id'], name='application_updated_idx'),
+        ),
+    ]
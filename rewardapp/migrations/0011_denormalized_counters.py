@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    Reward = apps.get_model('rewardapp', 'Reward')
+    RewardApplication = apps.get_model('rewardapp', 'RewardApplication')
+    CategoryStats = apps.get_model('rewardapp', 'CategoryStats')
+
+    counts = RewardApplication.objects.order_by().values('reward_id').annotate(total=models.Count('pk'))
+    for row in counts.iterator():
+        Reward.objects.filter(pk=row['reward_id']).update(application_count=row['total'])
+
+    rows = Reward.objects.order_by().values('category_id', 'status').annotate(
+        reward_count=models.Count('pk'), amount=models.Sum('reward_amount'))
+    CategoryStats.objects.bulk_create([
+        CategoryStats(category_id=row['category_id'], status=row['status'], reward_count=row['reward_count'],
+                      amount_cents=int(round((row['amount'] or 0) * 100)))
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewardapp', '0010_export_watermarks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reward',
+            name='application_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('applied', 'Applied'), ('waiting', 'Waiting'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('payed', 'Payed'), ('callback', 'Callback'), ('cancelled', 'Cancelled'), ('take_down', 'TakeDown')], max_length=20)),
+                ('reward_count', models.IntegerField(default=0)),
+                ('amount_cents', models.BigIntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='rewardapp.category')),
+            ],
+            options={
+                'db_table': 'CategoryStats',
+                'constraints': [models.UniqueConstraint(fields=('category', 'status'), name='category_stats_unique')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
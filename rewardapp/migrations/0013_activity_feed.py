@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewardapp', '0012_job_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('application_created', 'Application created'), ('application_withdrawn', 'Application withdrawn'), ('application_accepted', 'Application accepted'), ('application_rejected', 'Application rejected'), ('reward_completed', 'Reward completed'), ('reward_payed', 'Reward payed'), ('reward_callback', 'Reward callback')], max_length=30)),
+                ('reward_id', models.BigIntegerField()),
+                ('reward_title', models.CharField(max_length=200)),
+                ('application_id', models.BigIntegerField(blank=True, null=True)),
+                ('actor_username', models.CharField(max_length=150)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='activities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'Activity',
+                'indexes': [models.Index(fields=['user', 'id'], name='activity_user_idx'), models.Index(fields=['created_at', 'id'], name='activity_created_idx')],
+            },
+        ),
+    ]
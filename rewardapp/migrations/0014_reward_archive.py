@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewardapp', '0013_activity_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReward',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('reward_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('applied', 'Applied'), ('waiting', 'Waiting'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('payed', 'Payed'), ('callback', 'Callback'), ('cancelled', 'Cancelled'), ('take_down', 'TakeDown')], max_length=20)),
+                ('application_count', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField()),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='rewardapp.category')),
+                ('creator', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('receiver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'RewardArchive',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedRewardApplication',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('application_date', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('is_accepted', models.BooleanField(default=False)),
+                ('applicant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('reward', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='applications', to='rewardapp.archivedreward')),
+            ],
+            options={
+                'db_table': 'RewardApplicationArchive',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedreward',
+            index=models.Index(fields=['creator', 'id'], name='reward_archive_creator_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewardapp', '0014_reward_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedreward',
+            name='deadline',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reward',
+            name='deadline',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='activity',
+            name='verb',
+            field=models.CharField(choices=[('application_created', 'Application created'), ('application_withdrawn', 'Application withdrawn'), ('application_accepted', 'Application accepted'), ('application_rejected', 'Application rejected'), ('reward_completed', 'Reward completed'), ('reward_payed', 'Reward payed'), ('reward_callback', 'Reward callback'), ('reward_expired', 'Reward expired')], max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='reward',
+            index=models.Index(fields=['status', 'deadline', 'id'], name='reward_status_deadline_idx'),
+        ),
+    ]
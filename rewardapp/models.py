@@ -1,7 +1,11 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 
+from .cache import invalidate_rewards
+from .search import FTSDocumentField
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -36,22 +40,245 @@ class Reward(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    # 截止时间，过期仍在 waiting/applied 的悬赏由 expire_rewards 命令批量取消
+    deadline = models.DateTimeField(null=True, blank=True)
+    # 冗余计数，由 RewardApplication.save / post_delete 信号维护，rebuild_counters 命令可修复漂移
+    application_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.title
 
+    STATS_FIELDS = ('category_id', 'status', 'reward_amount')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._take_stats_snapshot()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._take_stats_snapshot()
+
+    def _take_stats_snapshot(self):
+        # 只读过部分字段的实例（.only()/.defer()）无法得知旧值，不参与统计
+        if self.get_deferred_fields() & set(self.STATS_FIELDS):
+            self._stats_snapshot = None
+        else:
+            self._stats_snapshot = self.stats_key()
+
+    def stats_key(self):
+        """(category_id, status, reward_amount)：决定本悬赏计入 CategoryStats 的哪一行"""
+        return tuple(getattr(self, field) for field in self.STATS_FIELDS)
+
+    def save(self, *args, **kwargs):
+        from .stats import move_reward_stats
+
+        adding = self._state.adding
+        if not adding and kwargs.get('update_fields') is None:
+            # 整行保存时不写回 application_count，避免用实例里的旧值覆盖并发的 F() 自增
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [field.attname for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.attname not in deferred
+                                       and field.name != 'application_count']
+
+        previous = None if adding else getattr(self, '_stats_snapshot', None)
+        update_fields = kwargs.get('update_fields')
+        if not adding and (previous is None or not {
+                'category', 'category_id', 'status', 'reward_amount'} & set(update_fields)):
+            return super().save(*args, **kwargs)
+
+        # 与分类统计的增减放在同一事务中
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            current = self.stats_key()
+            if update_fields is not None:
+                saved = {'category_id' if name == 'category' else name for name in update_fields}
+                current = tuple(new if field in saved else old
+                                for field, old, new in zip(self.STATS_FIELDS, previous, current))
+            move_reward_stats(previous, current)
+            self._stats_snapshot = current
+
     class Meta:
         db_table = 'Reward'
+        indexes = [
+            # 与 PublicRewardListView 的各种过滤组合一一对应，保证 (created_at, id) 游标分页走索引范围扫描
+            models.Index(fields=['created_at', 'id'], name='reward_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='reward_status_created_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='reward_cat_created_idx'),
+            models.Index(fields=['category', 'status', 'created_at', 'id'], name='reward_cat_status_created_idx'),
+            models.Index(fields=['creator', 'created_at', 'id'], name='reward_creator_created_idx'),
+            models.Index(fields=['creator', 'status', 'created_at', 'id'], name='reward_creator_status_idx'),
+            # 增量导出按 updated_at 水位线读取
+            models.Index(fields=['updated_at', 'id'], name='reward_updated_idx'),
+            # 过期清理按状态取 deadline 最早的一批
+            models.Index(fields=['status', 'deadline', 'id'], name='reward_status_deadline_idx'),
+        ]
+
+
+class RewardSearch(models.Model):
+    """
+    SQLite FTS5 外部内容索引，由迁移 0009 中的触发器随 Reward 的增删改增量维护。
+    其他数据库上这张表不存在，rewardapp.search 会退回到普通的 LIKE 查询。
+    """
+    reward = models.OneToOneField(Reward, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING,
+                                  db_constraint=False, related_name='search_entry')
+    title = models.TextField()
+    description = models.TextField()
+    document = FTSDocumentField(db_column='RewardSearch')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'RewardSearch'
+
+
+class CategoryStats(models.Model):
+    """每个 (分类, 状态) 的悬赏数量与赏金总额（分），category 为空表示未分类"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, related_name='stats')
+    status = models.CharField(max_length=20, choices=Reward.STATUS_CHOICES)
+    reward_count = models.IntegerField(default=0)
+    amount_cents = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'CategoryStats'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'status'], name='category_stats_unique'),
+        ]
 
 
 class RewardApplication(models.Model):
     reward = models.ForeignKey(Reward, on_delete=models.CASCADE, related_name='applications')
     applicant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='applications')
     application_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_accepted = models.BooleanField(default=False)
 
     def __str__(self):
         return f"{self.applicant.username} - {self.reward.title}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            Reward.objects.filter(pk=self.reward_id).update(application_count=F('application_count') + 1)
+            # application_count 在公开列表里，update() 不发 post_save，要自己让缓存失效
+            invalidate_rewards(using=kwargs.get('using'))
+
     class Meta:
         db_table = 'RewardApplication'
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='application_updated_idx'),
+        ]
+
+
+class ArchivedReward(models.Model):
+    """已结束且长期未变动的悬赏，由 archive_rewards 从 Reward 整行移入，id 不变；不计入公开列表和搜索，统计不变"""
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='+')
+    # (creator, id) 复合索引已覆盖按发布者查询
+    creator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                                db_index=False)
+    receiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                                 null=True, blank=True)
+    reward_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Reward.STATUS_CHOICES)
+    deadline = models.DateTimeField(null=True, blank=True)
+    application_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        db_table = 'RewardArchive'
+        indexes = [
+            models.Index(fields=['creator', 'id'], name='reward_archive_creator_idx'),
+        ]
+
+
+class ArchivedRewardApplication(models.Model):
+    """随所属悬赏一起归档的申请"""
+    id = models.BigIntegerField(primary_key=True)
+    reward = models.ForeignKey(ArchivedReward, on_delete=models.CASCADE, related_name='applications')
+    applicant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    application_date = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    is_accepted = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.applicant.username} - {self.reward.title}"
+
+    class Meta:
+        db_table = 'RewardApplicationArchive'
+
+
+class Job(models.Model):
+    """后台任务队列中的一条任务，入队、领取与重试见 rewardapp.jobs"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),  # 等待执行（含等待重试）
+        ('running', 'Running'),  # 已被 worker 领取
+        ('failed', 'Failed'),  # 重试次数用尽
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        db_table = 'Job'
+        indexes = [
+            # worker 按 (status, run_at) 范围扫描领取到期任务
+            models.Index(fields=['status', 'run_at', 'id'], name='job_claim_idx'),
+        ]
+
+
+class Activity(models.Model):
+    """用户动态流，每个相关用户各写一行，客户端用 id 作游标增量拉取；标题和用户名冗余保存，读取不连表"""
+    VERB_CHOICES = [
+        ('application_created', 'Application created'),  # 收到/提交申请
+        ('application_withdrawn', 'Application withdrawn'),  # 申请被撤回
+        ('application_accepted', 'Application accepted'),  # 申请通过
+        ('application_rejected', 'Application rejected'),  # 申请被驳回
+        ('reward_completed', 'Reward completed'),  # 提交完成
+        ('reward_payed', 'Reward payed'),  # 已结款
+        ('reward_callback', 'Reward callback'),  # 被打回
+        ('reward_expired', 'Reward expired'),  # 过截止时间被自动取消
+    ]
+
+    # (user, id) 复合索引已覆盖按用户查询，外键不再单独建索引
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='activities',
+                             db_index=False)
+    verb = models.CharField(max_length=30, choices=VERB_CHOICES)
+    reward_id = models.BigIntegerField()
+    reward_title = models.CharField(max_length=200)
+    application_id = models.BigIntegerField(null=True, blank=True)
+    actor_username = models.CharField(max_length=150)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.user_id} {self.verb} {self.reward_id}'
+
+    class Meta:
+        db_table = 'Activity'
+        indexes = [
+            # 每次拉取都是 WHERE user_id = %s AND id > %s ORDER BY id 的索引范围扫描
+            models.Index(fields=['user', 'id'], name='activity_user_idx'),
+            # 按保留期清理
+            models.Index(fields=['created_at', 'id'], name='activity_created_idx'),
+        ]
@@ -0,0 +1,35 @@
+from django.core.mail import send_mail
+
+from .jobs import register
+from .models import RewardApplication
+
+
+def notify(user, subject, message):
+    # 用户没有填写邮箱时无处可发，视为完成
+    if user.email:
+        send_mail(subject, message, None, [user.email])
+
+
+@register('notify-application')
+def notify_application(application_id):
+    """告诉发布者悬赏收到了新申请"""
+    application = RewardApplication.objects.select_related('reward__creator', 'applicant').filter(
+        pk=application_id).first()
+    if application is None:
+        # 申请在任务执行前已被撤回
+        return
+    reward = application.reward
+    notify(reward.creator, f'悬赏「{reward.title}」收到了新的申请',
+           f'{application.applicant.username} 申请了你发布的悬赏「{reward.title}」，请及时审核。')
+
+
+@register('notify-review')
+def notify_review(application_id, accepted):
+    """告诉申请人审核结果"""
+    application = RewardApplication.objects.select_related('reward', 'applicant').filter(pk=application_id).first()
+    if application is None:
+        return
+    reward = application.reward
+    result = '已通过' if accepted else '未通过'
+    notify(application.applicant, f'你对悬赏「{reward.title}」的申请{result}审核',
+           f'你对悬赏「{reward.title}」的申请{result}审核。')
@@ -0,0 +1,102 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class RewardCursorPagination(BasePagination):
+    """按 (created_at, id) 游标分页，新的在前；翻到多深都只走一次索引范围扫描"""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    # 游标取自这两列，只读部分字段的查询也要带上
+    key_columns = ('created_at', 'id')
+    invalid_cursor_message = '无效的分页游标'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, obj):
+        payload = json.dumps([obj.created_at.isoformat(), obj.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (binascii.Error, TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def get_page_queryset(self, queryset, request):
+        """返回当前页的惰性切片，多取一行用来判断是否还有下一页"""
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            # 单独的 created_at <= x 让索引可以范围扫描，OR 再在其中按 id 区分同一时刻的行
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+            )
+        return queryset.order_by(*self.ordering)[:self.page_size_value + 1]
+
+    def paginate_rows(self, rows):
+        rows = list(rows)
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_next else None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_rows(self.get_page_queryset(queryset, request))
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class RewardSearchPagination(PageNumberPagination):
+    """搜索结果按相关度排序，没有稳定的 (created_at, id) 键，只能按页码分页"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
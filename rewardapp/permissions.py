@@ -10,11 +10,11 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.creator == request.user and obj.status == 'waiting'
+        return obj.creator_id == request.user.pk and obj.status in ('waiting', 'take_down')
 
 
 class IsApplicantOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.applicant == request.user and not obj.is_accepted
\ No newline at end of file
+        return obj.applicant_id == request.user.pk and not obj.is_accepted
\ No newline at end of file
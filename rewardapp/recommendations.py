@@ -0,0 +1,123 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+
+from .cache import get_rewards_version
+from .models import ArchivedRewardApplication, Reward, RewardApplication
+
+
+def get_recommendation_settings():
+    return {
+        'AFFINITY_WEIGHT': 1.0,
+        'AMOUNT_WEIGHT': 0.5,
+        'REFRESH_SECONDS': 300,
+        'MIN_REFRESH_SECONDS': 10,
+        'PAGE_SIZE': 20,
+        'MAX_PAGE_SIZE': 100,
+        **getattr(settings, 'RECOMMENDATIONS', {}),
+    }
+
+
+class Snapshot:
+    """推荐用数组的一份不可变快照；affinity 为用户 x 分类的偏好占比，挂单悬赏按分类列分组排列，
+    用 np.repeat 即可把用户的分类权重展开成每个悬赏的分数"""
+
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+
+        # 用户 x 分类：被接受的申请数，已归档的申请同样计入；同一 (用户, 分类) 的两行由 np.add.at 相加
+        pairs = np.array(
+            [row for model in (RewardApplication, ArchivedRewardApplication)
+             for row in model.objects.filter(is_accepted=True).order_by()
+             .values_list('applicant_id', 'reward__category_id').annotate(n=Count('id'))],
+            dtype=object,
+        ).reshape(-1, 3)
+        open_rewards = np.array(
+            Reward.objects.filter(status='waiting').order_by('-created_at', '-id')
+            .values_list('id', 'category_id', 'creator_id', 'reward_amount'),
+            dtype=object,
+        ).reshape(-1, 4)
+
+        # 分类列只包含实际出现过的分类，未分类（None）也占一列
+        categories = {category_id for category_id in (*pairs[:, 1], *open_rewards[:, 1])}
+        column = {category_id: index for index, category_id in enumerate(sorted(categories, key=lambda c: c or 0))}
+        to_columns = np.vectorize(column.__getitem__, otypes=[np.intp])
+
+        self.user_ids = np.unique(pairs[:, 0].astype(np.int64))
+        self.affinity = np.zeros((len(self.user_ids), len(column)), dtype=np.float32)
+        if len(pairs):
+            rows = np.searchsorted(self.user_ids, pairs[:, 0].astype(np.int64))
+            np.add.at(self.affinity, (rows, to_columns(pairs[:, 1])), pairs[:, 2].astype(np.float32))
+            self.affinity /= self.affinity.sum(axis=1, keepdims=True)
+
+        # 分类 -> 挂单中悬赏：按分类列分组，组内保持新到旧
+        columns = to_columns(open_rewards[:, 1]) if len(open_rewards) else np.zeros(0, dtype=np.intp)
+        order = np.argsort(columns, kind='stable')
+        self.counts = np.bincount(columns, minlength=len(column))
+        self.reward_ids = open_rewards[order, 0].astype(np.int64)
+        self.creator_ids = open_rewards[order, 2].astype(np.int64)
+        amounts = np.log1p(open_rewards[order, 3].astype(np.float64))
+        self.amount_scores = (amounts / amounts.max() if len(amounts) and amounts.max() > 0 else amounts).astype(
+            np.float32)
+
+    def recommend(self, user_id, limit):
+        """为 user_id 推荐的前 limit 个悬赏 id，排除用户自己发布的"""
+        config = get_recommendation_settings()
+        row = np.searchsorted(self.user_ids, user_id)
+        if row < len(self.user_ids) and self.user_ids[row] == user_id:
+            weights = self.affinity[row] * config['AFFINITY_WEIGHT']
+        else:
+            # 没有完成记录的用户只按赏金排序
+            weights = np.zeros(len(self.counts), dtype=np.float32)
+        scores = np.repeat(weights, self.counts) + self.amount_scores * config['AMOUNT_WEIGHT']
+        scores[self.creator_ids == user_id] = -np.inf
+
+        k = min(limit, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        # 同分时按布局顺序（同一分类内新的在前）
+        top = top[np.lexsort((top, -scores[top]))]
+        return self.reward_ids[top].tolist()
+
+
+class Recommender:
+    """持有当前快照：超过 REFRESH_SECONDS，或悬赏有变化且超过 MIN_REFRESH_SECONDS 时重建；
+    只有第一次构建会阻塞，之后由发现过期的请求重建，其他请求继续用旧快照"""
+
+    def __init__(self):
+        self.snapshot = None
+        self._lock = threading.Lock()
+
+    def is_stale(self, snapshot):
+        config = get_recommendation_settings()
+        age = time.monotonic() - snapshot.built_at
+        if age >= config['REFRESH_SECONDS']:
+            return True
+        return age >= config['MIN_REFRESH_SECONDS'] and get_rewards_version() != snapshot.version
+
+    def refresh(self):
+        # 先取版本号再查询，构建期间发生的写入会让下一次检查再次刷新
+        self.snapshot = Snapshot(get_rewards_version())
+
+    def get_snapshot(self):
+        if self.snapshot is None:
+            with self._lock:
+                if self.snapshot is None:
+                    self.refresh()
+        elif self.is_stale(self.snapshot) and self._lock.acquire(blocking=False):
+            try:
+                self.refresh()
+            finally:
+                self._lock.release()
+        return self.snapshot
+
+    def recommend(self, user_id, limit):
+        return self.get_snapshot().recommend(user_id, limit)
+
+
+recommender = Recommender()
@@ -0,0 +1,22 @@
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+
+class FastJSONRenderer(JSONRenderer):
+    """输出与 JSONRenderer 完全相同，但复用预先构造的 encoder，不必每次响应都新建 JSONEncoder"""
+    encoder = encoders.JSONEncoder(
+        ensure_ascii=not api_settings.UNICODE_JSON, allow_nan=not api_settings.STRICT_JSON,
+        separators=SHORT_SEPARATORS if api_settings.COMPACT_JSON else LONG_SEPARATORS,
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # 需要缩进（可浏览 API 或 ?indent=）时走父类
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = self.encoder.encode(data)
+        return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
@@ -0,0 +1,111 @@
+from django.db import connections, models
+from django.db.models import Case, IntegerField, Q, Value, When
+
+# trigram 分词器只能匹配长度 >= 3 的片段，更短的词退回到 LIKE 过滤
+FTS_MIN_TERM_LENGTH = 3
+
+CREATE_SEARCH_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS "RewardSearch" USING fts5(
+        title, description, content='Reward', content_rowid='id', tokenize='trigram case_sensitive 0'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS "RewardSearch_ai" AFTER INSERT ON "Reward" BEGIN
+        INSERT INTO "RewardSearch"(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS "RewardSearch_ad" AFTER DELETE ON "Reward" BEGIN
+        INSERT INTO "RewardSearch"("RewardSearch", rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS "RewardSearch_au" AFTER UPDATE OF title, description ON "Reward" BEGIN
+        INSERT INTO "RewardSearch"("RewardSearch", rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO "RewardSearch"(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """INSERT INTO "RewardSearch"("RewardSearch") VALUES ('rebuild')""",
+]
+
+SEARCH_TRIGGERS = ('RewardSearch_ai', 'RewardSearch_ad', 'RewardSearch_au')
+
+DROP_SEARCH_INDEX_SQL = [
+    'DROP TRIGGER IF EXISTS "RewardSearch_au"',
+    'DROP TRIGGER IF EXISTS "RewardSearch_ad"',
+    'DROP TRIGGER IF EXISTS "RewardSearch_ai"',
+    'DROP TABLE IF EXISTS "RewardSearch"',
+]
+
+
+class FTSDocumentField(models.TextField):
+    """FTS5 表中与表同名的隐藏列，只用于 ``__match`` 查询"""
+
+
+@FTSDocumentField.register_lookup
+class FTSMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+def supports_fts(using):
+    return connections[using].vendor == 'sqlite'
+
+
+def ensure_search_index(using):
+    """迁移重建 Reward 表时会连带删除 FTS 触发器，每次 migrate 后检查并重建触发器和索引"""
+    if not supports_fts(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+                       ['RewardSearch', *SEARCH_TRIGGERS])
+        existing = {row[0] for row in cursor.fetchall()}
+        if 'RewardSearch' not in existing or existing.issuperset(SEARCH_TRIGGERS):
+            return
+        for statement in CREATE_SEARCH_INDEX_SQL:
+            cursor.execute(statement)
+
+
+def split_terms(text):
+    return [term for term in text.split() if term]
+
+
+def build_match_expression(terms):
+    # 每个词都作为带引号的短语传入，用户输入中的 FTS 运算符不会被解释，也不会触发语法错误
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def contains_all(terms):
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    return condition
+
+
+def search_rewards(queryset, text):
+    """在标题或描述中搜索，相关度高的在前；SQLite 上长词走 FTS5 索引按 bm25 排序，其他数据库退回 icontains"""
+    terms = split_terms(text)
+    if not terms:
+        return queryset.none()
+
+    indexed = [term for term in terms if len(term) >= FTS_MIN_TERM_LENGTH]
+    if indexed and supports_fts(queryset.db):
+        short = [term for term in terms if len(term) < FTS_MIN_TERM_LENGTH]
+        queryset = queryset.filter(search_entry__document__match=build_match_expression(indexed))
+        if short:
+            queryset = queryset.filter(contains_all(short))
+        return queryset.order_by('search_entry__rank', '-id')
+
+    title_hit = Q()
+    for term in terms:
+        title_hit &= Q(title__icontains=term)
+    return queryset.filter(contains_all(terms)).annotate(
+        search_rank=Case(When(title_hit, then=Value(0)), default=Value(1), output_field=IntegerField())
+    ).order_by('search_rank', '-created_at', '-id')
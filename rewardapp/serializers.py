@@ -1,23 +1,86 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from HackIt2.fieldsets import SparseFieldsSerializerMixin
+from userapp.ledger import format_cents
+from .cache import invalidate_rewards
 from .models import *
+from .rows import RowMapper
+from .stats import add_rewards_stats
+from .transitions import require_transition
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'description']
 
 
-class RewardSerializer(serializers.ModelSerializer):
+class CategoryField(serializers.PrimaryKeyRelatedField):
+    """批量校验时从 context['category_cache'] 取分类，整批只查询一次"""
+
+    def to_internal_value(self, data):
+        category_cache = self.context.get('category_cache')
+        if category_cache is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in category_cache:
+            self.fail('does_not_exist', pk_value=data)
+        return category_cache[pk]
+
+
+class RewardBulkSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            pks = set()
+            for item in data:
+                if isinstance(item, dict) and not isinstance(item.get('category'), (bool, type(None))):
+                    try:
+                        pks.add(int(item['category']))
+                    except (TypeError, ValueError):
+                        pass
+            self._context['category_cache'] = Category.objects.in_bulk(pks)
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            rewards = Reward.objects.bulk_create([Reward(**attrs) for attrs in validated_data])
+            add_rewards_stats(rewards)
+        # bulk_create 不发 post_save 信号，手动让公开列表缓存失效
+        invalidate_rewards()
+        return rewards
+
+
+class RewardSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     category_name = serializers.SerializerMethodField()
     creator_username = serializers.SerializerMethodField()
-    category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), allow_null=True)
+    category = CategoryField(queryset=Category.objects.all(), allow_null=True)
 
     class Meta:
+        list_serializer_class = RewardBulkSerializer
         model = Reward
         fields = ['id', 'title', 'description', 'category', 'category_name', 'creator_username', 'reward_amount',
-                  'created_at', 'updated_at', 'status']
-        read_only_fields = ['creator', 'created_at', 'updated_at']
+                  'created_at', 'updated_at', 'status', 'deadline', 'application_count']
+        read_only_fields = ['creator', 'created_at', 'updated_at', 'application_count']
+        # 赏金至少 0.01，结款时才有可转的金额
+        extra_kwargs = {'reward_amount': {'min_value': Decimal('0.01')}}
+        # ?fields= 裁剪查询时，方法字段实际读取的列
+        field_columns = {'category_name': ('category__name',), 'creator_username': ('creator__username',)}
+
+    def validate_deadline(self, value):
+        # 编辑时原样提交的截止时间即使已过去也不报错，只检查新设置的值
+        if self.instance is not None and value == self.instance.deadline:
+            return value
+        if value is not None and value <= timezone.now():
+            raise serializers.ValidationError('截止时间必须晚于当前时间')
+        return value
 
     def get_category_name(self, obj):
         return obj.category.name if obj.category else None
@@ -25,23 +88,58 @@ class RewardSerializer(serializers.ModelSerializer):
     def get_creator_username(self, obj):
         return obj.creator.username if obj.creator else None
 
+    # 发布者只能通过编辑接口下架或重新上架，其余状态由申请、审核、结款流程驱动
+    owner_actions = {('waiting', 'take_down'): 'take_down', ('take_down', 'waiting'): 'relist'}
+
     def update(self, instance, validated_data):
-        if 'status' in validated_data:
-            new_status = validated_data['status']
-            if (instance.status == 'take_down' and new_status == 'waiting') or (
-                instance.status != 'waiting' and new_status == 'take_down'):
-                instance.status = new_status
-
-        for attr, value in validated_data.items():
-            if attr != 'status':
+        new_status = validated_data.pop('status', instance.status)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
                 setattr(instance, attr, value)
+            # 只写本次提交的字段，status 交给状态机以条件更新的方式修改，不会覆盖并发的状态变更
+            if validated_data:
+                instance.save(update_fields=[*validated_data, 'updated_at'])
 
-        instance.save()
+            action = self.owner_actions.get((instance.status, new_status))
+            if action is not None:
+                require_transition(instance, action)
         return instance
 
 
-class RewardApplicationSerializer(serializers.ModelSerializer):
+# RewardSerializer 的只读列表快速路径，两个 SerializerMethodField 直接取关联表的列
+reward_row_mapper = RowMapper(RewardSerializer, columns={'category_name': 'category__name',
+                                                         'creator_username': 'creator__username'})
+
+
+class RewardApplicationSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = RewardApplication
         fields = ['id', 'reward', 'applicant', 'application_date', 'is_accepted']
         read_only_fields = ['applicant', 'application_date', 'is_accepted']
+
+
+class ReviewItemSerializer(serializers.Serializer):
+    """批量审核中的一项，取值与 ReviewApplicationView 的 is_accepted 参数相同"""
+    application_id = serializers.IntegerField()
+    is_accepted = serializers.ChoiceField(choices=['accept', 'reject'])
+
+
+class ActivitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Activity
+        fields = ['id', 'verb', 'reward_id', 'reward_title', 'application_id', 'actor_username', 'created_at']
+
+
+activity_row_mapper = RowMapper(ActivitySerializer)
+
+
+class CategoryStatsSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', default=None, read_only=True)
+    total_amount = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CategoryStats
+        fields = ['category', 'category_name', 'status', 'reward_count', 'total_amount']
+
+    def get_total_amount(self, obj):
+        return format_cents(obj.amount_cents)
@@ -0,0 +1,38 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_rewards
+from .models import Category, CategoryStats, Reward, RewardApplication
+from .search import ensure_search_index
+from .stats import adjust_category_stats, move_reward_stats
+
+
+@receiver([post_save, post_delete], sender=Reward)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_reward_cache(sender, using, **kwargs):
+    invalidate_rewards(using=using)
+
+
+@receiver(post_delete, sender=Reward)
+def remove_reward_stats(sender, instance, **kwargs):
+    previous = getattr(instance, '_stats_snapshot', None) or instance.stats_key()
+    move_reward_stats(previous, None)
+
+
+@receiver(post_delete, sender=RewardApplication)
+def decrement_application_count(sender, instance, using, **kwargs):
+    if Reward.objects.filter(pk=instance.reward_id, application_count__gt=0).update(
+            application_count=F('application_count') - 1):
+        invalidate_rewards(using=using)
+
+
+@receiver(pre_delete, sender=Category)
+def move_category_stats_to_uncategorized(sender, instance, **kwargs):
+    # 删除分类时其悬赏的 category 会被置空（SET_NULL），统计随之并入“未分类”
+    for stats in CategoryStats.objects.filter(category=instance):
+        adjust_category_stats(None, stats.status, stats.reward_count, stats.amount_cents)
+
+
+def restore_search_triggers(sender, using, **kwargs):
+    ensure_search_index(using)
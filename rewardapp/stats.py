@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from userapp.ledger import to_cents
+from .models import ArchivedReward, CategoryStats, Reward, RewardApplication
+
+
+def adjust_category_stats(category_id, status, count, amount_cents):
+    """给一个 (分类, 状态) 统计行加上 count 个悬赏和 amount_cents，首次使用时创建"""
+    if not count and not amount_cents:
+        return
+    queryset = CategoryStats.objects.filter(category_id=category_id, status=status)
+    changes = {'reward_count': F('reward_count') + count, 'amount_cents': F('amount_cents') + amount_cents}
+    if not queryset.update(**changes):
+        CategoryStats.objects.get_or_create(category_id=category_id, status=status)
+        queryset.update(**changes)
+
+
+def move_reward_stats(previous, current):
+    """把一个悬赏从 previous 统计行移到 current；参数为 Reward.stats_key()，None 表示变更前或变更后不存在"""
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            category_id, status, amount = previous
+            adjust_category_stats(category_id, status, -1, -to_cents(amount))
+        if current is not None:
+            category_id, status, amount = current
+            adjust_category_stats(category_id, status, 1, to_cents(amount))
+
+
+def add_rewards_stats(rewards):
+    """统计批量创建的悬赏，每个 (分类, 状态) 一条 UPDATE"""
+    totals = {}
+    for reward in rewards:
+        count, amount = totals.get((reward.category_id, reward.status), (0, 0))
+        totals[reward.category_id, reward.status] = count + 1, amount + to_cents(reward.reward_amount)
+    with transaction.atomic():
+        for (category_id, status), (count, amount) in totals.items():
+            adjust_category_stats(category_id, status, count, amount)
+
+
+def move_rewards_stats(amounts, previous_status, status):
+    """把多个悬赏从一个状态移到另一个状态；amounts 为 (category_id, reward_amount)，每个分类两条 UPDATE"""
+    totals = {}
+    for category_id, amount in amounts:
+        count, cents = totals.get(category_id, (0, 0))
+        totals[category_id] = count + 1, cents + to_cents(amount)
+    with transaction.atomic():
+        for category_id, (count, cents) in totals.items():
+            adjust_category_stats(category_id, previous_status, -count, -cents)
+            adjust_category_stats(category_id, status, count, cents)
+
+
+def rebuild_counters():
+    """从源表重新计算所有冗余计数"""
+    with transaction.atomic():
+        Reward.objects.update(application_count=Coalesce(Subquery(
+            RewardApplication.objects.filter(reward=OuterRef('pk')).order_by().values('reward')
+            .annotate(total=Count('pk')).values('total')
+        ), 0))
+
+        # 归档的悬赏仍计入统计
+        totals = {}
+        for model in (Reward, ArchivedReward):
+            rows = model.objects.order_by().values_list('category_id', 'status').annotate(
+                reward_count=Count('pk'), amount=Sum('reward_amount'))
+            for category_id, status, reward_count, amount in rows:
+                count, cents = totals.get((category_id, status), (0, 0))
+                totals[category_id, status] = count + reward_count, cents + to_cents(amount or 0)
+
+        CategoryStats.objects.all().delete()
+        CategoryStats.objects.bulk_create([
+            CategoryStats(category_id=category_id, status=status, reward_count=count, amount_cents=cents)
+            for (category_id, status), (count, cents) in totals.items()
+        ])
@@ -1,3 +1,1459 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core import mail
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.mixins import ListModelMixin
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from HackIt2.metrics import registry as metrics_registry
+from HackIt2.routers import ReadReplicaRouter, replica_reads
+from HackIt2.test_runner import get_test_throttle_settings
+from HackIt2.throttling import SlidingWindowStore, get_store
+from userapp.models import CustomUser, LedgerEntry
+from .cache import cache_stats, invalidate_rewards, reset_cache_stats
+from .recommendations import recommender
+from .jobs import Handler, claim, enqueue, handlers, requeue_expired, run_batch, run_inline
+from .models import (Activity, ArchivedReward, ArchivedRewardApplication, Category, CategoryStats, Job, Reward,
+                     RewardApplication)
+from .renderers import FastJSONRenderer
+from .rows import RowListMixin, RowMapper
+from .serializers import RewardSerializer, reward_row_mapper
+from .stats import rebuild_counters
+from .transitions import transition
+
+
+class PublicRewardPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator')
+        cls.category = Category.objects.create(name='web')
+        now = timezone.now()
+        rewards = Reward.objects.bulk_create([
+            Reward(title=f'reward {i}', description='desc', category=cls.category, creator=cls.creator,
+                   reward_amount=10, status='waiting' if i % 2 else 'payed')
+            for i in range(25)
+        ])
+        # 人为制造相同的 created_at，检验 id 作为第二排序键时游标不会丢行或重复
+        for i, reward in enumerate(rewards):
+            Reward.objects.filter(pk=reward.pk).update(created_at=now - timedelta(minutes=i // 3))
+        invalidate_rewards()
+
+    def walk(self, params):
+        url = reverse('public-reward-list')
+        seen = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url, params = response.data['next'], None
+        return seen
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen = self.walk({'page_size': 4})
+        expected = list(Reward.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_filters_apply_across_pages(self):
+        seen = self.walk({'page_size': 5, 'status': 'waiting', 'category_name': 'web'})
+        expected = list(Reward.objects.filter(status='waiting').order_by('-created_at', '-id')
+                        .values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('public-reward-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryCountTests(APITestCase):
+    """列表/详情接口的 SQL 条数必须与数据量无关"""
+
+    def seed(self, count):
+        suffix = Category.objects.count()
+        categories = Category.objects.bulk_create([Category(name=f'cat {suffix + i}') for i in range(5)])
+        applicants = CustomUser.objects.bulk_create([
+            CustomUser(username=f'hunter {suffix + i}') for i in range(5)
+        ])
+        rewards = Reward.objects.bulk_create([
+            Reward(title=f'reward {i}', description='desc', category=categories[i % 5] if i % 7 else None,
+                   creator=self.creator, reward_amount=10)
+            for i in range(count)
+        ])
+        RewardApplication.objects.bulk_create([
+            RewardApplication(reward=reward, applicant=applicants[i % 5]) for i, reward in enumerate(rewards)
+        ])
+        RewardApplication.objects.bulk_create([
+            RewardApplication(reward=reward, applicant=self.creator) for reward in rewards
+        ])
+        invalidate_rewards()
+
+    def setUp(self):
+        self.creator = CustomUser.objects.create(username='creator')
+        self.admin = CustomUser.objects.create(username='admin', is_superuser=True)
+
+    def count_queries(self, user, url, params=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, user, url, params=None):
+        self.seed(3)
+        small = self.count_queries(user, url, params)
+        self.seed(300)
+        large = self.count_queries(user, url, params)
+        self.assertEqual(small, large, f'{url} 的查询数随数据量增长: {small} -> {large}')
+
+    def test_public_reward_list(self):
+        self.assertConstantQueries(None, reverse('public-reward-list'), {'page_size': 100})
+
+    def test_public_reward_list_filtered(self):
+        self.assertConstantQueries(None, reverse('public-reward-list'),
+                                   {'page_size': 100, 'status': 'waiting', 'creator_username': 'creator'})
+
+    def test_reward_list(self):
+        self.assertConstantQueries(self.creator, reverse('rewards-list'))
+
+    def test_reward_detail(self):
+        self.seed(1)
+        reward = Reward.objects.first()
+        self.assertLessEqual(self.count_queries(self.creator, reverse('rewards-detail', args=[reward.pk])), 1)
+
+    def test_application_list(self):
+        self.assertConstantQueries(self.creator, reverse('application-list'))
+
+    def test_application_list_superuser(self):
+        self.assertConstantQueries(self.admin, reverse('application-list'))
+
+    def test_application_detail(self):
+        self.seed(1)
+        application = RewardApplication.objects.filter(applicant=self.creator).first()
+        self.assertLessEqual(self.count_queries(self.creator, reverse('application-detail', args=[application.pk])), 1)
+
+    def test_category_list(self):
+        self.assertConstantQueries(self.admin, reverse('category-list'))
+
+
+class PublicRewardCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator')
+        cls.category = Category.objects.create(name='web')
+        cls.reward = Reward.objects.create(title='reward', description='desc', category=cls.category,
+                                           creator=cls.creator, reward_amount=10)
+
+    def setUp(self):
+        reset_cache_stats()
+
+    def get(self, params):
+        return self.client.get(reverse('public-reward-list'), params)
+
+    def test_hit_after_miss_with_normalized_params(self):
+        first = self.get([('status', 'waiting'), ('category_name', 'web')])
+        second = self.get([('category_name', 'web'), ('status', 'waiting')])
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_reward_write_invalidates(self):
+        self.get({'status': 'waiting'})
+        self.reward.status = 'take_down'
+        self.reward.save()
+        response = self.get({'status': 'waiting'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'], [])
+
+    def test_category_write_invalidates(self):
+        self.get({})
+        self.category.name = 'mobile'
+        self.category.save()
+        response = self.get({})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['category_name'], 'mobile')
+
+    def test_application_count_change_invalidates(self):
+        hunter = CustomUser.objects.create(username='hunter')
+        self.get({})
+        # 只改了计数、没有状态变更时，缓存也要失效
+        application = RewardApplication.objects.create(reward=self.reward, applicant=hunter)
+        response = self.get({})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['application_count'], 1)
+
+        application.delete()
+        response = self.get({})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['application_count'], 0)
+
+
+class RewardSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator')
+        cls.web = Category.objects.create(name='web')
+        cls.login = Reward.objects.create(title='修复登录接口', description='django login api', category=cls.web,
+                                          creator=cls.creator, reward_amount=10)
+        cls.logo = Reward.objects.create(title='设计 logo', description='photoshop, 附带登录页配色', creator=cls.creator,
+                                         reward_amount=5, status='payed')
+
+    def search(self, **params):
+        response = self.client.get(reverse('reward-search'), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_ranked_match(self):
+        self.assertEqual(self.search(q='登录'), [self.login.id, self.logo.id])
+        self.assertEqual(self.search(q='DJANGO api'), [self.login.id])
+        self.assertEqual(self.search(q='登录接'), [self.login.id])
+
+    def test_combines_with_filters(self):
+        self.assertEqual(self.search(q='登录', status='payed'), [self.logo.id])
+        self.assertEqual(self.search(q='登录', category_name='web'), [self.login.id])
+
+    def test_index_follows_writes(self):
+        self.login.title = 'refactor payment'
+        self.login.description = 'nothing to see'
+        self.login.save()
+        self.assertEqual(self.search(q='payment'), [self.login.id])
+        self.assertEqual(self.search(q='django'), [])
+        self.logo.delete()
+        self.assertEqual(self.search(q='photoshop'), [])
+
+    def test_fts_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search(q='"django OR* ('), [])
+
+    def test_fallback_without_fts(self):
+        with mock.patch('rewardapp.search.supports_fts', return_value=False):
+            self.assertEqual(self.search(q='登录'), [self.login.id, self.logo.id])
+            self.assertEqual(self.search(q='photoshop'), [self.logo.id])
+
+
+class RewardPayTests(APITestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create(username='creator', balance_cents=10000)
+        self.hunter = CustomUser.objects.create(username='hunter')
+        self.reward = Reward.objects.create(title='reward', description='desc', creator=self.creator,
+                                            receiver=self.hunter, reward_amount='12.50', status='completed')
+        self.client.force_authenticate(self.creator)
+        self.url = reverse('pay_for_reward', args=[self.reward.pk])
+
+    def test_pay_moves_exact_amount_once(self):
+        response = self.client.post(self.url, {'status': 'payed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post(self.url, {'status': 'payed'}).status_code, 400)
+
+        self.creator.refresh_from_db()
+        self.hunter.refresh_from_db()
+        self.assertEqual((self.creator.balance_cents, self.hunter.balance_cents), (8750, 1250))
+        self.assertEqual(self.hunter.completed_tasks, 1)
+        self.assertEqual(sorted(LedgerEntry.objects.filter(reward_id=self.reward.pk)
+                                .values_list('kind', 'amount_cents')),
+                         [('reward_income', 1250), ('reward_payment', -1250)])
+
+    def test_insufficient_balance_changes_nothing(self):
+        CustomUser.objects.filter(pk=self.creator.pk).update(balance_cents=1249)
+        response = self.client.post(self.url, {'status': 'payed'})
+        self.assertEqual(response.status_code, 400)
+        self.reward.refresh_from_db()
+        self.assertEqual(self.reward.status, 'completed')
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_zero_amount_reward_is_paid_without_transfer(self):
+        Reward.objects.filter(pk=self.reward.pk).update(reward_amount='0.00')
+        response = self.client.post(self.url, {'status': 'payed'})
+        self.assertEqual(response.status_code, 200)
+        self.reward.refresh_from_db()
+        self.hunter.refresh_from_db()
+        self.assertEqual(self.reward.status, 'payed')
+        self.assertEqual((self.hunter.balance_cents, self.hunter.completed_tasks), (0, 1))
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_non_positive_amount_is_rejected(self):
+        for amount in ('0', '-1.00'):
+            serializer = RewardSerializer(data={'title': 'free', 'description': 'desc', 'reward_amount': amount,
+                                                'category': None})
+            self.assertFalse(serializer.is_valid())
+            self.assertIn('reward_amount', serializer.errors)
+
+
+class RewardBulkCreateTests(APITestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create(username='creator')
+        self.categories = Category.objects.bulk_create([Category(name=f'cat {i}') for i in range(3)])
+        self.client.force_authenticate(self.creator)
+        self.url = reverse('rewards-bulk')
+
+    def payload(self, count):
+        return [{'title': f'reward {i}', 'description': 'desc', 'reward_amount': '9.90',
+                 'category': self.categories[i % 3].pk if i % 4 else None} for i in range(count)]
+
+    def test_bulk_create_in_constant_queries(self):
+        # 先建好所有 (分类, 状态) 统计行，之后每批的查询数只与分组数有关
+        self.client.post(self.url, self.payload(12), format='json')
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.post(self.url, self.payload(12), format='json').status_code, 201)
+        with CaptureQueriesContext(connection) as large:
+            # SQLite 每条 INSERT 最多 999 个参数，90 行仍是一条语句
+            response = self.client.post(self.url, self.payload(90), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(Reward.objects.filter(creator=self.creator).count(), 114)
+        self.assertEqual(response.data[1]['category_name'], 'cat 1')
+        self.assertTrue(all(row['id'] for row in response.data))
+
+    def test_invalid_row_rejects_whole_batch(self):
+        payload = self.payload(3)
+        payload[2]['category'] = 999
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('category', response.data[2])
+        self.assertFalse(Reward.objects.exists())
+
+
+class ImportRewardsCommandTests(TestCase):
+    def test_import_jsonl_and_csv(self):
+        CustomUser.objects.create(username='partner')
+        Category.objects.create(name='web')
+        with tempfile.TemporaryDirectory() as directory:
+            jsonl = os.path.join(directory, 'rewards.jsonl')
+            with open(jsonl, 'w', encoding='utf-8') as stream:
+                for i in range(5):
+                    stream.write(json.dumps({'title': f'json {i}', 'reward_amount': '1.50', 'category': 'web'}) + '\n')
+                stream.write(json.dumps({'title': 'bad category', 'reward_amount': '1', 'category': 'nope'}) + '\n')
+                stream.write('not json\n')
+            csv_path = os.path.join(directory, 'rewards.csv')
+            with open(csv_path, 'w', encoding='utf-8') as stream:
+                stream.write('title,description,reward_amount,status\ncsv 0,desc,3,payed\ncsv 1,,1.234,waiting\n'
+                             'csv 2,,0,waiting\ncsv 3,,-5,waiting\n')
+
+            out = io.StringIO()
+            call_command('import_rewards', jsonl, creator='partner', chunk_size=2, stdout=out, stderr=io.StringIO())
+            self.assertIn('Imported 5 rewards (2 skipped)', out.getvalue())
+            call_command('import_rewards', csv_path, creator='partner', stdout=out, stderr=io.StringIO())
+
+        self.assertEqual(Reward.objects.filter(category__name='web').count(), 5)
+        self.assertEqual(list(Reward.objects.filter(title__startswith='csv').values_list('title', 'status')),
+                         [('csv 0', 'payed')])
+
+
+class SeedDataCommandTests(TestCase):
+    def test_seed_is_consistent(self):
+        out = io.StringIO()
+        call_command('seed_data', users=20, categories=3, rewards=300, batch_size=50, seed=1, stdout=out)
+        self.assertIn('Seeded 20 users, 3 categories, 300 rewards', out.getvalue())
+        self.assertEqual(Reward.objects.count(), 300)
+        self.assertFalse(CustomUser.objects.filter(username='seed_0').get().has_usable_password())
+
+        claimed = Reward.objects.exclude(status__in=['waiting', 'cancelled', 'take_down'])
+        self.assertEqual(RewardApplication.objects.count(), claimed.count())
+        self.assertFalse(claimed.filter(receiver=None).exists())
+        self.assertEqual(set(Reward.objects.values_list('application_count', flat=True)), {0, 1})
+        payed = Reward.objects.filter(status='payed').count()
+        self.assertEqual(sum(CustomUser.objects.values_list('completed_tasks', flat=True)), payed)
+
+        expected = set(CategoryStats.objects.values_list('category_id', 'status', 'reward_count', 'amount_cents'))
+        rebuild_counters()
+        self.assertEqual(set(CategoryStats.objects.values_list('category_id', 'status', 'reward_count',
+                                                               'amount_cents')), expected)
+
+        with self.assertRaises(CommandError):
+            call_command('seed_data', users=2, rewards=0, stdout=out)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_shared_password(self):
+        call_command('seed_data', users=3, categories=0, rewards=10, password='secret-pass', stdout=io.StringIO())
+        users = CustomUser.objects.filter(username__startswith='seed_')
+        self.assertEqual(len(set(users.values_list('password', flat=True))), 1)
+        self.assertTrue(users.first().check_password('secret-pass'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BenchRoutesCommandTests(TransactionTestCase):
+    def test_every_route_is_benchmarked(self):
+        call_command('seed_data', users=5, categories=2, rewards=30, stdout=io.StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            out, err = io.StringIO(), io.StringIO()
+            call_command('bench_routes', requests=2, concurrency='1', baseline=baseline, save_baseline=True,
+                         stdout=out, stderr=err)
+            self.assertEqual(err.getvalue(), '')
+            lines = out.getvalue().splitlines()[:-1]
+            self.assertEqual(len(lines), 31)
+            self.assertTrue(all(line.endswith('errors=0') for line in lines), out.getvalue())
+
+            with open(baseline, encoding='utf-8') as stream:
+                results = json.load(stream)
+            self.assertEqual(results['pay_for_reward']['1']['requests'], 2)
+            # 把基线改得极快，同一场景的结果应判为退化
+            results['public-reward-list']['1'].update(rps=10 ** 9, p99=0.001)
+            with open(baseline, 'w', encoding='utf-8') as stream:
+                json.dump(results, stream)
+            out = io.StringIO()
+            with self.assertRaises(CommandError):
+                call_command('bench_routes', requests=2, concurrency='1', baseline=baseline,
+                             routes='public-reward-list', stdout=out)
+            self.assertIn('REGRESSED', out.getvalue())
+
+
+class ExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', is_superuser=True)
+        cls.creator = CustomUser.objects.create(username='creator')
+        cls.rewards = [Reward.objects.create(title=f'悬赏 {i}', description='a,"b"\nc', creator=cls.creator,
+                                             reward_amount='1.50') for i in range(3)]
+        RewardApplication.objects.create(reward=cls.rewards[0], applicant=cls.admin)
+
+    def export(self, url_name, **params):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self.export('reward-export').splitlines()]
+        self.assertEqual([row['id'] for row in rows], [reward.id for reward in self.rewards])
+        self.assertEqual(rows[0]['creator__username'], 'creator')
+        self.assertEqual(rows[0]['reward_amount'], '1.50')
+
+    def test_csv_round_trips(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('reward-export', export_format='csv'))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['description'], 'a,"b"\nc')
+
+    def test_since_watermark(self):
+        watermark = timezone.now()
+        self.rewards[1].status = 'take_down'
+        self.rewards[1].save()
+        rows = [json.loads(line) for line in
+                self.export('reward-export', since=watermark.isoformat()).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.rewards[1].id])
+        self.assertEqual(len(self.export('application-export').splitlines()), 1)
+
+    def test_invalid_since(self):
+        self.client.force_authenticate(self.admin)
+        for since in ('yesterday', '2024-02-30T00:00'):
+            response = self.client.get(reverse('reward-export'), {'since': since})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['detail'], 'since 参数格式错误')
+
+    def test_requires_superuser(self):
+        self.client.force_authenticate(self.creator)
+        self.assertEqual(self.client.get(reverse('reward-export')).status_code, 403)
+
+
+class AsyncReadPathTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator')
+        cls.other = CustomUser.objects.create(username='other')
+        cls.token = Token.objects.create(user=cls.creator)
+        category = Category.objects.create(name='web')
+        cls.rewards = [Reward.objects.create(title=f'reward {i}', description='desc', creator=cls.creator,
+                                             category=category if i % 2 else None, reward_amount='3.00')
+                       for i in range(5)]
+        Reward.objects.create(title='other', description='desc', creator=cls.other, reward_amount=1)
+
+    def setUp(self):
+        invalidate_rewards()
+
+    async def test_public_list_matches_sync_view(self):
+        for params in ({'page_size': 2}, {'category_name': 'web'}, {'status': 'waiting', 'creator_username': 'creator'}):
+            expected = (await sync_to_async(self.client.get)(reverse('public-reward-list'), params)).json()
+            response = await self.async_client.get(reverse('async-public-reward-list'), params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(data['results'], expected['results'])
+            self.assertEqual(data['next'] is None, expected['next'] is None)
+
+    async def test_public_list_follows_cursor_and_missing_category(self):
+        first = (await self.async_client.get(reverse('async-public-reward-list'), {'page_size': 4})).json()
+        second = (await self.async_client.get(first['next'])).json()
+        self.assertEqual(len(first['results']) + len(second['results']), 6)
+        response = await self.async_client.get(reverse('async-public-reward-list'), {'category_name': 'nope'})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_reward_detail(self):
+        headers = {'Authorization': f'Token {self.token.key}'}
+        url = reverse('async-reward-detail', args=[self.rewards[1].pk])
+        response = await self.async_client.get(url, headers=headers)
+        expected = await sync_to_async(self.client.get)(reverse('rewards-detail', args=[self.rewards[1].pk]),
+                                                        headers=headers)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        other = Reward.objects.exclude(creator=self.creator)
+        response = await self.async_client.get(reverse('async-reward-detail', args=[(await other.afirst()).pk]),
+                                               headers=headers)
+        self.assertEqual(response.status_code, 404)
+
+
+class CounterTests(APITestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create(username='creator', balance_cents=100000)
+        self.hunter = CustomUser.objects.create(username='hunter')
+        self.web = Category.objects.create(name='web')
+        self.reward = Reward.objects.create(title='reward', description='desc', category=self.web,
+                                            creator=self.creator, reward_amount='10.00')
+        Reward.objects.create(title='other', description='desc', category=self.web, creator=self.creator,
+                              reward_amount='2.50')
+
+    def stats(self, **params):
+        response = self.client.get(reverse('category-stats'), params)
+        self.assertEqual(response.status_code, 200)
+        return {(row['category_name'], row['status']): (row['reward_count'], row['total_amount'])
+                for row in response.data}
+
+    def snapshot(self):
+        self.reward.refresh_from_db()
+        return self.reward.application_count, self.stats()
+
+    def test_counters_follow_reward_lifecycle(self):
+        self.assertEqual(self.stats(), {('web', 'waiting'): (2, '12.50')})
+
+        self.client.force_authenticate(self.hunter)
+        response = self.client.post(reverse('application-list'), {'reward': self.reward.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.snapshot(), (1, {('web', 'waiting'): (1, '2.50'), ('web', 'applied'): (1, '10.00')}))
+
+        self.client.delete(reverse('application-detail', args=[response.data['id']]))
+        self.assertEqual(self.snapshot(), (0, {('web', 'waiting'): (2, '12.50')}))
+
+        Reward.objects.filter(pk=self.reward.pk).update(status='completed', receiver=self.hunter)
+        rebuild_counters()
+        self.client.force_authenticate(self.creator)
+        self.client.post(reverse('pay_for_reward', args=[self.reward.pk]), {'status': 'payed'})
+        self.assertEqual(self.stats(status='payed'), {('web', 'payed'): (1, '10.00')})
+
+        self.web.delete()
+        self.assertEqual(self.stats(), {(None, 'waiting'): (1, '2.50'), (None, 'payed'): (1, '10.00')})
+
+        Reward.objects.get(pk=self.reward.pk).delete()
+        self.assertEqual(self.stats(), {(None, 'waiting'): (1, '2.50')})
+
+    def test_rebuild_repairs_drift(self):
+        RewardApplication.objects.create(reward=self.reward, applicant=self.hunter)
+        expected = self.snapshot()
+        Reward.objects.update(application_count=7)
+        CategoryStats.objects.update(reward_count=99)
+        call_command('rebuild_counters', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), expected)
+
+
+class RewardTransitionTests(APITestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create(username='creator', balance_cents=100000)
+        self.hunter = CustomUser.objects.create(username='hunter')
+        self.rival = CustomUser.objects.create(username='rival')
+        self.reward = Reward.objects.create(title='reward', description='desc', creator=self.creator,
+                                            reward_amount='10.00')
+
+    def apply(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse('application-list'), {'reward': self.reward.pk})
+
+    def review(self, application_id, decision):
+        self.client.force_authenticate(self.creator)
+        return self.client.post(reverse('review_application', args=[application_id]), {'is_accepted': decision})
+
+    def assertStatus(self, expected):
+        self.reward.refresh_from_db()
+        self.assertEqual(self.reward.status, expected)
+        self.assertEqual(list(CategoryStats.objects.filter(reward_count__gt=0).values_list('status', 'reward_count')),
+                         [(expected, 1)])
+
+    def test_lifecycle(self):
+        application_id = self.apply(self.hunter).data['id']
+        self.assertStatus('applied')
+        self.assertEqual(self.review(application_id, 'accept').status_code, 200)
+        self.assertStatus('in_progress')
+        self.assertTrue(RewardApplication.objects.get(pk=application_id).is_accepted)
+
+        self.client.force_authenticate(self.hunter)
+        response = self.client.post(reverse('update_reward_status', args=[application_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertStatus('completed')
+
+        self.client.force_authenticate(self.creator)
+        self.client.post(reverse('pay_for_reward', args=[self.reward.pk]), {'status': 'payed'})
+        self.assertStatus('payed')
+
+    def test_only_one_concurrent_apply_wins(self):
+        stale = Reward.objects.get(pk=self.reward.pk)
+        self.assertTrue(transition(self.reward, 'apply', receiver=self.hunter))
+        self.assertFalse(transition(stale, 'apply', receiver=self.rival))
+        self.assertStatus('applied')
+        self.assertEqual(self.reward.receiver_id, self.hunter.pk)
+
+    def test_losing_applicant_gets_conflict(self):
+        # 模拟另一个请求在本请求读取悬赏之后抢先接单
+        with mock.patch('rewardapp.transitions.transition', return_value=False):
+            response = self.apply(self.rival)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(RewardApplication.objects.exists())
+
+    def test_stale_application_cannot_be_reviewed(self):
+        first = self.apply(self.hunter).data['id']
+        self.assertEqual(self.review(first, 'reject').status_code, 200)
+        self.assertStatus('waiting')
+
+        second = self.apply(self.rival).data['id']
+        self.assertEqual(self.review(first, 'accept').status_code, 409)
+        self.assertStatus('applied')
+        self.assertFalse(RewardApplication.objects.get(pk=first).is_accepted)
+        self.assertEqual(self.review(second, 'accept').status_code, 200)
+
+    def test_withdraw_returns_reward_to_waiting(self):
+        application_id = self.apply(self.hunter).data['id']
+        self.client.delete(reverse('application-detail', args=[application_id]))
+        self.assertStatus('waiting')
+        self.assertIsNone(self.reward.receiver_id)
+
+    def test_withdraw_ignores_drifted_counter(self):
+        application_id = self.apply(self.hunter).data['id']
+        # 计数漂移（多记了一次）时，撤回最后一个申请仍应退回 waiting
+        Reward.objects.filter(pk=self.reward.pk).update(application_count=5)
+        self.client.delete(reverse('application-detail', args=[application_id]))
+        self.assertStatus('waiting')
+
+    def test_withdraw_after_reject_and_reapply(self):
+        first = self.apply(self.hunter).data['id']
+        self.review(first, 'reject')
+        second = self.apply(self.rival).data['id']
+        # 被驳回的旧申请还留在表里，撤回仍应让悬赏回到 waiting
+        self.client.force_authenticate(self.rival)
+        self.assertEqual(self.client.delete(reverse('application-detail', args=[second])).status_code, 204)
+        self.assertStatus('waiting')
+        self.assertIsNone(self.reward.receiver_id)
+        self.assertEqual(self.apply(self.hunter).status_code, 201)
+
+    def test_withdrawing_rejected_application_keeps_current_receiver(self):
+        first = self.apply(self.hunter).data['id']
+        self.review(first, 'reject')
+        self.apply(self.rival)
+        self.client.force_authenticate(self.hunter)
+        self.client.delete(reverse('application-detail', args=[first]))
+        self.assertStatus('applied')
+        self.assertEqual(self.reward.receiver_id, self.rival.pk)
+
+    def test_owner_can_take_down_and_relist(self):
+        self.client.force_authenticate(self.creator)
+        url = reverse('rewards-detail', args=[self.reward.pk])
+        response = self.client.patch(url, {'status': 'take_down', 'title': 'renamed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertStatus('take_down')
+        self.assertEqual(self.reward.title, 'renamed')
+
+        self.client.patch(url, {'status': 'in_progress'})
+        self.assertStatus('take_down')
+        self.client.patch(url, {'status': 'waiting'})
+        self.assertStatus('waiting')
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        creator = CustomUser.objects.create(username='creator')
+        Reward.objects.create(title='reward', description='desc', creator=creator, reward_amount='3.00')
+
+    def setUp(self):
+        invalidate_rewards()
+        metrics_registry.reset()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode().splitlines()
+
+    def test_scrape_requires_allowed_ip_or_token(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.9').status_code, 403)
+        with override_settings(METRICS={**settings.METRICS, 'TOKEN': 'scrape-secret'}):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.9',
+                                             HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.9',
+                                             HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+
+    def test_records_requests_by_url_name(self):
+        self.client.get(reverse('public-reward-list'))
+        self.client.get(reverse('public-reward-list'))
+        self.client.get('/no-such-page/')
+        lines = self.scrape()
+
+        self.assertIn('hackit_http_requests_total{view="public-reward-list",method="GET",status="200"} 2', lines)
+        self.assertIn('hackit_http_requests_total{view="unmatched",method="GET",status="404"} 1', lines)
+        self.assertIn('hackit_http_request_duration_seconds_bucket{view="public-reward-list",le="+Inf"} 2', lines)
+        # 第二次命中缓存，只有第一次查询了数据库
+        self.assertIn('hackit_db_queries_total{view="public-reward-list"} 1', lines)
+        self.assertIn('hackit_public_reward_cache_requests_total{result="hit"} 1', lines[-2:])
+        render = next(line for line in lines if line.startswith('hackit_response_render_seconds_total{view="public'))
+        self.assertGreater(float(render.split()[-1]), 0)
+
+    async def test_counts_async_view_queries(self):
+        await self.async_client.get(reverse('async-public-reward-list'))
+        lines = await sync_to_async(self.scrape)()
+        self.assertIn('hackit_http_requests_total{view="async-public-reward-list",method="GET",status="200"} 1', lines)
+        queries = next(line for line in lines if line.startswith('hackit_db_queries_total{view="async-public'))
+        self.assertGreater(int(queries.split()[-1]), 0)
+
+    @override_settings(METRICS={'SLOW_REQUEST_MS': 0})
+    def test_logs_slow_requests_with_sql(self):
+        with self.assertLogs('HackIt2.metrics', 'WARNING') as logs:
+            self.client.get(reverse('public-reward-list'))
+        self.assertIn('public-reward-list', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReadReplicaRouterTests(APITestCase):
+    """副本别名直接指向主库，通过 random.choice 的调用判断查询是否被路由到副本"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator')
+        cls.hunter = CustomUser.objects.create(username='hunter')
+        cls.reward = Reward.objects.create(title='reward', description='desc', creator=cls.creator,
+                                           reward_amount='3.00')
+
+    def setUp(self):
+        invalidate_rewards()
+        patcher = mock.patch('HackIt2.routers.random.choice', side_effect=lambda replicas: replicas[0])
+        self.replica_reads = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_router_rules(self):
+        router = ReadReplicaRouter()
+        with override_settings(DATABASE_REPLICAS=['replica_0']):
+            self.assertEqual(router.db_for_read(Reward), 'default')
+            with replica_reads():
+                self.assertEqual(router.db_for_read(Reward), 'replica_0')
+                self.assertEqual(router.db_for_write(Reward), 'default')
+                self.assertEqual(router.db_for_read(Reward), 'default')
+            self.assertFalse(router.allow_migrate('replica_0', 'rewardapp'))
+            self.assertTrue(router.allow_migrate('default', 'rewardapp'))
+
+    def test_read_only_views_use_replicas(self):
+        self.assertEqual(self.client.get(reverse('user_detail', args=['creator'])).status_code, 200)
+        self.assertEqual(self.replica_reads.call_count, 1)
+        with override_settings(PUBLIC_REWARD_CACHE={'TIMEOUT': 0}):
+            self.assertEqual(self.client.get(reverse('public-reward-list')).status_code, 200)
+        self.assertEqual(self.replica_reads.call_count, 2)
+
+    def test_cached_listing_reads_primary(self):
+        # 写入缓存的页面若来自落后的副本，会以新版本号缓存旧数据
+        self.assertEqual(self.client.get(reverse('public-reward-list')).headers['X-Cache'], 'MISS')
+        self.assertEqual(self.replica_reads.call_count, 0)
+
+    def test_writes_and_reads_after_writes_use_primary(self):
+        self.client.force_authenticate(self.hunter)
+        self.assertEqual(self.client.post(reverse('application-list'), {'reward': self.reward.pk}).status_code, 201)
+        self.assertEqual(self.replica_reads.call_count, 0)
+
+        with replica_reads():
+            Reward.objects.create(title='new', description='desc', creator=self.creator, reward_amount='1.00')
+            self.assertEqual(Reward.objects.filter(title='new').count(), 1)
+        self.assertEqual(self.replica_reads.call_count, 0)
+
+    async def test_async_views_use_replicas(self):
+        await self.async_client.get(reverse('async-public-reward-list'))
+        await self.async_client.get(reverse('async-user-detail', args=['creator']))
+        self.assertEqual(self.replica_reads.call_count, 1)
+        with override_settings(PUBLIC_REWARD_CACHE={'TIMEOUT': 0}):
+            await self.async_client.get(reverse('async-public-reward-list'), {'page_size': 5})
+        self.assertEqual(self.replica_reads.call_count, 2)
+
+
+class RowMapperTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='发布者')
+        category = Category.objects.create(name='web 开发')
+        for i, amount in enumerate(['0.10', '12.00', '99999999.99']):
+            Reward.objects.create(title=f'悬赏 "{i}" ', description='<b>desc</b>\n', creator=cls.creator,
+                                  category=category if i else None, reward_amount=amount)
+
+    def setUp(self):
+        invalidate_rewards()
+
+    def render_both(self, queryset):
+        expected = JSONRenderer().render(RewardSerializer(list(queryset), many=True).data)
+        actual = FastJSONRenderer().render(reward_row_mapper.map(reward_row_mapper.values(queryset)))
+        return expected, actual
+
+    def test_output_matches_serializer_bytes(self):
+        queryset = Reward.objects.select_related('category', 'creator').order_by('id')
+        expected, actual = self.render_both(queryset)
+        self.assertEqual(actual, expected)
+        with timezone.override('Asia/Shanghai'):
+            expected, actual = self.render_both(queryset)
+        self.assertIn(b'+08:00', actual)
+        self.assertEqual(actual, expected)
+
+    def test_list_endpoints_keep_their_bytes(self):
+        self.client.force_authenticate(self.creator)
+        for name, params in (('public-reward-list', {'page_size': 2}), ('rewards-list', {}),
+                             ('reward-search', {'q': '悬赏'})):
+            fast = self.client.get(reverse(name), params).content
+            invalidate_rewards()
+            with mock.patch.object(RowListMixin, 'list', ListModelMixin.list):
+                self.assertEqual(self.client.get(reverse(name), params).content, fast)
+            invalidate_rewards()
+
+        response = self.client.get(reverse('rewards-list'), HTTP_ACCEPT='application/json; indent=2')
+        self.assertIn(b'\n  ', response.content)
+
+    def test_method_fields_need_columns(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RowMapper(RewardSerializer)
+
+
+class SparseFieldsetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator', is_superuser=True)
+        cls.hunter = CustomUser.objects.create(username='hunter')
+        cls.token = Token.objects.create(user=cls.creator)
+        cls.category = Category.objects.create(name='web', description='long category text')
+        cls.rewards = [Reward.objects.create(title=f'reward {i}', description='long text', creator=cls.creator,
+                                             category=cls.category if i % 2 else None, reward_amount='3.00')
+                       for i in range(5)]
+        cls.application = RewardApplication.objects.create(reward=cls.rewards[0], applicant=cls.hunter)
+
+    def setUp(self):
+        invalidate_rewards()
+        self.client.force_authenticate(self.creator)
+
+    def get(self, name, args=(), params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name, args=args), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), ' '.join(query['sql'] for query in queries)
+
+    def test_fields_prune_output_and_columns(self):
+        params = {'fields': 'id,title,category_name', 'page_size': 2}
+        for name in ('public-reward-list', 'rewards-list'):
+            data, sql = self.get(name, params=params)
+            rows = data['results'] if isinstance(data, dict) else data
+            self.assertEqual(list(rows[0]), ['id', 'title', 'category_name'])
+            self.assertNotIn('"Reward"."description"', sql)
+
+        data, sql = self.get('rewards-detail', [self.rewards[1].pk], {'fields': 'title,category_name'})
+        self.assertEqual(data, {'title': 'reward 1', 'category_name': 'web'})
+        self.assertNotIn('"Reward"."description"', sql)
+
+        data, sql = self.get('category-detail', [self.category.pk], {'exclude': 'description'})
+        self.assertEqual(data, {'id': self.category.pk, 'name': 'web'})
+        self.assertNotIn('"Category"."description"', sql)
+
+        data, sql = self.get('application-list', params={'fields': 'reward'})
+        self.assertEqual(data, [{'reward': self.rewards[0].pk}])
+        self.assertNotIn('"Reward"."title"', sql)
+
+    def test_cursor_pages_with_pruned_fields(self):
+        url, params, seen = reverse('public-reward-list'), {'fields': 'title', 'page_size': 2}, []
+        while url:
+            data = self.client.get(url, params).json()
+            seen.extend(row['title'] for row in data['results'])
+            url, params = data['next'], None
+        self.assertEqual(sorted(seen), sorted(reward.title for reward in self.rewards))
+
+    def test_unknown_field_is_rejected(self):
+        for name, args in (('public-reward-list', ()), ('rewards-detail', [self.rewards[0].pk]),
+                           ('category-list', ())):
+            response = self.client.get(reverse(name, args=args), {'fields': 'title,password'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('password', response.json()['fields'][0])
+
+    async def test_async_views_match_sync(self):
+        headers = {'Authorization': f'Token {self.token.key}'}
+        for sync_name, async_name, args, params in (
+                ('public-reward-list', 'async-public-reward-list', (), {'exclude': 'description', 'page_size': 2}),
+                ('rewards-detail', 'async-reward-detail', [self.rewards[1].pk], {'fields': 'id,creator_username'}),
+                ('rewards-detail', 'async-reward-detail', [self.rewards[1].pk], {'fields': 'nope'})):
+            await sync_to_async(invalidate_rewards)()
+            expected = await sync_to_async(self.client.get)(reverse(sync_name, args=args), params, headers=headers)
+            await sync_to_async(invalidate_rewards)()
+            response = await self.async_client.get(reverse(async_name, args=args), params, headers=headers)
+            self.assertEqual(response.status_code, expected.status_code)
+            data, expected = response.json(), expected.json()
+            self.assertEqual(data.get('results', data), expected.get('results', expected))
+
+
+@override_settings(THROTTLE=get_test_throttle_settings())
+class SlidingWindowThrottleTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator', balance_cents=10000)
+        cls.other = CustomUser.objects.create(username='other', balance_cents=10000)
+        cls.hunter = CustomUser.objects.create(username='hunter')
+        cls.rewards = [Reward.objects.create(title=f'reward {i}', description='desc', creator=cls.creator,
+                                             receiver=cls.hunter, reward_amount=1, status='completed')
+                       for i in range(3)]
+        cls.other_reward = Reward.objects.create(title='other', description='desc', creator=cls.other,
+                                                 receiver=cls.hunter, reward_amount=1, status='completed')
+
+    def setUp(self):
+        get_store().clear()
+        invalidate_rewards()
+
+    def test_window_slides(self):
+        store = get_store()
+        self.assertEqual([store.hit('k', 3, 60, now=600 + i)[0] for i in range(4)], [True, True, True, False])
+        self.assertEqual(store.hit('k', 3, 60, now=603), (False, 57))
+        # 下一个窗口开头，上一窗口的 3 次仍全部计入
+        self.assertFalse(store.hit('k', 3, 60, now=660)[0])
+        # 过了半个窗口，上一窗口按一半（1.5 次）计入，只剩一次额度
+        self.assertEqual([store.hit('k', 3, 60, now=690)[0] for _ in range(2)], [True, False])
+        self.assertTrue(store.hit('other', 3, 60, now=690)[0])
+
+    def test_counts_are_shared_between_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'throttle.sqlite3')
+            first, second = SlidingWindowStore(path), SlidingWindowStore(path)
+            self.assertTrue(first.hit('k', 2, 60, now=0)[0])
+            self.assertTrue(second.hit('k', 2, 60, now=1)[0])
+            self.assertFalse(first.hit('k', 2, 60, now=2)[0])
+            first.prune(now=10 ** 6)
+            self.assertTrue(second.hit('k', 2, 60, now=10 ** 6)[0])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                       'DEFAULT_THROTTLE_RATES': {'payments': '2/min', 'public': '3/min'}})
+    def test_scoped_views(self):
+        self.client.force_authenticate(self.creator)
+        for reward, expected in zip(self.rewards, (200, 200, 429)):
+            response = self.client.post(reverse('pay_for_reward', args=[reward.pk]), {'status': 'payed'})
+            self.assertEqual(response.status_code, expected)
+        self.assertEqual(response['Retry-After'], str(int(response['Retry-After'])))
+        self.assertEqual(Reward.objects.get(pk=self.rewards[2].pk).status, 'completed')
+
+        # 费率按用户计算，未限流的视图不受影响
+        self.client.force_authenticate(self.other)
+        response = self.client.post(reverse('pay_for_reward', args=[self.other_reward.pk]), {'status': 'payed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('category-list')).status_code, 200)
+
+        self.client.force_authenticate(None)
+        statuses = [self.client.get(reverse('public-reward-list')).status_code for _ in range(2)]
+        statuses.append(self.client.get(reverse('async-public-reward-list')).status_code)
+        statuses.append(self.client.get(reverse('async-public-reward-list')).status_code)
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    @override_settings(THROTTLE={**settings.THROTTLE, 'ENABLED': False},
+                       REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'public': '1/min'}})
+    def test_can_be_disabled(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('public-reward-list')).status_code, 200)
+
+
+class JobQueueTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator', email='creator@example.com')
+        cls.hunter = CustomUser.objects.create(username='hunter', email='hunter@example.com')
+        cls.reward = Reward.objects.create(title='修复登录', description='desc', creator=cls.creator, reward_amount=1)
+
+    def test_notifications_are_queued_with_the_request_and_sent_by_the_worker(self):
+        self.client.force_authenticate(self.hunter)
+        response = self.client.post(reverse('application-list'), {'reward': self.reward.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        self.client.force_authenticate(self.creator)
+        self.client.post(reverse('review_application', args=[response.data['id']]), {'is_accepted': 'accept'})
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['notify-application', 'notify-review'])
+
+        call_command('run_jobs', workers=0, once=True, stdout=io.StringIO())
+        self.assertEqual([message.to for message in mail.outbox], [['creator@example.com'], ['hunter@example.com']])
+        self.assertIn('已通过', mail.outbox[1].subject)
+        self.assertFalse(Job.objects.exists())
+
+    def test_job_is_dropped_with_a_rolled_back_transaction(self):
+        self.client.force_authenticate(self.hunter)
+        Reward.objects.filter(pk=self.reward.pk).update(status='applied')
+        response = self.client.post(reverse('application-list'), {'reward': self.reward.pk})
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaises(ValueError), transaction.atomic():
+            enqueue('notify-application', application_id=1)
+            raise ValueError
+        self.assertFalse(Job.objects.exists())
+
+    def test_batch_claim_and_lease(self):
+        jobs = [enqueue('notify-application', application_id=i) for i in range(5)]
+        Job.objects.filter(pk=jobs[4].pk).update(run_at=timezone.now() + timedelta(minutes=1))
+        with CaptureQueriesContext(connection) as queries:
+            claimed = claim('worker', 3)
+        self.assertEqual([job.pk for job in claimed], [job.pk for job in jobs[:3]])
+        self.assertEqual(len(queries), 2)
+        self.assertEqual([job.pk for job in claim('worker', 3)], [jobs[3].pk])
+        self.assertEqual(claim('worker', 3), [])
+
+        Job.objects.filter(pk=jobs[0].pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_expired(60), 1)
+        self.assertEqual([job.pk for job in claim('worker', 3)], [jobs[0].pk])
+
+    def test_failed_jobs_back_off_then_fail(self):
+        calls = []
+
+        def flaky(value):
+            calls.append(value)
+            raise RuntimeError('boom')
+
+        with mock.patch.dict(handlers, {'flaky': Handler(flaky, 2)}):
+            job = enqueue('flaky', value=1)
+            self.assertEqual(run_batch('worker', run_inline, 10), 1)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('queued', 1))
+            self.assertIn('RuntimeError: boom', job.last_error)
+            self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+            self.assertEqual(run_batch('worker', run_inline, 10), 0)
+
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            run_batch('worker', run_inline, 10)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('failed', 2))
+            self.assertEqual(calls, [1, 1])
+            self.assertEqual(run_batch('worker', run_inline, 10), 0)
+
+
+class JobWorkerPoolTests(TransactionTestCase):
+    def test_thread_pool_runs_every_job(self):
+        users = [CustomUser.objects.create(username=f'user{i}', email=f'user{i}@example.com') for i in range(2)]
+        reward = Reward.objects.create(title='t', description='d', creator=users[0], reward_amount=1)
+        for _ in range(7):
+            application = RewardApplication.objects.create(reward=reward, applicant=users[1])
+            enqueue('notify-application', application_id=application.pk)
+        out = io.StringIO()
+        call_command('run_jobs', workers=3, batch_size=2, once=True, stdout=out)
+        self.assertIn('Ran 7 jobs', out.getvalue())
+        self.assertEqual(len(mail.outbox), 7)
+        self.assertFalse(Job.objects.exists())
+
+
+class ActivityFeedTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator', balance_cents=10000)
+        cls.hunter = CustomUser.objects.create(username='hunter')
+        cls.reward = Reward.objects.create(title='修复登录', description='desc', creator=cls.creator, reward_amount=1)
+
+    def feed(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('activity-feed'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def apply(self):
+        self.client.force_authenticate(self.hunter)
+        return self.client.post(reverse('application-list'), {'reward': self.reward.pk}).data['id']
+
+    def test_lifecycle_fans_out_to_both_sides(self):
+        application_id = self.apply()
+        self.client.force_authenticate(self.creator)
+        self.client.post(reverse('review_application', args=[application_id]), {'is_accepted': 'accept'})
+        self.client.force_authenticate(self.hunter)
+        self.client.post(reverse('update_reward_status', args=[application_id]))
+        self.client.force_authenticate(self.creator)
+        self.client.post(reverse('pay_for_reward', args=[self.reward.pk]), {'status': 'payed'})
+
+        verbs = ['application_created', 'application_accepted', 'reward_completed', 'reward_payed']
+        for user in (self.creator, self.hunter):
+            data = self.feed(user)
+            self.assertEqual([item['verb'] for item in data['results']], verbs)
+            self.assertEqual(data['results'][0]['actor_username'], 'hunter')
+            self.assertEqual(data['results'][0]['reward_title'], '修复登录')
+            self.assertFalse(data['has_more'])
+
+    def test_withdraw_and_reject(self):
+        self.client.delete(reverse('application-detail', args=[self.apply()]))
+        application_id = self.apply()
+        self.client.force_authenticate(self.creator)
+        self.client.post(reverse('review_application', args=[application_id]), {'is_accepted': 'reject'})
+        self.assertEqual([item['verb'] for item in self.feed(self.hunter)['results']],
+                         ['application_created', 'application_withdrawn', 'application_created',
+                          'application_rejected'])
+
+    def test_since_cursor(self):
+        for _ in range(3):
+            self.client.delete(reverse('application-detail', args=[self.apply()]))
+        first = self.feed(self.creator, limit=4)
+        self.assertEqual(len(first['results']), 4)
+        self.assertTrue(first['has_more'])
+        second = self.feed(self.creator, since=first['cursor'], limit=4)
+        self.assertEqual(len(second['results']), 2)
+        self.assertFalse(second['has_more'])
+
+        # 没有新动态时只有一次索引范围读取，返回空列表和原游标
+        with CaptureQueriesContext(connection) as queries:
+            empty = self.feed(self.creator, since=second['cursor'])
+        self.assertEqual(empty, {'results': [], 'cursor': second['cursor'], 'has_more': False})
+        self.assertEqual(len(queries), 1)
+        plan = Activity.objects.filter(user=self.creator, id__gt=1).order_by('id').explain()
+        self.assertIn('activity_user_idx', plan)
+        self.client.force_authenticate(self.creator)
+        self.assertEqual(self.client.get(reverse('activity-feed'), {'since': 'x'}).status_code, 400)
+
+    def test_prune_in_batches(self):
+        for _ in range(3):
+            self.client.delete(reverse('application-detail', args=[self.apply()]))
+        Activity.objects.filter(pk__in=Activity.objects.order_by('id').values('id')[:10]).update(
+            created_at=timezone.now() - timedelta(days=100))
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('prune_activity', days=90, batch_size=4, stdout=out)
+        self.assertIn('Pruned 10 activities', out.getvalue())
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('DELETE')]), 3)
+        self.assertEqual(Activity.objects.count(), 2)
+
+
+@override_settings(RECOMMENDATIONS={**settings.RECOMMENDATIONS, 'MIN_REFRESH_SECONDS': 0})
+class RecommendationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = CustomUser.objects.create(username='creator')
+        cls.hunter = CustomUser.objects.create(username='hunter')
+        cls.web = Category.objects.create(name='web')
+        cls.data = Category.objects.create(name='data')
+        for category in (cls.web, cls.web, cls.data):
+            reward = Reward.objects.create(title='done', description='d', creator=cls.creator, category=category,
+                                           receiver=cls.hunter, reward_amount=5, status='payed')
+            RewardApplication.objects.create(reward=reward, applicant=cls.hunter, is_accepted=True)
+
+        def create(title, category, amount, creator=cls.creator):
+            return Reward.objects.create(title=title, description='d', creator=creator, category=category,
+                                         reward_amount=amount)
+
+        cls.web_small = create('web small', cls.web, 10)
+        cls.web_big = create('web big', cls.web, 500)
+        cls.data_big = create('data big', cls.data, 500)
+        cls.other_huge = create('uncategorized huge', None, 100000)
+        cls.own = create('own', cls.web, 100000, creator=cls.hunter)
+
+    def setUp(self):
+        recommender.snapshot = None
+        invalidate_rewards()
+
+    def titles(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('reward-recommendations'), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['title'] for row in response.json()['results']]
+
+    def test_ranks_by_affinity_then_amount(self):
+        self.assertEqual(self.titles(self.hunter), ['web big', 'web small', 'data big', 'uncategorized huge'])
+        self.assertEqual(self.titles(self.hunter, limit=2), ['web big', 'web small'])
+        # 没有完成记录的用户只按赏金排序，自己发布的悬赏不推荐
+        self.assertEqual(self.titles(self.creator), ['own'])
+
+    def test_scoring_uses_the_snapshot(self):
+        self.titles(self.hunter)
+        with CaptureQueriesContext(connection) as queries:
+            self.titles(self.hunter)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"Reward"."id" IN', queries[0]['sql'])
+
+    def test_snapshot_follows_writes(self):
+        self.titles(self.hunter)
+        snapshot = recommender.snapshot
+        Reward.objects.filter(pk=self.web_big.pk).update(status='applied')
+        # 快照未刷新前，已不在挂单中的悬赏由最终查询剔除
+        self.assertNotIn('web big', self.titles(self.hunter))
+        self.assertIs(recommender.snapshot, snapshot)
+
+        invalidate_rewards()
+        self.assertEqual(self.titles(self.hunter)[0], 'web small')
+        self.assertIsNot(recommender.snapshot, snapshot)
+        self.assertNotIn(self.web_big.pk, recommender.snapshot.reward_ids.tolist())
+
+    def test_empty_database(self):
+        Reward.objects.all().delete()
+        self.assertEqual(self.titles(self.hunter), [])
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create(username='creator')
+        self.hunter = CustomUser.objects.create(username='hunter')
+        self.web = Category.objects.create(name='web')
+
+        def create(title, status, days_ago):
+            reward = Reward.objects.create(title=title, description='archive me', category=self.web,
+                                           creator=self.creator, receiver=self.hunter, reward_amount=10, status=status)
+            Reward.objects.filter(pk=reward.pk).update(updated_at=timezone.now() - timedelta(days=days_ago))
+            return reward
+
+        self.payed = create('old payed', 'payed', 200)
+        self.application = RewardApplication.objects.create(reward=self.payed, applicant=self.hunter, is_accepted=True)
+        self.taken_down = create('old take down', 'take_down', 365)
+        self.recent = create('recent payed', 'payed', 10)
+        self.open = create('old waiting', 'waiting', 365)
+
+    def get(self, user, name, *args, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse(name, args=args), params)
+
+    def archive(self, **options):
+        out = io.StringIO()
+        call_command('archive_rewards', days=180, stdout=out, **options)
+        return out.getvalue()
+
+    def test_moves_terminal_rows_in_batches(self):
+        stats = self.client.get(reverse('category-stats')).data
+        with CaptureQueriesContext(connection) as queries:
+            output = self.archive(batch_size=1, pause=0)
+        self.assertIn('Archived 2 rewards and 1 applications in 2 batches', output)
+        self.assertIn('rows/s', output)
+        # 每批一条 INSERT ... SELECT，行不经过 Python
+        self.assertEqual(sum(query['sql'].startswith('INSERT INTO "RewardArchive"') for query in queries), 2)
+
+        self.assertEqual(set(Reward.objects.values_list('title', flat=True)), {'recent payed', 'old waiting'})
+        self.assertEqual(set(ArchivedReward.objects.values_list('id', flat=True)), {self.payed.pk, self.taken_down.pk})
+        self.assertEqual(list(ArchivedRewardApplication.objects.values_list('id', 'reward_id')),
+                         [(self.application.pk, self.payed.pk)])
+        self.assertFalse(RewardApplication.objects.exists())
+        # 统计不变，重建计数后仍然一致
+        self.assertEqual(self.client.get(reverse('category-stats')).data, stats)
+        rebuild_counters()
+        self.assertEqual(self.client.get(reverse('category-stats')).data, stats)
+        # 公开列表和搜索不再返回归档的悬赏
+        self.assertEqual(self.client.get(reverse('reward-search'), {'q': 'archive'}).data['count'], 2)
+
+        self.assertIn('Archived 0 rewards', self.archive())
+
+    def test_history_reads_archive_when_asked(self):
+        rewards = self.get(self.creator, 'rewards-list').json()
+        detail = self.get(self.creator, 'rewards-detail', self.payed.pk).json()
+        applications = self.get(self.hunter, 'application-list').json()
+        self.archive()
+
+        self.assertEqual(len(self.get(self.creator, 'rewards-list').json()), 2)
+        self.assertEqual(self.get(self.creator, 'rewards-list', include_archived='true').json(), rewards)
+        self.assertEqual(self.get(self.creator, 'rewards-list', include_archived='true', fields='id,title').json(),
+                         [{'id': row['id'], 'title': row['title']} for row in rewards])
+        self.assertEqual(self.get(self.creator, 'rewards-detail', self.payed.pk).status_code, 404)
+        self.assertEqual(self.get(self.creator, 'rewards-detail', self.payed.pk, include_archived='1').json(), detail)
+
+        self.assertEqual(self.get(self.hunter, 'application-list').json(), [])
+        self.assertEqual(self.get(self.hunter, 'application-list', include_archived='true').json(), applications)
+        self.assertEqual(self.get(self.hunter, 'application-detail', self.application.pk,
+                                  include_archived='true').json(), applications[0])
+        # 其他用户读不到，归档的行也不能修改
+        self.assertEqual(self.get(self.hunter, 'rewards-detail', self.payed.pk, include_archived='1').status_code,
+                         404)
+        self.client.force_authenticate(self.creator)
+        response = self.client.patch(reverse('rewards-detail', args=[self.payed.pk]) + '?include_archived=1',
+                                     {'title': 'x'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_recommendations_count_archived_applications(self):
+        self.archive()
+        recommender.snapshot = None
+        invalidate_rewards()
+        self.client.force_authenticate(self.hunter)
+        self.client.get(reverse('reward-recommendations'))
+        snapshot = recommender.snapshot
+        row = snapshot.user_ids.tolist().index(self.hunter.pk)
+        self.assertEqual(snapshot.affinity[row].max(), 1.0)
+
+
+class RewardExpiryTests(APITestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create(username='creator')
+        self.hunter = CustomUser.objects.create(username='hunter')
+        self.other = CustomUser.objects.create(username='other')
+        self.web = Category.objects.create(name='web')
+        past, future = timezone.now() - timedelta(hours=1), timezone.now() + timedelta(days=1)
+
+        def create(title, deadline, status='waiting', receiver=None):
+            return Reward.objects.create(title=title, description='d', category=self.web, creator=self.creator,
+                                         reward_amount=10, deadline=deadline, status=status, receiver=receiver)
+
+        self.waiting = [create(f'expired {i}', past) for i in range(3)]
+        self.applied = create('expired applied', past, 'applied', self.hunter)
+        self.application = RewardApplication.objects.create(reward=self.applied, applicant=self.hunter)
+        self.in_progress = create('expired in progress', past, 'in_progress', self.other)
+        self.open = create('open', future)
+        self.no_deadline = create('no deadline', None)
+
+    def stats(self):
+        return {row['status']: (row['reward_count'], row['total_amount'])
+                for row in self.client.get(reverse('category-stats')).data}
+
+    def test_sweeper_cancels_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            out = io.StringIO()
+            call_command('expire_rewards', batch_size=2, stdout=out)
+        self.assertIn('Expired 4 rewards and cleared 1 applications', out.getvalue())
+        # 每批一条领取语句，不随行数增长：waiting 分 2 + 1 两批，applied 一批
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "Reward" SET "status"') for query in queries), 3)
+
+        statuses = dict(Reward.objects.values_list('title', 'status'))
+        self.assertEqual(statuses, {'expired 0': 'cancelled', 'expired 1': 'cancelled', 'expired 2': 'cancelled',
+                                    'expired applied': 'cancelled', 'expired in progress': 'in_progress',
+                                    'open': 'waiting', 'no deadline': 'waiting'})
+        self.applied.refresh_from_db()
+        self.assertIsNone(self.applied.receiver_id)
+        self.assertEqual(self.applied.application_count, 0)
+        self.assertFalse(RewardApplication.objects.exists())
+
+        self.assertEqual(self.stats(), {'waiting': (2, '20.00'), 'cancelled': (4, '40.00'),
+                                        'in_progress': (1, '10.00')})
+        expected = self.stats()
+        rebuild_counters()
+        self.assertEqual(self.stats(), expected)
+
+        self.assertEqual(Activity.objects.filter(verb='reward_expired', user=self.creator).count(), 4)
+        self.assertEqual(Activity.objects.filter(verb='reward_expired', user=self.hunter).count(), 1)
+
+        self.assertIn('Expired 0 rewards', self.call_quietly())
+
+    def call_quietly(self):
+        out = io.StringIO()
+        call_command('expire_rewards', stdout=out)
+        return out.getvalue()
+
+    def test_request_path_loses_to_sweeper(self):
+        reward = Reward.objects.get(pk=self.applied.pk)
+        self.call_quietly()
+        # 清理已经提交，之前读到的 applied 状态已过时，审核返回 409
+        self.assertFalse(transition(reward, 'accept'))
+        self.client.force_authenticate(self.other)
+        response = self.client.post(reverse('application-list'), {'reward': self.waiting[0].pk})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sweeper_skips_rewards_that_moved_on(self):
+        transition(self.applied, 'accept')
+        self.call_quietly()
+        self.assertEqual(Reward.objects.get(pk=self.applied.pk).status, 'in_progress')
+
+    def test_deadline_is_validated(self):
+        self.client.force_authenticate(self.creator)
+        data = {'title': 't', 'description': 'd', 'category': self.web.pk, 'reward_amount': '1.00'}
+        response = self.client.post(reverse('rewards-list'), {**data, 'deadline': '2000-01-01T00:00:00Z'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('deadline', response.data)
+        deadline = (timezone.now() + timedelta(days=3)).isoformat()
+        response = self.client.post(reverse('rewards-list'), {**data, 'deadline': deadline})
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNotNone(response.data['deadline'])
+
+        self.client.force_authenticate(self.hunter)
+        response = self.client.post(reverse('application-list'), {'reward': self.waiting[0].pk})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unchanged_past_deadline_can_be_sent_back(self):
+        reward = Reward.objects.create(title='taken down', description='d', category=self.web, creator=self.creator,
+                                       reward_amount=10, deadline=self.waiting[0].deadline, status='take_down')
+        self.client.force_authenticate(self.creator)
+        url = reverse('rewards-detail', args=[reward.pk])
+        data = self.client.get(url).data
+        response = self.client.put(url, {**data, 'title': 'renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'renamed')
+
+        earlier = (reward.deadline - timedelta(days=1)).isoformat()
+        response = self.client.put(url, {**data, 'deadline': earlier}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('deadline', response.data)
+
+
+class BatchReviewTests(APITestCase):
+    def setUp(self):
+        self.creator = CustomUser.objects.create(username='creator')
+        self.stranger = CustomUser.objects.create(username='stranger')
+        self.moderator = CustomUser.objects.create(username='moderator', is_superuser=True)
+        self.web = Category.objects.create(name='web')
+        self.applications = [self.apply(self.creator, i) for i in range(12)]
+        self.foreign = self.apply(self.stranger, 'x')
+
+    def apply(self, creator, suffix):
+        hunter = CustomUser.objects.create(username=f'hunter {suffix}')
+        reward = Reward.objects.create(title=f'reward {suffix}', description='d', category=self.web, creator=creator,
+                                       reward_amount=10)
+        transition(reward, 'apply', receiver=hunter)
+        return RewardApplication.objects.create(reward=reward, applicant=hunter)
+
+    def review(self, items, user=None):
+        self.client.force_authenticate(user or self.creator)
+        return self.client.post(reverse('review_applications'), items, format='json')
+
+    def test_per_item_results(self):
+        accepted, rejected, stale = self.applications[:3]
+        transition(stale.reward, 'reject', receiver=None)
+        response = self.review([
+            {'application_id': accepted.pk, 'is_accepted': 'accept'},
+            {'application_id': rejected.pk, 'is_accepted': 'reject'},
+            {'application_id': stale.pk, 'is_accepted': 'accept'},
+            {'application_id': self.foreign.pk, 'is_accepted': 'accept'},
+            {'application_id': 999999, 'is_accepted': 'reject'},
+            {'application_id': accepted.pk, 'is_accepted': 'reject'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['status'] for row in response.data['results']], [200, 200, 409, 403, 404, 400])
+        self.assertEqual(response.data['results'][0]['detail'], '已通过审核')
+
+        statuses = dict(Reward.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[accepted.reward_id], 'in_progress')
+        self.assertEqual(statuses[rejected.reward_id], 'waiting')
+        self.assertEqual(statuses[self.foreign.reward_id], 'applied')
+        self.assertIsNone(Reward.objects.get(pk=rejected.reward_id).receiver_id)
+        self.assertEqual(list(RewardApplication.objects.filter(is_accepted=True)), [accepted])
+
+        self.assertEqual(sorted(Activity.objects.filter(user=self.creator).values_list('verb', flat=True)),
+                         ['application_accepted', 'application_rejected'])
+        self.assertEqual(sorted((job.payload['application_id'], job.payload['accepted'])
+                                for job in Job.objects.filter(name='notify-review')),
+                         [(accepted.pk, True), (rejected.pk, False)])
+        stats = {row['status']: row['reward_count'] for row in self.client.get(reverse('category-stats')).data}
+        self.assertEqual(stats, {'applied': 10, 'in_progress': 1, 'waiting': 2})
+
+    def test_statement_count_does_not_grow_with_the_batch(self):
+        def count(applications, decision):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.review([{'application_id': application.pk, 'is_accepted': decision}
+                                        for application in applications])
+            self.assertEqual({row['status'] for row in response.data['results']}, {200})
+            return len(queries)
+
+        # 第一批会建出 in_progress 的统计行，从第二批开始比较
+        count(self.applications[:1], 'accept')
+        self.assertEqual(count(self.applications[1:3], 'accept'), count(self.applications[3:12], 'accept'))
+
+    def test_stale_item_does_not_block_current_application(self):
+        stale = self.applications[0]
+        reward = stale.reward
+        transition(reward, 'reject', receiver=None)
+        hunter = CustomUser.objects.create(username='second hunter')
+        transition(reward, 'apply', receiver=hunter)
+        current = RewardApplication.objects.create(reward=reward, applicant=hunter)
+
+        response = self.review([{'application_id': stale.pk, 'is_accepted': 'reject'},
+                                {'application_id': current.pk, 'is_accepted': 'accept'}])
+        self.assertEqual([row['status'] for row in response.data['results']], [409, 200])
+        reward.refresh_from_db()
+        self.assertEqual((reward.status, reward.receiver_id), ('in_progress', hunter.pk))
+
+    def test_superuser_reviews_any_reward(self):
+        response = self.review([{'application_id': self.foreign.pk, 'is_accepted': 'reject'}], self.moderator)
+        self.assertEqual(response.data['results'][0]['status'], 200)
+        self.assertEqual(Reward.objects.get(pk=self.foreign.reward_id).status, 'waiting')
+
+    def test_invalid_payload(self):
+        self.assertEqual(self.review([]).status_code, 400)
+        self.assertEqual(self.review([{'application_id': self.foreign.pk, 'is_accepted': 'maybe'}]).status_code, 400)
+        self.assertEqual(self.review({'application_id': self.foreign.pk}).status_code, 400)
+        self.assertEqual(Reward.objects.get(pk=self.foreign.reward_id).status, 'applied')
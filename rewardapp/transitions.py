@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .cache import invalidate_rewards
+from .models import Reward
+from .stats import move_reward_stats, move_rewards_stats
+
+# 动作 -> (要求的当前状态, 目标状态)。所有状态变更都只能通过这里声明的动作进行
+TRANSITIONS = {
+    'apply': ('waiting', 'applied'),  # 接单
+    'withdraw': ('applied', 'waiting'),  # 撤回申请
+    'reject': ('applied', 'waiting'),  # 驳回申请
+    'accept': ('applied', 'in_progress'),  # 通过申请
+    'complete': ('in_progress', 'completed'),  # 提交完成
+    'pay': ('completed', 'payed'),  # 结款
+    'callback': ('completed', 'callback'),  # 打回
+    'take_down': ('waiting', 'take_down'),  # 下架
+    'relist': ('take_down', 'waiting'),  # 重新上架
+    'expire': ('waiting', 'cancelled'),  # 过截止时间仍无人接单
+    'expire_applied': ('applied', 'cancelled'),  # 过截止时间仍未通过审核
+}
+
+
+class TransitionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = '悬赏状态已变化，操作未生效'
+    default_code = 'conflict'
+
+
+def transition(reward, action, when=None, **changes):
+    """用一条带当前状态条件的 UPDATE 执行动作；when 为附加条件，changes 为同时写入的字段。
+    返回 False 表示已被其他请求抢先修改，什么都没写"""
+    source, target = TRANSITIONS[action]
+    changes = {'status': target, 'updated_at': timezone.now(), **changes}
+    with transaction.atomic():
+        queryset = Reward.objects.filter(pk=reward.pk, status=source)
+        # when 可以是字段条件的 dict，也可以是 Q / Exists 等表达式
+        if isinstance(when, dict):
+            queryset = queryset.filter(**when)
+        elif when is not None:
+            queryset = queryset.filter(when)
+        won = queryset.update(**changes)
+        if not won:
+            return False
+        move_reward_stats((reward.category_id, source, reward.reward_amount),
+                          (reward.category_id, target, reward.reward_amount))
+    invalidate_rewards()
+
+    for field, value in changes.items():
+        setattr(reward, field, value)
+    reward._stats_snapshot = reward.stats_key()
+    return True
+
+
+def require_transition(reward, action, when=None, **changes):
+    """失败时抛出 TransitionConflict（409）"""
+    if not transition(reward, action, when, **changes):
+        raise TransitionConflict()
+
+
+def bulk_transition(rewards, action, **changes):
+    """一条 UPDATE 批量执行动作；调用方已锁定并检查过状态，有任何一行没更新就抛出 TransitionConflict 回滚"""
+    if not rewards:
+        return
+    source, target = TRANSITIONS[action]
+    changes = {'status': target, 'updated_at': timezone.now(), **changes}
+    with transaction.atomic():
+        updated = Reward.objects.filter(pk__in=[reward.pk for reward in rewards], status=source).update(**changes)
+        if updated != len(rewards):
+            raise TransitionConflict()
+        move_rewards_stats([(reward.category_id, reward.reward_amount) for reward in rewards], source, target)
+    invalidate_rewards()
+
+    for reward in rewards:
+        for field, value in changes.items():
+            setattr(reward, field, value)
+        reward._stats_snapshot = reward.stats_key()
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import *
 
 router = DefaultRouter()
@@ -10,7 +11,16 @@ router.register(r'applications', RewardApplicationViewSet, basename='application
 urlpatterns = [
     path('', include(router.urls)),
     path('public-rewards/', PublicRewardListView.as_view(), name='public-reward-list'),
+    path('async/public-rewards/', async_views.public_reward_list, name='async-public-reward-list'),
+    path('async/rewards/<int:pk>/', async_views.reward_detail, name='async-reward-detail'),
+    path('search-rewards/', RewardSearchView.as_view(), name='reward-search'),
+    path('feed/', ActivityFeedView.as_view(), name='activity-feed'),
+    path('recommendations/', RecommendationView.as_view(), name='reward-recommendations'),
+    path('stats/categories/', CategoryStatsView.as_view(), name='category-stats'),
+    path('export/rewards/', RewardExportView.as_view(), name='reward-export'),
+    path('export/applications/', RewardApplicationExportView.as_view(), name='application-export'),
     path('review_application/<int:application_id>/', ReviewApplicationView.as_view(), name='review_application'),
+    path('review_applications/', BatchReviewApplicationView.as_view(), name='review_applications'),
     path('update_reward_status/<int:application_id>/', UpdateRewardStatusView.as_view(), name='update_reward_status'),
     path('rewardpay/<int:reward_id>/', RewardPayView.as_view(), name='pay_for_reward'),
 ]
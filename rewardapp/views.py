@@ -1,18 +1,38 @@
+from django.db import transaction
+from django.http import Http404
 from rest_framework import serializers, status
 from rest_framework import generics
+from rest_framework.generics import get_object_or_404
+from rest_framework.decorators import action
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .serializers import RewardSerializer
-from .permissions import IsOwnerOrReadOnly
+from userapp.leaderboard import record_completion
+from userapp.ledger import InsufficientBalance, to_cents, transfer
+from .serializers import RewardSerializer, activity_row_mapper, reward_row_mapper
+from .cache import caching_enabled, get_cached_response, response_cache_key, set_cached_response
+from .activity import get_activity_settings, publish, publish_many
+from .archive import include_archived
+from .exports import EXPORT_FORMATS, streaming_export
+from .jobs import enqueue, enqueue_many
+from .pagination import RewardCursorPagination, RewardSearchPagination
+from .permissions import IsOwnerOrReadOnly, IsSuperUser
 from rest_framework.permissions import AllowAny, BasePermission
-from .models import Category
-from .serializers import CategorySerializer
+from .models import Activity, ArchivedReward, ArchivedRewardApplication, Category, CategoryStats
+from .serializers import CategorySerializer, CategoryStatsSerializer
 from rest_framework import viewsets
 from .models import RewardApplication, Reward
-from .serializers import RewardApplicationSerializer
+from .serializers import RewardApplicationSerializer, ReviewItemSerializer
 from .permissions import IsApplicantOrReadOnly
+from .rows import RowListMixin
+from .recommendations import get_recommendation_settings, recommender
+from .search import search_rewards
+from .transitions import TransitionConflict, bulk_transition, require_transition, transition
 from rest_framework.permissions import IsAuthenticated
+from HackIt2.fieldsets import SparseFieldsMixin
+from HackIt2.routers import ReplicaReadMixin, pin_primary
 
 
 class IsSuperUserOrReadOnly(BasePermission):
@@ -24,73 +44,184 @@ class IsSuperUserOrReadOnly(BasePermission):
         return request.user and request.user.is_superuser
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsSuperUserOrReadOnly]
 
+    def get_queryset(self):
+        return self.sparse_queryset(super().get_queryset())
+
 
-class RewardViewSet(viewsets.ModelViewSet):
+class RewardViewSet(SparseFieldsMixin, RowListMixin, viewsets.ModelViewSet):
     queryset = Reward.objects.all()
     serializer_class = RewardSerializer
+    row_mapper = reward_row_mapper
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    bulk_create_max_length = 1000
 
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
+    @action(detail=False, methods=['post'], url_path='bulk', url_name='bulk')
+    def bulk_create(self, request):
+        serializer = self.get_serializer(data=request.data, many=True, max_length=self.bulk_create_max_length)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(creator=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def get_queryset(self):
-        return Reward.objects.filter(creator=self.request.user)
+        queryset = Reward.objects.filter(creator=self.request.user).select_related('category', 'creator')
+        return self.sparse_queryset(queryset)
+
+    def get_archived_queryset(self):
+        return self.sparse_queryset(
+            ArchivedReward.objects.filter(creator=self.request.user).select_related('category', 'creator'))
+
+    def list(self, request, *args, **kwargs):
+        if not include_archived(request.query_params):
+            return super().list(request, *args, **kwargs)
+        # 归档表与 Reward 列名相同，同一个 RowMapper 读两张表，UNION ALL 后按 id 排序，一次查询
+        mapper = self.get_row_mapper()
+        rows = mapper.values(self.get_queryset(), ('id',)).union(
+            mapper.values(self.get_archived_queryset(), ('id',)), all=True)
+        return Response(mapper.map(rows.order_by('id')))
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.request.method != 'GET' or not include_archived(self.request.query_params):
+                raise
+        # 归档的悬赏只读，RewardSerializer 按同名属性输出
+        obj = get_object_or_404(self.get_archived_queryset(), pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+def get_public_reward_queryset(params, category=None):
+    """公开悬赏列表的过滤条件，同步和异步视图共用；分类由调用方按各自的方式查好传入"""
+    queryset = Reward.objects.select_related('category', 'creator')
+    status = params.get('status', None)
+    if status is not None:
+        queryset = queryset.filter(status=status)
+
+    if category is not None:
+        queryset = queryset.filter(category=category)
+
+    creator_username = params.get('creator_username', None)
+    if creator_username:
+        queryset = queryset.filter(creator__username=creator_username)
 
+    return queryset
 
-class PublicRewardListView(generics.ListAPIView):
+
+class PublicRewardListView(ReplicaReadMixin, RowListMixin, generics.ListAPIView):
     serializer_class = RewardSerializer
+    row_mapper = reward_row_mapper
     permission_classes = [AllowAny]
+    pagination_class = RewardCursorPagination
+    throttle_scope = 'public'
+
+    def list(self, request, *args, **kwargs):
+        # 缓存键里带着全局版本号，任何 Reward/Category 写入都会让旧键整体失效
+        key = response_cache_key(request)
+        data = get_cached_response(key)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        if caching_enabled():
+            # 副本可能落后于主库：版本号刚递增时从副本读到的旧页面会以新版本号缓存整个 TIMEOUT，
+            # 所以要写入缓存的结果一律读主库，只有关闭缓存时才读副本
+            pin_primary()
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_cached_response(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
 
     def get_queryset(self):
-
+        category = None
         category_name = self.request.query_params.get('category_name', None)
-        creator_username = self.request.query_params.get('creator_username', None)
-        status = self.request.query_params.get('status', None)
-        if status is not None:
-            queryset = Reward.objects.filter(status=status)
-        else:
-            queryset = Reward.objects.all()
-
         if category_name:
             try:
                 category = Category.objects.get(name=category_name)
-                queryset = queryset.filter(category=category)
             except Category.DoesNotExist:
                 raise NotFound(detail="未找到分类")
 
-        if creator_username:
-            queryset = queryset.filter(creator__username=creator_username)
+        return get_public_reward_queryset(self.request.query_params, category)
 
-        return queryset
 
+class RewardSearchView(PublicRewardListView):
+    pagination_class = RewardSearchPagination
 
-class RewardApplicationViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        return search_rewards(super().get_queryset(), self.request.query_params.get('q', ''))
+
+
+class CategoryStatsView(ReplicaReadMixin, generics.ListAPIView):
+    """各分类各状态的悬赏数与赏金总额，直接读 CategoryStats 计数表"""
+    serializer_class = CategoryStatsSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        queryset = CategoryStats.objects.select_related('category').filter(reward_count__gt=0)
+        category_name = self.request.query_params.get('category_name', None)
+        if category_name:
+            queryset = queryset.filter(category__name=category_name)
+        status = self.request.query_params.get('status', None)
+        if status is not None:
+            queryset = queryset.filter(status=status)
+        return queryset.order_by('category_id', 'status')
+
+
+class RewardApplicationViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = RewardApplicationSerializer
     permission_classes = [IsAuthenticated, IsApplicantOrReadOnly]
 
     def get_queryset(self):
+        queryset = self.sparse_queryset(RewardApplication.objects.select_related('reward'))
+        if self.request.user.is_superuser:
+            return queryset
+        return queryset.filter(applicant=self.request.user)
+
+    def get_archived_queryset(self):
+        queryset = self.sparse_queryset(ArchivedRewardApplication.objects.all())
         if self.request.user.is_superuser:
-            return RewardApplication.objects.all()
-        return RewardApplication.objects.filter(applicant=self.request.user)
+            return queryset
+        return queryset.filter(applicant=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        if not include_archived(request.query_params):
+            return super().list(request, *args, **kwargs)
+        applications = [*self.get_queryset(), *self.get_archived_queryset()]
+        return Response(self.get_serializer(applications, many=True).data)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.request.method != 'GET' or not include_archived(self.request.query_params):
+                raise
+        obj = get_object_or_404(self.get_archived_queryset(), pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, obj)
+        return obj
 
     def perform_create(self, serializer):
         reward = serializer.validated_data['reward']
-        if reward.creator == self.request.user or reward.status != 'waiting':
-            print(reward.creator)
-            print(self.request.user)
+        if reward.creator_id == self.request.user.pk or reward.status != 'waiting':
             raise serializers.ValidationError(
                 "无法接受自己发布的悬赏，或者悬赏状态不为waiting")
+        # 已过截止时间、还没被清理的悬赏同样不能接单
+        if reward.deadline is not None and reward.deadline <= timezone.now():
+            raise serializers.ValidationError("悬赏已过截止时间")
 
-        serializer.save(applicant=self.request.user)
-
-        reward.receiver = self.request.user
-        reward.status = 'applied'
-        reward.save()
+        # 并发接单时只有一个请求能把 waiting 改成 applied，其余返回 409 且不留下申请记录
+        with transaction.atomic():
+            require_transition(reward, 'apply', receiver=self.request.user)
+            application = serializer.save(applicant=self.request.user)
+            publish('application_created', reward, self.request.user, self.request.user.pk, application.pk)
+            enqueue('notify-application', application_id=application.pk)
 
     def destroy(self, request, *args, **kwargs):
         application = self.get_object()
@@ -99,12 +230,11 @@ class RewardApplicationViewSet(viewsets.ModelViewSet):
         if application.is_accepted:
             raise serializers.ValidationError("无法删除已被接受的悬赏")
 
-        response = super().destroy(request, *args, **kwargs)
-
-        if not reward.applications.exists():
-            reward.receiver = None
-            reward.status = 'waiting'
-            reward.save()
+        with transaction.atomic():
+            response = super().destroy(request, *args, **kwargs)
+            # 撤回者正占着该悬赏时才退回 waiting，与审核的判断一致；已被驳回的旧申请撤回不影响当前接单
+            transition(reward, 'withdraw', when={'receiver_id': application.applicant_id}, receiver=None)
+            publish('application_withdrawn', reward, request.user, application.applicant_id, application.pk)
 
         return response
 
@@ -120,55 +250,128 @@ class ReviewApplicationView(APIView):
 
     def post(self, request, application_id):
         try:
-            application = RewardApplication.objects.get(pk=application_id)
+            application = RewardApplication.objects.select_related('reward').get(pk=application_id)
         except RewardApplication.DoesNotExist:
             return Response({"detail": "未找到此申请"}, status=status.HTTP_404_NOT_FOUND)
 
-        if not request.user.is_superuser and application.reward.creator != request.user:
+        if not request.user.is_superuser and application.reward.creator_id != request.user.pk:
             return Response({"detail": "当前用户无权限操作此申请"},
                             status=status.HTTP_403_FORBIDDEN)
 
+        # 只能审核当前占着该悬赏的申请，旧的申请不会误改别人的接单
+        reward, current = application.reward, {'receiver_id': application.applicant_id}
         is_accepted = request.data.get('is_accepted')
         if is_accepted == "reject":
-            application.reward.status = 'waiting'
-            application.reward.save()
+            with transaction.atomic():
+                require_transition(reward, 'reject', when=current, receiver=None)
+                publish('application_rejected', reward, request.user, application.applicant_id, application.pk)
+                enqueue('notify-review', application_id=application.pk, accepted=False)
             return Response({"detail": "已拒绝申请"}, status=status.HTTP_200_OK)
         elif is_accepted == "accept":
-            application.is_accepted = True
-            application.save()
-
-            application.reward.status = 'in_progress'
-            application.reward.save()
+            with transaction.atomic():
+                require_transition(reward, 'accept', when=current)
+                RewardApplication.objects.filter(pk=application.pk).update(is_accepted=True,
+                                                                          updated_at=timezone.now())
+                publish('application_accepted', reward, request.user, application.applicant_id, application.pk)
+                enqueue('notify-review', application_id=application.pk, accepted=True)
 
             return Response({"detail": "已通过审核"}, status=status.HTTP_200_OK)
         else:
             return Response({"detail": "不支持的参数"}, status=status.HTTP_404_NOT_FOUND)
 
 
+class BatchReviewApplicationView(APIView):
+    """批量审核，按提交顺序返回每项的 status 与 detail，单项失败不影响其他项"""
+    permission_classes = [IsAuthenticated]
+    max_length = 500
+
+    messages = {
+        'accept': (status.HTTP_200_OK, "已通过审核"),
+        'reject': (status.HTTP_200_OK, "已拒绝申请"),
+        'not_found': (status.HTTP_404_NOT_FOUND, "未找到此申请"),
+        'forbidden': (status.HTTP_403_FORBIDDEN, "当前用户无权限操作此申请"),
+        'duplicate': (status.HTTP_400_BAD_REQUEST, "同一申请或悬赏在本批中只能审核一次"),
+        'conflict': (status.HTTP_409_CONFLICT, TransitionConflict.default_detail),
+    }
+
+    def post(self, request):
+        serializer = ReviewItemSerializer(data=request.data, many=True, allow_empty=False, max_length=self.max_length)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+
+        with transaction.atomic():
+            applications = RewardApplication.objects.select_related('reward').select_for_update().in_bulk(
+                [item['application_id'] for item in items])
+            outcomes, decided, reviewed = [], {'accept': [], 'reject': []}, set()
+            for item in items:
+                outcome = self.check(request.user, applications.get(item['application_id']), reviewed)
+                if outcome is None:
+                    outcome = item['is_accepted']
+                    decided[outcome].append(applications[item['application_id']])
+                outcomes.append(outcome)
+
+            accepted, rejected = decided['accept'], decided['reject']
+            bulk_transition([application.reward for application in accepted], 'accept')
+            bulk_transition([application.reward for application in rejected], 'reject', receiver=None)
+            if accepted:
+                RewardApplication.objects.filter(pk__in=[application.pk for application in accepted]).update(
+                    is_accepted=True, updated_at=timezone.now())
+            for verb, batch in (('application_accepted', accepted), ('application_rejected', rejected)):
+                publish_many(verb, [(application.reward_id, application.reward.title, application.reward.creator_id,
+                                     application.applicant_id, application.pk) for application in batch], request.user)
+            enqueue_many('notify-review', [{'application_id': application.pk, 'accepted': outcome == 'accept'}
+                                           for outcome, batch in decided.items() for application in batch])
+
+        results = []
+        for item, outcome in zip(items, outcomes):
+            code, detail = self.messages[outcome]
+            results.append({'application_id': item['application_id'], 'status': code, 'detail': detail})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def check(user, application, reviewed):
+        """单项不能审核的原因，可以审核时返回 None"""
+        if application is None:
+            return 'not_found'
+        reward = application.reward
+        if not user.is_superuser and reward.creator_id != user.pk:
+            return 'forbidden'
+        if {('application', application.pk), ('reward', reward.pk)} & reviewed:
+            return 'duplicate'
+        reviewed.add(('application', application.pk))
+        # 与单条审核相同：只能审核当前占着该悬赏的申请；过期的申请不占用该悬赏在本批中的名额
+        if reward.status != 'applied' or reward.receiver_id != application.applicant_id:
+            return 'conflict'
+        reviewed.add(('reward', reward.pk))
+        return None
+
+
 class UpdateRewardStatusView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, application_id):
         try:
-            application = RewardApplication.objects.get(pk=application_id)
+            application = RewardApplication.objects.select_related('reward').get(pk=application_id)
         except RewardApplication.DoesNotExist:
             return Response({"detail": "Application not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        if application.applicant != request.user:
+        if application.applicant_id != request.user.pk:
             return Response({"detail": "You do not have permission to update this reward."},
                             status=status.HTTP_403_FORBIDDEN)
 
         if not application.is_accepted:
             return Response({"detail": "This application has not been accepted."}, status=status.HTTP_400_BAD_REQUEST)
 
-        application.reward.status = 'completed'
-        application.reward.save()
+        with transaction.atomic():
+            require_transition(application.reward, 'complete', when={'receiver_id': application.applicant_id})
+            publish('reward_completed', application.reward, request.user, application.applicant_id, application.pk)
 
         return Response({"detail": "Reward status updated to completed successfully."}, status=status.HTTP_200_OK)
 
 
 class RewardPayView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'payments'
 
     def post(self, request, reward_id):
         try:
@@ -176,7 +379,7 @@ class RewardPayView(APIView):
         except Reward.DoesNotExist:
             return Response({"detail": "悬赏未找到"}, status=status.HTTP_404_NOT_FOUND)
 
-        if reward.creator != request.user:
+        if reward.creator_id != request.user.pk:
             return Response({"detail": "此悬赏无审批权限"}, status=status.HTTP_403_FORBIDDEN)
 
         if reward.status != 'completed':
@@ -186,18 +389,102 @@ class RewardPayView(APIView):
         if new_status not in ['payed', 'callback']:
             return Response({"detail": "参数错误"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if reward.creator.balance < reward.reward_amount:
+        try:
+            with transaction.atomic():
+                # 先以 status='completed' 为条件改状态，并发的重复审批只有一个能命中，不会重复付款
+                if not transition(reward, 'pay' if new_status == 'payed' else 'callback'):
+                    return Response({"detail": "只允许审批已完成的悬赏"}, status=status.HTTP_409_CONFLICT)
+                publish(f'reward_{new_status}', reward, request.user, reward.receiver_id)
+                amount_cents = to_cents(reward.reward_amount)
+                # 旧数据可能有 0 元悬赏：不产生转账，但仍然结款并计入完成数
+                if amount_cents > 0:
+                    transfer(reward.creator_id, reward.receiver_id, amount_cents, reward=reward)
+                record_completion(reward.receiver_id, amount_cents)
+        except InsufficientBalance:
             return Response({"detail": "余额不足，无法支付悬赏金额"}, status=status.HTTP_400_BAD_REQUEST)
 
-        receiver = reward.receiver
-        receiver.balance += float(reward.reward_amount)
-        receiver.completed_tasks += 1
-        receiver.save()
+        return Response({"detail": f"审批成功： {new_status} "}, status=status.HTTP_200_OK)
 
-        reward.creator.balance -= float(reward.reward_amount)
-        reward.creator.save()
 
-        reward.status = new_status
-        reward.save()
+class RecommendationView(APIView):
+    """?limit=20：按分类偏好与赏金为当前用户推荐挂单中的悬赏，每个请求只查一次悬赏"""
+    permission_classes = [IsAuthenticated]
 
-        return Response({"detail": f"审批成功： {new_status} "}, status=status.HTTP_200_OK)
+    def get(self, request):
+        config = get_recommendation_settings()
+        try:
+            limit = int(request.query_params.get('limit', config['PAGE_SIZE']))
+        except ValueError:
+            return Response({"detail": "参数错误"}, status=status.HTTP_400_BAD_REQUEST)
+        ids = recommender.recommend(request.user.pk, min(max(limit, 1), config['MAX_PAGE_SIZE']))
+
+        # 快照可能稍旧，已不在挂单中的悬赏在这里剔除
+        queryset = Reward.objects.filter(pk__in=ids, status='waiting')
+        rows = {row.id: row for row in reward_row_mapper.values(queryset)}
+        return Response({'results': reward_row_mapper.map([rows[pk] for pk in ids if pk in rows])})
+
+
+class ActivityFeedView(APIView):
+    """?since=<cursor>&limit=50：当前用户在游标之后的动态与新的游标，没有新动态时返回原游标"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        config = get_activity_settings()
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', config['PAGE_SIZE']))
+        except ValueError:
+            return Response({"detail": "参数错误"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), config['MAX_PAGE_SIZE'])
+
+        queryset = Activity.objects.filter(user=request.user, id__gt=since).order_by('id')
+        # 多取一行判断是否还有下一页
+        rows = list(activity_row_mapper.values(queryset)[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return Response({
+            'results': activity_row_mapper.map(rows),
+            'cursor': rows[-1].id if rows else since,
+            'has_more': has_more,
+        })
+
+
+class ExportView(APIView):
+    """导出 NDJSON/CSV，?since= 只导出 updated_at >= since 的行；边界上的行可能重复，下游应按 id 幂等写入"""
+    permission_classes = [IsSuperUser]
+    model = None
+    columns = ()
+    filename = None
+
+    def get(self, request):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response({"detail": "不支持的导出格式"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.model.objects.all()
+        since = request.query_params.get('since')
+        if since:
+            try:
+                # 格式正确但日期不存在（如 2 月 30 日）时 parse_datetime 抛出 ValueError
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                return Response({"detail": "since 参数格式错误"}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(updated_at__gte=since)
+
+        return streaming_export(queryset.order_by('updated_at', 'id'), self.columns, export_format, self.filename)
+
+
+class RewardExportView(ExportView):
+    model = Reward
+    columns = ('id', 'title', 'description', 'category_id', 'category__name', 'creator_id', 'creator__username',
+               'receiver_id', 'reward_amount', 'status', 'created_at', 'updated_at')
+    filename = 'rewards'
+
+
+class RewardApplicationExportView(ExportView):
+    model = RewardApplication
+    columns = ('id', 'reward_id', 'applicant_id', 'applicant__username', 'is_accepted', 'application_date',
+               'updated_at')
+    filename = 'applications'
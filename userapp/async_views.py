@@ -0,0 +1,102 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from HackIt2.fieldsets import get_field_columns, get_requested_fields, narrow_queryset
+from HackIt2.routers import replica_reads
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, Throttled, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .authentication import CachingTokenAuthentication
+from .login import LoginThrottle, check_user_password, issue_token
+from .models import CustomUser
+from .serializers import CustomUserDetailSerializer, PublicUserDetailSerializer, UserLoginSerializer
+
+# 异步视图不经过 DRF 的 APIView，以下工具保证认证方式和响应字节与同步版本一致
+json_renderer = JSONRenderer()
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(json_renderer.render(data), status=status, content_type='application/json',
+                        headers=headers)
+
+
+def error_response(detail, status):
+    headers = {'WWW-Authenticate': 'Token'} if status == 401 else None
+    return json_response({'detail': detail}, status, headers)
+
+
+async def authenticate(request):
+    """按 token 设置 request.user，token 无效时返回错误响应"""
+    try:
+        result = await CachingTokenAuthentication().aauthenticate(request)
+    except AuthenticationFailed as exc:
+        return error_response(exc.detail, status.HTTP_401_UNAUTHORIZED)
+    request.user = result[0] if result else AnonymousUser()
+    return None
+
+
+async def user_detail(request, username):
+    error = await authenticate(request)
+    if error is not None:
+        return error
+
+    if request.user.is_authenticated and request.user.username == username:
+        serializer_class = CustomUserDetailSerializer
+    else:
+        serializer_class = PublicUserDetailSerializer
+
+    queryset = CustomUser.objects.all()
+    try:
+        names = get_requested_fields(request.GET, serializer_class().fields)
+    except ValidationError as exc:
+        return json_response(exc.detail, status.HTTP_400_BAD_REQUEST)
+    if names is not None:
+        queryset = narrow_queryset(queryset, get_field_columns(serializer_class(), names))
+
+    try:
+        with replica_reads():
+            user = await queryset.aget(username=username)
+    except CustomUser.DoesNotExist:
+        return error_response('User not found', status.HTTP_404_NOT_FOUND)
+
+    return json_response(serializer_class(user, context={'request': request, 'fields': names}).data)
+
+
+@csrf_exempt
+async def user_login(request):
+    """UserLoginView 的 ASGI 版本；哈希放到默认线程池里计算，并发登录不会在同步线程上排队"""
+    if request.method != 'POST':
+        return error_response(f'Method "{request.method}" not allowed.', status.HTTP_405_METHOD_NOT_ALLOWED)
+    try:
+        parsers = [parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]
+        data = UserLoginSerializer().to_internal_value(Request(request, parsers=parsers).data)
+    except ValidationError as exc:
+        return json_response(exc.detail, status.HTTP_400_BAD_REQUEST)
+    except APIException as exc:
+        return error_response(exc.detail, exc.status_code)
+
+    throttle = LoginThrottle(request, data['username'])
+    wait = await throttle.acheck()
+    if wait is not None:
+        return json_response({'detail': Throttled(wait).detail}, status.HTTP_429_TOO_MANY_REQUESTS,
+                             headers={'Retry-After': str(wait)})
+
+    user = await CustomUser.objects.filter(username=data['username']).afirst()
+    valid, new_hash = await sync_to_async(check_user_password, thread_sensitive=False)(user, data['password'])
+    if not valid:
+        await throttle.arecord_failure()
+        return json_response({'non_field_errors': ['Invalid username or password.']}, status.HTTP_400_BAD_REQUEST)
+
+    await throttle.areset()
+    key = await sync_to_async(issue_token)(user)
+    # 登录时间与按当前配置重新计算的哈希（如有）一条 UPDATE 写回
+    changes = {'last_login': timezone.now()}
+    if new_hash is not None:
+        changes['password'] = new_hash
+    await CustomUser.objects.filter(pk=user.pk).aupdate(**changes)
+    return json_response({'token': key})
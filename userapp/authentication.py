@@ -0,0 +1,158 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+
+def get_token_auth_settings():
+    return {
+        'CACHE_SIZE': 10000,
+        'CACHE_TTL': 60,
+        'TOKEN_EXPIRE_SECONDS': None,
+        **getattr(settings, 'TOKEN_AUTH', {}),
+    }
+
+
+def get_token_expiry_cutoff():
+    """早于返回时刻创建的 token 已过期；None 表示永不过期"""
+    expire_seconds = get_token_auth_settings()['TOKEN_EXPIRE_SECONDS']
+    if expire_seconds is None:
+        return None
+    return timezone.now() - timedelta(seconds=expire_seconds)
+
+
+def is_token_expired(token):
+    cutoff = get_token_expiry_cutoff()
+    return cutoff is not None and token.created < cutoff
+
+
+class TokenCache:
+    """线程安全的 token -> Token（含用户）LRU 缓存，按进程存放；其他进程的旧数据最多保留 ttl 秒"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def set(self, key, token):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            stale = [key for key, (token, _) in self._entries.items() if token.user_id == user_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_auth_settings = get_token_auth_settings()
+token_cache = TokenCache(_auth_settings['CACHE_SIZE'], _auth_settings['CACHE_TTL'])
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    """命中 token_cache 时不查数据库；aauthenticate 供异步视图使用"""
+
+    def get_token_key(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed('Invalid token header. No credentials provided.')
+        elif len(auth) > 2:
+            raise exceptions.AuthenticationFailed('Invalid token header. Token string should not contain spaces.')
+
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                'Invalid token header. Token string should not contain invalid characters.')
+
+    def authenticate(self, request):
+        key = self.get_token_key(request)
+        if key is None:
+            return None
+        return self.authenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            token_cache.set(key, token)
+
+        if is_token_expired(token):
+            token_cache.discard(key)
+            token.delete()
+            raise exceptions.AuthenticationFailed('Token has expired.')
+
+        return self.check_token(token)
+
+    async def aauthenticate(self, request):
+        key = self.get_token_key(request)
+        if key is None:
+            return None
+
+        token = token_cache.get(key)
+        if token is None:
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related('user').aget(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            token_cache.set(key, token)
+
+        if is_token_expired(token):
+            token_cache.discard(key)
+            await token.adelete()
+            raise exceptions.AuthenticationFailed('Token has expired.')
+
+        return self.check_token(token)
+
+    def check_token(self, token):
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        # 缓存中的对象会被多个请求共享，交给视图的是副本，避免请求内的修改相互影响
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return (token.user, token)
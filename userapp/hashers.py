@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """轮数取 settings.PASSWORD_HASH_ITERATIONS；算法名不变，旧哈希仍能校验，轮数不同的会在下次登录成功时按新轮数重新哈希"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
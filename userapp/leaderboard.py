@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CustomUser, LeaderboardBucket
+
+# 排行维度 -> (CustomUser 上的累计列, LeaderboardBucket 上的窗口列)
+SCORES = {
+    'tasks': ('completed_tasks', 'completed_tasks'),
+    'earnings': ('total_earned_cents', 'earned_cents'),
+}
+WINDOWS = ('all', 'week', 'month')
+
+
+def period_start(period, day):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def record_completion(user_id, amount_cents, when=None):
+    """在调用方的事务里用 F() 累加总榜字段以及本周、本月的榜单行"""
+    day = timezone.localdate(when)
+    with transaction.atomic():
+        CustomUser.objects.filter(pk=user_id).update(
+            completed_tasks=F('completed_tasks') + 1,
+            total_earned_cents=F('total_earned_cents') + amount_cents,
+        )
+        for period in ('week', 'month'):
+            bucket = LeaderboardBucket.objects.filter(user_id=user_id, period=period,
+                                                      period_start=period_start(period, day))
+            changes = {'completed_tasks': F('completed_tasks') + 1, 'earned_cents': F('earned_cents') + amount_cents}
+            if not bucket.update(**changes):
+                LeaderboardBucket.objects.get_or_create(user_id=user_id, period=period,
+                                                        period_start=period_start(period, day))
+                bucket.update(**changes)
+
+
+def get_board(by, window, day=None):
+    """返回某个榜单的 (queryset, 分数字段, 用户 id 字段)，分数高的在前"""
+    user_column, bucket_column = SCORES[by]
+    if window == 'all':
+        return CustomUser.objects.order_by(f'-{user_column}', 'id'), user_column, 'id'
+    day = day or timezone.localdate()
+    queryset = LeaderboardBucket.objects.filter(period=window, period_start=period_start(window, day))
+    return queryset.order_by(f'-{bucket_column}', 'user_id'), bucket_column, 'user_id'
+
+
+def top(by, window, limit):
+    """分数大于 0 的前 limit 名，直接读排名索引"""
+    queryset, column, user_column = get_board(by, window)
+    if window == 'all':
+        rows = queryset.filter(**{f'{column}__gt': 0}).values('id', 'username', column)[:limit]
+    else:
+        rows = queryset.filter(**{f'{column}__gt': 0}).values(user_column, 'user__username', column)[:limit]
+
+    results, rank, previous = [], 0, None
+    for index, row in enumerate(rows, start=1):
+        score = row[column]
+        if score != previous:
+            rank, previous = index, score
+        results.append({'rank': rank, 'user_id': row[user_column],
+                        'username': row.get('username', row.get('user__username')), 'score': score})
+    return results
+
+
+def rank_of(user_id, by, window):
+    """并列同名次：名次 = 分数更高的用户数 + 1"""
+    queryset, column, user_column = get_board(by, window)
+    score = queryset.filter(**{user_column: user_id}).values_list(column, flat=True).first() or 0
+    return {'rank': queryset.filter(**{f'{column}__gt': score}).count() + 1, 'user_id': user_id, 'score': score}
@@ -0,0 +1,59 @@
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import F
+
+from .authentication import token_cache
+from .models import CustomUser, LedgerEntry
+
+
+class InsufficientBalance(Exception):
+    pass
+
+
+def to_cents(amount):
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def format_cents(cents):
+    sign = '-' if cents < 0 else ''
+    return f'{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}'
+
+
+def _apply(user_id, amount_cents):
+    # 一条条件 UPDATE 增减余额；扣款要求余额足够，并发扣款也不会透支
+    queryset = CustomUser.objects.filter(pk=user_id)
+    if amount_cents < 0:
+        queryset = queryset.filter(balance_cents__gte=-amount_cents)
+    if not queryset.update(balance_cents=F('balance_cents') + amount_cents):
+        raise InsufficientBalance()
+    # update() 不发 post_save 信号，需要手动让缓存的用户行失效
+    transaction.on_commit(lambda: token_cache.discard_user(user_id))
+
+
+def adjust_balance(user_id, amount_cents, kind):
+    """充值（正数）或提现（负数），并记入流水"""
+    with transaction.atomic():
+        _apply(user_id, amount_cents)
+        return LedgerEntry.objects.create(user_id=user_id, amount_cents=amount_cents, kind=kind,
+                                          transfer_id=uuid.uuid4())
+
+
+def transfer(from_user_id, to_user_id, amount_cents, debit_kind='reward_payment', credit_kind='reward_income',
+             reward=None):
+    """在一个事务里从 from_user 转账给 to_user，余额不足抛出 InsufficientBalance"""
+    if amount_cents <= 0:
+        raise ValueError('Transfer amount must be positive')
+
+    transfer_id = uuid.uuid4()
+    with transaction.atomic():
+        _apply(from_user_id, -amount_cents)
+        _apply(to_user_id, amount_cents)
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(user_id=from_user_id, amount_cents=-amount_cents, kind=debit_kind,
+                        transfer_id=transfer_id, reward=reward),
+            LedgerEntry(user_id=to_user_id, amount_cents=amount_cents, kind=credit_kind,
+                        transfer_id=transfer_id, reward=reward),
+        ])
+    return transfer_id
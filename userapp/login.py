@@ -0,0 +1,91 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.throttling import BaseThrottle
+
+from HackIt2.throttling import get_store
+from .authentication import get_token_expiry_cutoff
+
+
+def get_login_throttle_settings():
+    return {
+        'USERNAME_LIMIT': 5,
+        'IP_LIMIT': 50,
+        'WINDOW': 300,
+        **getattr(settings, 'LOGIN_THROTTLE', {}),
+    }
+
+
+class LoginThrottle:
+    """按用户名和客户端 IP 统计登录失败次数，计数在本机所有 worker 进程共享的限流库中，计算密码哈希之前先检查"""
+
+    def __init__(self, request, username):
+        self.settings = get_login_throttle_settings()
+        self.store = get_store()
+        # 用户名可能很长或含有特殊字符，键里只放摘要
+        digest = hashlib.blake2b(username.encode(), digest_size=8).hexdigest()
+        self.user_key = f'login-fail:user:{digest}'
+        self.ip_key = f'login-fail:ip:{BaseThrottle().get_ident(request)}'
+
+    def check(self):
+        """还需等待的秒数，未被限制时返回 None"""
+        window = self.settings['WINDOW']
+        if (self.store.count(self.user_key, window) >= self.settings['USERNAME_LIMIT']
+                or self.store.count(self.ip_key, window) >= self.settings['IP_LIMIT']):
+            return window
+        return None
+
+    def record_failure(self):
+        for key in (self.user_key, self.ip_key):
+            self.store.add(key, self.settings['WINDOW'])
+
+    def reset(self):
+        # 登录成功只清除用户名计数，同一 IP 上对其他账号的失败仍然累计
+        self.store.reset(self.user_key)
+
+    # 限流库是同步的 SQLite I/O，异步视图放到线程池里执行
+    async def acheck(self):
+        return await sync_to_async(self.check, thread_sensitive=False)()
+
+    async def arecord_failure(self):
+        await sync_to_async(self.record_failure, thread_sensitive=False)()
+
+    async def areset(self):
+        await sync_to_async(self.reset, thread_sensitive=False)()
+
+
+def check_user_password(user, password):
+    """返回 (是否有效, 新哈希)，不访问数据库；哈希算法或轮数需要更新时给出新哈希，用户不存在时也计算一次哈希使耗时一致"""
+    if user is None:
+        make_password(password)
+        return False, None
+    valid, must_update = verify_password(password, user.password)
+    if not valid or not user.is_active:
+        return False, None
+    return True, make_password(password) if must_update else None
+
+
+def issue_token(user):
+    """一条 upsert 取回用户的 token，没有或已过期时新建；未过期的原样返回，用户其他设备不受影响"""
+    qn = connection.ops.quote_name
+    table = qn(Token._meta.db_table)
+    key, user_id, created = qn('key'), qn('user_id'), qn('created')
+    cutoff = get_token_expiry_cutoff()
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    cutoff = connection.ops.adapt_datetimefield_value(cutoff) if cutoff is not None else None
+    # 未过期时 CASE 保留原值；cutoff 为 NULL（令牌不过期）时比较结果为 NULL，同样保留
+    sql = (
+        f'INSERT INTO {table} ({key}, {user_id}, {created}) VALUES (%s, %s, %s) '
+        f'ON CONFLICT ({user_id}) DO UPDATE SET '
+        f'{key} = CASE WHEN {table}.{created} < %s THEN excluded.{key} ELSE {table}.{key} END, '
+        f'{created} = CASE WHEN {table}.{created} < %s THEN excluded.{created} ELSE {table}.{created} END '
+        f'RETURNING {key}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [Token.generate_key(), user.pk, now, cutoff, cutoff])
+        return cursor.fetchone()[0]
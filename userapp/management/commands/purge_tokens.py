@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from rest_framework.authtoken.models import Token
+
+from HackIt2.batches import delete_in_batches
+from userapp.authentication import get_token_expiry_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Delete expired tokens and tokens of inactive users in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        stale = Q(user__is_active=False)
+        cutoff = get_token_expiry_cutoff()
+        if cutoff is not None:
+            stale |= Q(created__lt=cutoff)
+
+        total = delete_in_batches(Token.objects.filter(stale), batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Purged {total} stale tokens'))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:26
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+
+def balance_to_cents(apps, schema_editor):
+    CustomUser = apps.get_model('userapp', 'CustomUser')
+    LedgerEntry = apps.get_model('userapp', 'LedgerEntry')
+    # 在数据库里一次换算并四舍五入，不经过 Python 浮点，也不逐行更新
+    CustomUser.objects.exclude(balance=0).update(
+        balance_cents=Cast(Round(F('balance') * 100), models.BigIntegerField()))
+    # 每个非零余额补一条期初流水，之后流水合计与 balance_cents 一致
+    LedgerEntry.objects.bulk_create(
+        (LedgerEntry(user_id=user_id, amount_cents=cents, kind='opening_balance', transfer_id=uuid.uuid4())
+         for user_id, cents in CustomUser.objects.exclude(balance_cents=0).values_list('pk', 'balance_cents')
+         .iterator()),
+        batch_size=500)
+
+
+def balance_from_cents(apps, schema_editor):
+    CustomUser = apps.get_model('userapp', 'CustomUser')
+    CustomUser.objects.exclude(balance_cents=0).update(
+        balance=Cast(F('balance_cents'), models.FloatField()) / 100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewardapp', '0009_reward_search'),
+        ('userapp', '0002_alter_customuser_groups_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='balance_cents',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount_cents', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('deposit', 'Deposit'), ('withdraw', 'Withdraw'), ('reward_payment', 'Reward Payment'), ('reward_income', 'Reward Income'), ('opening_balance', 'Opening Balance')], max_length=20)),
+                ('transfer_id', models.UUIDField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reward', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='rewardapp.reward')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'LedgerEntry',
+                'indexes': [models.Index(fields=['user', 'created_at'], name='ledger_user_created_idx')],
+            },
+        ),
+        migrations.RunPython(balance_to_cents, balance_from_cents),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='balance',
+        ),
+    ]
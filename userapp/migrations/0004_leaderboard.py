@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:37
+
+import django.db.models.deletion
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_leaderboard(apps, schema_editor):
+    CustomUser = apps.get_model('userapp', 'CustomUser')
+    LedgerEntry = apps.get_model('userapp', 'LedgerEntry')
+    LeaderboardBucket = apps.get_model('userapp', 'LeaderboardBucket')
+
+    totals, buckets = {}, {}
+    for user_id, amount, created_at in LedgerEntry.objects.filter(kind='reward_income').values_list(
+            'user_id', 'amount_cents', 'created_at').iterator():
+        totals[user_id] = totals.get(user_id, 0) + amount
+        day = timezone.localdate(created_at)
+        for period, start in (('week', day - timedelta(days=day.weekday())), ('month', day.replace(day=1))):
+            tasks, earned = buckets.get((user_id, period, start), (0, 0))
+            buckets[user_id, period, start] = tasks + 1, earned + amount
+
+    for user_id, earned in totals.items():
+        CustomUser.objects.filter(pk=user_id).update(total_earned_cents=earned)
+    LeaderboardBucket.objects.bulk_create([
+        LeaderboardBucket(user_id=user_id, period=period, period_start=start, completed_tasks=tasks,
+                          earned_cents=earned)
+        for (user_id, period, start), (tasks, earned) in buckets.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('userapp', '0003_balance_cents_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('completed_tasks', models.IntegerField(default=0)),
+                ('earned_cents', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'LeaderboardBucket',
+            },
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='total_earned_cents',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['-completed_tasks', 'id'], name='user_rank_tasks_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['-total_earned_cents', 'id'], name='user_rank_earned_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardbucket',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_buckets', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardbucket',
+            index=models.Index(fields=['period', 'period_start', '-completed_tasks', 'user'], name='bucket_rank_tasks_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardbucket',
+            index=models.Index(fields=['period', 'period_start', '-earned_cents', 'user'], name='bucket_rank_earned_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardbucket',
+            constraint=models.UniqueConstraint(fields=('period', 'period_start', 'user'), name='leaderboard_bucket_unique'),
+        ),
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
 
@@ -8,7 +11,10 @@ class CustomUser(AbstractUser):
     completed_tasks = models.IntegerField(default=0)
     bio = models.TextField(blank=True, null=True)
     code_age = models.IntegerField(default=0)
-    balance = models.FloatField(default=0)
+    # 余额以“分”为单位存整数，只能通过 userapp.ledger 中的条件 F() 更新修改
+    balance_cents = models.BigIntegerField(default=0)
+    # 排行榜用的累计收入（分），与 completed_tasks 一起由 userapp.leaderboard 在付款时增量维护
+    total_earned_cents = models.BigIntegerField(default=0)
 
     groups = models.ManyToManyField(
         Group,
@@ -23,3 +29,69 @@ class CustomUser(AbstractUser):
 
     class Meta:
         db_table = 'HackUser'
+        indexes = [
+            models.Index(fields=['-completed_tasks', 'id'], name='user_rank_tasks_idx'),
+            models.Index(fields=['-total_earned_cents', 'id'], name='user_rank_earned_idx'),
+        ]
+
+    @property
+    def balance(self):
+        return Decimal(self.balance_cents) / 100
+
+
+class LedgerEntry(models.Model):
+    """只追加的资金流水，每次余额变动写一条；一次转账的两条流水共享 transfer_id"""
+    KIND_CHOICES = [
+        ('deposit', 'Deposit'),  # 充值
+        ('withdraw', 'Withdraw'),  # 提现
+        ('reward_payment', 'Reward Payment'),  # 支付悬赏
+        ('reward_income', 'Reward Income'),  # 悬赏收入
+        ('opening_balance', 'Opening Balance'),  # 改用流水记账前的余额，迁移时写入
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='ledger_entries')
+    amount_cents = models.BigIntegerField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    transfer_id = models.UUIDField(db_index=True)
+    # 悬赏可能被删除或归档，流水只保留其 id，不加外键约束
+    reward = models.ForeignKey('rewardapp.Reward', on_delete=models.DO_NOTHING, db_constraint=False,
+                               null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'LedgerEntry'
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='ledger_user_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('LedgerEntry is append-only')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('LedgerEntry is append-only')
+
+
+class LeaderboardBucket(models.Model):
+    """按周/月预聚合的排行榜分数，period_start 为该周周一或该月一号"""
+    PERIOD_CHOICES = [
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leaderboard_buckets')
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    completed_tasks = models.IntegerField(default=0)
+    earned_cents = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'LeaderboardBucket'
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'period_start', 'user'], name='leaderboard_bucket_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'period_start', '-completed_tasks', 'user'], name='bucket_rank_tasks_idx'),
+            models.Index(fields=['period', 'period_start', '-earned_cents', 'user'], name='bucket_rank_earned_idx'),
+        ]
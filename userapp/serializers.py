@@ -2,6 +2,9 @@ from .models import CustomUser
 from django.contrib.auth import authenticate
 from rest_framework import serializers
 from django.contrib.auth import password_validation
+from rest_framework.exceptions import Throttled
+from HackIt2.fieldsets import SparseFieldsSerializerMixin
+from .login import LoginThrottle
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -28,34 +31,56 @@ class UserLoginSerializer(serializers.Serializer):
     def validate(self, data):
         username = data.get('username')
         password = data.get('password')
-        user = authenticate(username=username, password=password)
+        request = self.context['request']
+        # 失败次数超限时在计算密码哈希之前拒绝
+        throttle = LoginThrottle(request, username)
+        wait = throttle.check()
+        if wait is not None:
+            raise Throttled(wait)
+
+        user = authenticate(request, username=username, password=password)
         if user is None:
+            throttle.record_failure()
             raise serializers.ValidationError("Invalid username or password.")
 
+        throttle.reset()
         data['user'] = user
         return data
 
 
-class CustomUserDetailSerializer(serializers.ModelSerializer):
+class CustomUserDetailSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     is_auth_user = serializers.SerializerMethodField()
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2, coerce_to_string=False, read_only=True)
 
     class Meta:
         model = CustomUser
         fields = ['username', 'first_name', 'last_name', 'email', 'phone_number',
                   'birth_date', 'completed_tasks', 'bio', 'code_age', 'balance', 'is_auth_user']
+        # 完成数由付款流程维护并参与排行榜，不允许用户自行修改
+        read_only_fields = ['completed_tasks']
+        # ?fields= 裁剪查询时，非模型列字段实际读取的列
+        field_columns = {'balance': ('balance_cents',), 'is_auth_user': ('username',)}
 
     def get_is_auth_user(self, obj):
         request = self.context.get('request')
         return request.user.is_authenticated and request.user.username == obj.username
 
+    def update(self, instance, validated_data):
+        # 只写回本次修改的列，避免用请求开始时读到的旧值覆盖并发更新的余额等字段
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
-class PublicUserDetailSerializer(serializers.ModelSerializer):
+
+class PublicUserDetailSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     is_auth_user = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
         fields = ['username', 'first_name', 'last_name', 'email', 'birth_date',
                   'completed_tasks', 'bio', 'code_age', 'is_auth_user']
+        field_columns = {'is_auth_user': ('username',)}
 
     def get_is_auth_user(self, obj):
         request = self.context.get('request')
@@ -71,7 +96,5 @@ class ChangePasswordSerializer(serializers.Serializer):
         return value
 
 
-class BalanceSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = CustomUser
-        fields = ['balance']
+class BalanceSerializer(serializers.Serializer):
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2, coerce_to_string=False, required=False)
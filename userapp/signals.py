@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import CustomUser
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    token_cache.discard(instance.key)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def forget_user_tokens(sender, instance, **kwargs):
+    # 改密码、停用账号等都会保存用户行，直接丢弃该用户的所有缓存令牌
+    token_cache.discard_user(instance.pk)
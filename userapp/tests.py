@@ -1,3 +1,338 @@
-from django.test import TestCase
+import random
+import threading
+from collections import Counter
+from datetime import timedelta
 
-# Create your tests here.
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from HackIt2.test_runner import get_test_throttle_settings
+from HackIt2.throttling import get_store
+from .authentication import token_cache
+from .leaderboard import record_completion
+from .ledger import InsufficientBalance, adjust_balance, transfer
+from .models import CustomUser, LedgerEntry
+
+
+class CachingTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = CustomUser.objects.create(username='hunter')
+        self.user.set_password('Sup3r-secret!')
+        self.user.save()
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('user_detail', args=['hunter'])
+
+    def get(self):
+        return self.client.get(self.url)
+
+    def test_warm_request_skips_token_lookup(self):
+        self.assertTrue(self.get().data['is_auth_user'])
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(self.get().data['is_auth_user'])
+        self.assertFalse([q for q in ctx.captured_queries if 'authtoken_token' in q['sql']])
+
+    def test_deleted_token_is_rejected(self):
+        self.get()
+        self.token.delete()
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_password_change_drops_cached_user(self):
+        self.get()
+        response = self.client.put(reverse('change-password'),
+                                   {'old_password': 'Sup3r-secret!', 'new_password': 'An0ther-secret!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(token_cache), 0)
+
+    @override_settings(TOKEN_AUTH={'TOKEN_EXPIRE_SECONDS': 60})
+    def test_expired_token_is_rejected_and_refreshed_on_login(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.get().status_code, 401)
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+        response = self.client.post(reverse('user-login'), {'username': 'hunter', 'password': 'Sup3r-secret!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['token'], self.token.key)
+
+    @override_settings(TOKEN_AUTH={'TOKEN_EXPIRE_SECONDS': 60})
+    def test_purge_tokens(self):
+        inactive = CustomUser.objects.create(username='inactive', is_active=False)
+        Token.objects.create(user=inactive)
+        old = Token.objects.create(user=CustomUser.objects.create(username='old'))
+        Token.objects.filter(pk=old.pk).update(created=timezone.now() - timedelta(minutes=5))
+
+        call_command('purge_tokens', batch_size=1, stdout=open('/dev/null', 'w'))
+        self.assertEqual(list(Token.objects.values_list('key', flat=True)), [self.token.key])
+
+
+class BalanceTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='hunter')
+        self.client.force_authenticate(self.user)
+
+    def test_deposit_and_withdraw_write_ledger(self):
+        response = self.client.put(reverse('update-balance'), {'balance': '12.34'})
+        self.assertEqual(response.json(), {'balance': 12.34})
+        response = self.client.put(reverse('update-balance'), {'balance': '-2.30'})
+        self.assertEqual(response.json(), {'balance': 10.04})
+        self.assertEqual(list(self.user.ledger_entries.order_by('id').values_list('kind', 'amount_cents')),
+                         [('deposit', 1234), ('withdraw', -230)])
+
+    def test_overdraw_is_rejected(self):
+        response = self.client.put(reverse('update-balance'), {'balance': '-0.01'})
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance_cents, 0)
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_ledger_is_append_only(self):
+        entry = adjust_balance(self.user.pk, 100, 'deposit')
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+
+class ConcurrentTransferTests(TransactionTestCase):
+    """多线程随机互转，验证余额总和守恒、没有负余额、流水与余额一致"""
+    users = 6
+    threads = 8
+    transfers_per_thread = 40
+
+    def worker(self, user_ids, seed, results, lock):
+        rng = random.Random(seed)
+        try:
+            for _ in range(self.transfers_per_thread):
+                sender, receiver = rng.sample(user_ids, 2)
+                while True:
+                    try:
+                        transfer(sender, receiver, rng.randint(1, 300))
+                        outcome = 'ok'
+                    except InsufficientBalance:
+                        outcome = 'rejected'
+                    except OperationalError:
+                        # 内存 SQLite 共享缓存下并发写会直接报表锁，整笔回滚后重试即可
+                        continue
+                    with lock:
+                        results[outcome] += 1
+                    break
+        finally:
+            connections.close_all()
+
+    def test_sum_of_balances_is_conserved(self):
+        user_ids = [CustomUser.objects.create(username=f'user {i}', balance_cents=1000).pk
+                    for i in range(self.users)]
+        results, lock = Counter(), threading.Lock()
+        workers = [threading.Thread(target=self.worker, args=(user_ids, seed, results, lock))
+                   for seed in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        balances = dict(CustomUser.objects.filter(pk__in=user_ids).values_list('pk', 'balance_cents'))
+        self.assertEqual(sum(balances.values()), 1000 * self.users)
+        self.assertTrue(all(balance >= 0 for balance in balances.values()))
+        self.assertEqual(results['ok'] + results['rejected'], self.threads * self.transfers_per_thread)
+        self.assertEqual(LedgerEntry.objects.count(), 2 * results['ok'])
+        for user_id, balance in balances.items():
+            moved = LedgerEntry.objects.filter(user_id=user_id).aggregate(total=Sum('amount_cents'))['total'] or 0
+            self.assertEqual(balance, 1000 + moved)
+
+
+class AsyncUserDetailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='hunter', balance_cents=1234, bio='hi')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        token_cache.clear()
+
+    async def assertSameAsSync(self, username, headers=None):
+        response = await self.async_client.get(reverse('async-user-detail', args=[username]), headers=headers)
+        expected = await sync_to_async(self.client.get)(reverse('user_detail', args=[username]), headers=headers)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    async def test_public_and_private_views(self):
+        response = await self.assertSameAsSync('hunter')
+        self.assertNotIn('balance', response.json())
+        response = await self.assertSameAsSync('hunter', {'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.json()['balance'], 12.34)
+
+    async def test_errors(self):
+        await self.assertSameAsSync('nobody')
+        await self.assertSameAsSync('hunter', {'Authorization': 'Token invalid'})
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        self.users = [CustomUser.objects.create(username=name) for name in ('alice', 'bob', 'carol', 'dave')]
+        alice, bob, carol, _ = self.users
+        last_month = timezone.now() - timedelta(days=40)
+        for user, amount, when in [(alice, 500, None), (alice, 500, None), (bob, 3000, None),
+                                   (carol, 100, last_month), (carol, 100, last_month), (carol, 100, None)]:
+            record_completion(user.pk, amount, when)
+
+    def board(self, user=None, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('leaderboard'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_all_time_by_tasks_with_ties_and_own_rank(self):
+        data = self.board(self.users[3])
+        self.assertEqual([(row['rank'], row['username'], row['score']) for row in data['results']],
+                         [(1, 'carol', 3), (2, 'alice', 2), (3, 'bob', 1)])
+        self.assertEqual((data['me']['rank'], data['me']['score']), (4, 0))
+
+    def test_earnings_and_windows(self):
+        data = self.board(by='earnings', limit=1)
+        self.assertEqual([(row['username'], row['score']) for row in data['results']], [('bob', '30.00')])
+
+        data = self.board(self.users[2], window='month')
+        self.assertEqual([(row['rank'], row['username']) for row in data['results']],
+                         [(1, 'alice'), (2, 'bob'), (2, 'carol')])
+        self.assertEqual(data['me']['rank'], 2)
+
+    def test_completed_tasks_is_read_only(self):
+        self.client.force_authenticate(self.users[3])
+        self.client.patch(reverse('update-user'), {'completed_tasks': 99, 'bio': 'hi'})
+        self.users[3].refresh_from_db()
+        self.assertEqual((self.users[3].completed_tasks, self.users[3].bio), (0, 'hi'))
+
+
+class UserSparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='hunter', balance_cents=1234, bio='long text')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        token_cache.clear()
+
+    def test_fields_prune_output_and_columns(self):
+        headers = {'Authorization': f'Token {self.token.key}'}
+        url = reverse('user_detail', args=['hunter'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'username,balance,is_auth_user'}, headers=headers)
+        self.assertEqual(response.json(), {'username': 'hunter', 'balance': 12.34, 'is_auth_user': True})
+        self.assertNotIn('"bio"', queries[-1]['sql'])
+
+        response = self.client.get(url, {'exclude': 'bio,email'})
+        self.assertNotIn('bio', response.json())
+        self.assertIn('completed_tasks', response.json())
+        self.assertEqual(self.client.get(url, {'fields': 'balance'}).status_code, 400)
+
+    async def test_async_view_matches_sync(self):
+        headers = {'Authorization': f'Token {self.token.key}'}
+        for params in ({'fields': 'bio,is_auth_user'}, {'exclude': 'balance'}, {'fields': 'password'}):
+            expected = await sync_to_async(self.client.get)(reverse('user_detail', args=['hunter']), params,
+                                                            headers=headers)
+            response = await self.async_client.get(reverse('async-user-detail', args=['hunter']), params,
+                                                   headers=headers)
+            self.assertEqual(response.status_code, expected.status_code)
+            self.assertEqual(response.content, expected.content)
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000,
+                   LOGIN_THROTTLE={'USERNAME_LIMIT': 3, 'IP_LIMIT': 5, 'WINDOW': 60},
+                   THROTTLE=get_test_throttle_settings())
+class LoginTests(TestCase):
+    def setUp(self):
+        get_store().clear()
+        # 固定在窗口中间，避免测试跨过窗口边界时上一窗口的计数按比例衰减
+        patcher = mock.patch('HackIt2.throttling.time.time', return_value=60 * 1000 + 30)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create(username='hunter', bio='long text',
+                                              password=make_password('Sup3r-secret!'))
+
+    def login(self, password='Sup3r-secret!', username='hunter', route='user-login'):
+        return self.client.post(reverse(route), {'username': username, 'password': password})
+
+    def test_login_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        token_queries = [q['sql'] for q in queries if 'authtoken_token' in q['sql']]
+        self.assertEqual(len(token_queries), 1)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "HackUser"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"last_login"', updates[0])
+        self.assertNotIn('"bio"', updates[0])
+
+        self.assertEqual(self.login().json()['token'], response.json()['token'])
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_hash_follows_configured_iterations(self):
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertIn('$2000$', self.user.password)
+
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertIn('$1000$', self.user.password)
+
+    def test_failed_attempts_are_throttled_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login('wrong').status_code, 400)
+        with mock.patch('django.contrib.auth.hashers.verify_password') as verify:
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        verify.assert_not_called()
+
+        # 同一 IP 对其他用户名的失败也计数
+        self.assertEqual(self.login('wrong', 'alice').status_code, 400)
+        self.assertEqual(self.login('wrong', 'bob').status_code, 400)
+        self.assertEqual(self.login('wrong', 'carol').status_code, 429)
+
+    def test_success_resets_username_counter(self):
+        for _ in range(2):
+            self.login('wrong')
+        self.assertEqual(self.login().status_code, 200)
+        for _ in range(2):
+            self.assertEqual(self.login('wrong').status_code, 400)
+
+    async def test_async_login_matches_sync(self):
+        passwords = ('wrong', 'Sup3r-secret!', 'wrong', 'wrong', 'wrong', 'Sup3r-secret!')
+
+        async def run(route):
+            await sync_to_async(get_store().clear)()
+            results = []
+            for password in passwords:
+                response = await sync_to_async(self.login)(password, route=route)
+                data = response.json()
+                results.append((response.status_code, response.get('Retry-After'),
+                                'token' if 'token' in data else data))
+            return results
+
+        self.assertEqual(await run('async-user-login'), await run('user-login'))
+        self.assertEqual((await run('async-user-login'))[-1][0], 429)
+
+        response = await self.async_client.post(reverse('async-user-login'), {'username': 'hunter'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json())
@@ -1,11 +1,15 @@
 from django.urls import path
+from . import async_views
 from .views import *
 
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='user-registration'),
     path('login/', UserLoginView.as_view(), name='user-login'),
+    path('async/login/', async_views.user_login, name='async-user-login'),
     path('update/', UpdateUserView.as_view(), name='update-user'),
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
     path('detail/<str:username>/', UserDetailView.as_view(), name='user_detail'),
+    path('async/detail/<str:username>/', async_views.user_detail, name='async-user-detail'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
     path('balance/', DepositAndWithdrawView.as_view(), name='update-balance'),
 ]
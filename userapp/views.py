@@ -1,11 +1,15 @@
-from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import NotFound
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .serializers import *
 from rest_framework import generics, permissions, status
+from .leaderboard import SCORES, WINDOWS, rank_of, top
+from .ledger import InsufficientBalance, adjust_balance, format_cents, to_cents
+from .login import issue_token
 from .models import CustomUser
 from django.utils import timezone
+from HackIt2.fieldsets import SparseFieldsMixin
+from HackIt2.routers import ReplicaReadMixin
 
 
 class UserRegistrationView(APIView):
@@ -18,14 +22,17 @@ class UserRegistrationView(APIView):
 
 
 class UserLoginView(APIView):
+    # 客户端登录时常带着已过期的旧令牌，登录接口本身不做令牌认证
+    authentication_classes = []
+
     def post(self, request, *args, **kwargs):
-        serializer = UserLoginSerializer(data=request.data)
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            token, created = Token.objects.get_or_create(user=user)
-            user.last_login = timezone.now()
-            user.save()
-            return Response({'token': token.key}, status=status.HTTP_200_OK)
+            key = issue_token(user)
+            # 只写 last_login 一列；不经过 save()，也就不会因为登录清掉该用户的令牌缓存
+            CustomUser.objects.filter(pk=user.pk).update(last_login=timezone.now())
+            return Response({'token': key}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -55,13 +62,13 @@ class ChangePasswordView(generics.UpdateAPIView):
                 return Response({"old_password": ["Wrong password."]}, status=status.HTTP_400_BAD_REQUEST)
 
             self.object.set_password(serializer.data.get("new_password"))
-            self.object.save()
+            self.object.save(update_fields=['password'])
             return Response({"status": "password set"}, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserDetailView(generics.RetrieveAPIView):
+class UserDetailView(ReplicaReadMixin, SparseFieldsMixin, generics.RetrieveAPIView):
     queryset = CustomUser.objects.all()
     permission_classes = []
 
@@ -74,7 +81,7 @@ class UserDetailView(generics.RetrieveAPIView):
     def get_object(self):
         username = self.kwargs.get('username')
         try:
-            user = CustomUser.objects.get(username=username)
+            user = self.sparse_queryset(CustomUser.objects.all()).get(username=username)
         except CustomUser.DoesNotExist:
             raise NotFound('User not found')
         return user
@@ -84,6 +91,7 @@ class DepositAndWithdrawView(generics.UpdateAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = BalanceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'balance'
 
     def get_object(self):
         return self.request.user
@@ -98,12 +106,42 @@ class DepositAndWithdrawView(generics.UpdateAPIView):
         if amount is None:
             return Response({"detail": "请添加balance参数"}, status=status.HTTP_400_BAD_REQUEST)
 
-        new_balance = user.balance + amount
+        amount_cents = to_cents(amount)
+        if amount_cents:
+            try:
+                adjust_balance(user.pk, amount_cents, 'deposit' if amount_cents > 0 else 'withdraw')
+            except InsufficientBalance:
+                return Response({"detail": "余额不足"}, status=status.HTTP_400_BAD_REQUEST)
+        user.refresh_from_db(fields=['balance_cents'])
 
-        if new_balance < 0:
-            return Response({"detail": "余额不足"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-        user.balance = new_balance
-        user.save()
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+class LeaderboardView(ReplicaReadMixin, APIView):
+    """?by=tasks|earnings&window=all|week|month&limit=10，登录用户额外返回自己的名次"""
+    permission_classes = [permissions.AllowAny]
+    default_limit = 10
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        by = request.query_params.get('by', 'tasks')
+        window = request.query_params.get('window', 'all')
+        if by not in SCORES or window not in WINDOWS:
+            return Response({"detail": "不支持的参数"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        results = [self.format_entry(entry, by) for entry in top(by, window, max(limit, 1))]
+        data = {'by': by, 'window': window, 'results': results}
+        if request.user.is_authenticated:
+            me = rank_of(request.user.pk, by, window)
+            me['username'] = request.user.username
+            data['me'] = self.format_entry(me, by)
+        return Response(data, status=status.HTTP_200_OK)
+
+    def format_entry(self, entry, by):
+        if by == 'earnings':
+            entry['score'] = format_cents(entry['score'])
+        return entry